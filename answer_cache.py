@@ -0,0 +1,107 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+
+class SemanticAnswerCache:
+    """
+    Persistent cache of generated answers, looked up by query embedding similarity.
+    A new question whose embedding is within `threshold` cosine similarity of a cached
+    question for the same collection, collection write version, top_k and filters
+    (which include the retrieval settings and summary versions, see RAGPipeline._cache_key)
+    gets the cached answer and context back without retrieval or an LLM call.
+    Entries for older collection versions are purged on lookup, so any write to the
+    collection invalidates them automatically.
+    """
+    def __init__(self, path="imessage_insight/chromadb_data/answer_cache.sqlite", threshold=0.95, max_entries=5000):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS answers (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                collection TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                top_k INTEGER NOT NULL,
+                filters TEXT NOT NULL,
+                query TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                answer TEXT NOT NULL,
+                context TEXT NOT NULL,
+                latency REAL NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS answers_key ON answers (collection, version, top_k, filters)")
+        self.conn.commit()
+
+    @staticmethod
+    def filters_key(**filters):
+        """
+        Canonical string for a set of retrieval filters (None values ignored).
+        """
+        return json.dumps({k: str(v) for k, v in sorted(filters.items()) if v is not None})
+
+    def lookup(self, collection, version, top_k, filters, query_embedding):
+        """
+        Return (answer, context) for the most similar cached question above the threshold, or None.
+        """
+        q = np.asarray(query_embedding, dtype=np.float32)
+        q /= max(np.linalg.norm(q), 1e-12)
+        with self._lock:
+            # Drop entries written against an older version of this collection
+            self.conn.execute("DELETE FROM answers WHERE collection = ? AND version != ?", (collection, version))
+            rows = self.conn.execute(
+                "SELECT embedding, answer, context, latency FROM answers WHERE collection = ? AND version = ? AND top_k = ? AND filters = ?",
+                (collection, version, top_k, filters)
+            ).fetchall()
+            self.conn.commit()
+            if rows:
+                matrix = np.frombuffer(b"".join(row[0] for row in rows), dtype=np.float32).reshape(len(rows), -1)
+                similarities = matrix @ q
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    self.hits += 1
+                    self.saved_seconds += rows[best][3]
+                    return rows[best][1], rows[best][2]
+            self.misses += 1
+            return None
+
+    def store(self, collection, version, top_k, filters, query, query_embedding, answer, context, latency):
+        """
+        Cache an answer. latency is how long it took to produce, used to report saved time on hits.
+        """
+        q = np.asarray(query_embedding, dtype=np.float32)
+        q /= max(np.linalg.norm(q), 1e-12)
+        with self._lock:
+            self.conn.execute(
+                "INSERT INTO answers (collection, version, top_k, filters, query, embedding, answer, context, latency, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (collection, version, top_k, filters, query, q.tobytes(), answer, context, latency, time.time())
+            )
+            # Keep the cache bounded by evicting the oldest entries
+            self.conn.execute(
+                "DELETE FROM answers WHERE id NOT IN (SELECT id FROM answers ORDER BY id DESC LIMIT ?)",
+                (self.max_entries,)
+            )
+            self.conn.commit()
+
+    def stats(self):
+        """
+        Hit/miss counts, hit rate, and total LLM+retrieval time saved by hits in this process.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "saved_seconds": self.saved_seconds
+        }
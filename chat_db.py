@@ -0,0 +1,99 @@
+import os
+import re
+import sqlite3
+from datetime import datetime
+from imessage_insight import instrumentation
+from imessage_insight.message_preprocessor import MessagePreprocessor
+
+# Default path to the Messages database
+DEFAULT_DB_PATH = os.path.expanduser('~/Library/Messages/chat.db')
+MAC_EPOCH_START = 978307200  # 2001-01-01 00:00:00 UTC
+
+def connect(db_path=DEFAULT_DB_PATH):
+    """
+    Open chat.db read-only, so reading never blocks or modifies Messages' own writes.
+    """
+    return sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False)
+
+def apple_date_to_datetime(value):
+    """
+    Convert a message.date value to a local datetime.
+    Newer macOS stores nanoseconds since 2001-01-01, older versions seconds.
+    """
+    if not value:
+        return None
+    seconds = value / 1e9 if value > 1e11 else value
+    return datetime.fromtimestamp(seconds + MAC_EPOCH_START)
+
+def find_handle_ids(conn, contact):
+    """
+    ROWIDs of handles matching a phone number (by its last 10 digits) or an Apple ID (exactly).
+    """
+    if "@" in contact:
+        rows = conn.execute("SELECT ROWID FROM handle WHERE id = ?", (contact.strip(),)).fetchall()
+    else:
+        digits = re.sub(r'\D', '', contact)
+        if not digits:
+            return []
+        rows = conn.execute("SELECT ROWID FROM handle WHERE id LIKE ?", (f"%{digits[-10:]}",)).fetchall()
+    return [row[0] for row in rows]
+
+@instrumentation.timed("fetch_messages")
+def fetch_messages_since(conn, handle_ids, after_rowid=0, limit=None):
+    """
+    Messages in chats with the given handles whose ROWID is greater than after_rowid,
+    in ROWID order. Returns tuples of (ROWID, date, text, is_from_me), the input
+    format of MessagePreprocessor.process_messages.
+    """
+    if not handle_ids:
+        return []
+    placeholders = ','.join(['?'] * len(handle_ids))
+    query = f"""
+        SELECT DISTINCT
+            message.ROWID,
+            message.date,
+            message.text,
+            message.is_from_me
+        FROM
+            message
+        JOIN
+            chat_message_join ON message.ROWID = chat_message_join.message_id
+        JOIN
+            chat_handle_join ON chat_message_join.chat_id = chat_handle_join.chat_id
+        WHERE
+            chat_handle_join.handle_id IN ({placeholders})
+            AND message.ROWID > ?
+            AND message.text IS NOT NULL
+        ORDER BY
+            message.ROWID ASC
+    """
+    params = list(handle_ids) + [after_rowid]
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+    return conn.execute(query, params).fetchall()
+
+def process_rows(rows, preprocessor=None):
+    """
+    Run fetch_messages_since() rows through MessagePreprocessor, with timestamps formatted
+    like imessage_reader's ("YYYY-MM-DD HH:MM:SS"), which chunk metadata expects.
+    """
+    preprocessor = preprocessor or MessagePreprocessor()
+    messages = preprocessor.process_messages([
+        (rowid, int(date * 1e9) if date and date < 1e11 else date, text, is_from_me)
+        for rowid, date, text, is_from_me in rows
+    ])
+    messages = [msg for msg in messages if msg['timestamp'] is not None]
+    for msg in messages:
+        msg['timestamp'] = msg['timestamp'].isoformat(sep=' ', timespec='seconds')
+    return messages
+
+def load_contact_messages(contact, db_path=DEFAULT_DB_PATH):
+    """
+    All of a contact's messages from chat.db, preprocessed and in ROWID (time) order.
+    """
+    conn = connect(db_path)
+    try:
+        return process_rows(fetch_messages_since(conn, find_handle_ids(conn, contact)))
+    finally:
+        conn.close()
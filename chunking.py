@@ -1,4 +1,5 @@
 from datetime import datetime, timedelta
+from imessage_insight import instrumentation
 
 # --- Message Chunking Strategies ---
 
@@ -136,6 +137,7 @@ def chunk_by_time_and_fixed(messages, hours_gap=1, max_chunk_size=20):
         })
     return chunks
 
+@instrumentation.timed("chunk_messages")
 def chunk_messages(messages, strategy='time', chunk_size=10, hours_gap=1):
     """
     Main entry point for chunking messages.
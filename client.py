@@ -0,0 +1,119 @@
+# Thin client for the RAG daemon (server.py). Replaces main.py's cold start once the daemon is up.
+# Usage:
+#   python -m imessage_insight.client ask "What gift should I get?" [--top-k 5]
+#   python -m imessage_insight.client chat            # interactive Q&A loop
+#   python -m imessage_insight.client ingest +15551234567
+#   python -m imessage_insight.client health
+# Add --socket /tmp/imessage_rag.sock to talk to a daemon listening on a Unix socket.
+
+import argparse
+import http.client
+import json
+import socket
+import time
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """
+    HTTPConnection over a Unix domain socket.
+    """
+    def __init__(self, path, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+class RAGClient:
+    """
+    JSON client for the daemon. Opens a short-lived local connection per request.
+    """
+    def __init__(self, host="127.0.0.1", port=8750, socket_path=None, timeout=120):
+        self.host = host
+        self.port = port
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def _request(self, method, path, body=None):
+        if self.socket_path:
+            conn = UnixHTTPConnection(self.socket_path, timeout=self.timeout)
+        else:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        try:
+            data = json.dumps(body).encode() if body is not None else None
+            conn.request(method, path, body=data, headers={"Content-Type": "application/json"})
+            response = conn.getresponse()
+            payload = json.loads(response.read() or b"{}")
+            if response.status >= 400 and not (path == "/health" and response.status == 503):
+                raise RuntimeError(f"{path} failed ({response.status}): {payload.get('error')}")
+            return payload
+        finally:
+            conn.close()
+
+    def health(self):
+        return self._request("GET", "/health")
+
+    def wait_until_ready(self, timeout=300, poll=0.2):
+        """
+        Block until the daemon reports ready. Returns seconds waited.
+        """
+        started = time.perf_counter()
+        while time.perf_counter() - started < timeout:
+            try:
+                status = self.health()
+                if status.get("ready"):
+                    return time.perf_counter() - started
+                if status.get("error"):
+                    raise RuntimeError(status["error"])
+            except (ConnectionError, FileNotFoundError, OSError):
+                pass  # Not listening yet
+            time.sleep(poll)
+        raise TimeoutError("RAG daemon did not become ready in time.")
+
+    def ingest(self, contact, strategy="time", chunk_size=10, hours_gap=1.0):
+        return self._request("POST", "/ingest", {"contact": contact, "strategy": strategy,
+                                                 "chunk_size": chunk_size, "hours_gap": hours_gap})
+
+    def retrieve(self, query, top_k=5, start=None, end=None, sender=None):
+        return self._request("POST", "/retrieve", {"query": query, "top_k": top_k, "start": start, "end": end, "sender": sender})
+
+    def answer(self, query, top_k=5, start=None, end=None, sender=None):
+        return self._request("POST", "/answer", {"query": query, "top_k": top_k, "start": start, "end": end, "sender": sender})
+
+def main():
+    parser = argparse.ArgumentParser(description="Client for the iMessage RAG daemon.")
+    parser.add_argument("command", choices=["ask", "chat", "ingest", "health"])
+    parser.add_argument("text", nargs="?", help="Question (ask) or contact (ingest)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8750)
+    parser.add_argument("--socket")
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.command in ("ask", "ingest") and not args.text:
+        parser.error(f"{args.command} needs a {'question' if args.command == 'ask' else 'contact'}")
+    client = RAGClient(args.host, args.port, socket_path=args.socket)
+    if args.command == "health":
+        print(json.dumps(client.health(), indent=2))
+        return
+    client.wait_until_ready()
+    if args.command == "ingest":
+        result = client.ingest(args.text)
+        print(f"Ingested {result['chunks']} chunks from {result['messages']} messages in {result['timings'].get('total', 0):.1f}s")
+        return
+    questions = [args.text] if args.command == "ask" else None
+    while True:
+        query = questions.pop() if questions else input("\nYour question: ").strip()
+        if query.lower() == "exit":
+            break
+        started = time.perf_counter()
+        result = client.answer(query, top_k=args.top_k)
+        print("\n--- Answer ---")
+        print(result["answer"])
+        print(f"\n({time.perf_counter() - started:.2f}s round trip, {result['timings']['total']:.2f}s in daemon)")
+        if args.command == "ask":
+            break
+
+if __name__ == "__main__":
+    main()
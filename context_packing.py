@@ -0,0 +1,121 @@
+from datetime import datetime
+
+# Import tiktoken only if available; fall back to a character-based estimate otherwise
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Context window sizes (tokens) for the chat models this project uses
+MODEL_CONTEXT_WINDOWS = {
+    "gpt-4o": 128000,
+    "gpt-4o-mini": 128000,
+    "gpt-4": 8192,
+    "gpt-3.5-turbo": 16385,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+
+class ContextPacker:
+    """
+    Packs retrieved chunks into a token-budgeted LLM context.
+    Counts tokens with the target model's tokenizer, drops message lines already sent
+    from an overlapping chunk (same text in a chunk of the same contact whose time range
+    overlaps; lines like "ok" repeated on other days are kept), keeps whole messages only (never cuts one mid-line),
+    and lays the packed chunks out chronologically with a date header each.
+    """
+    def __init__(self, llm_model="gpt-4o", max_tokens=1500, reserved_tokens=700):
+        """
+        max_tokens is the context budget; it is capped so that the context plus
+        reserved_tokens (system prompt, question and answer) fits the model's window.
+        """
+        self.llm_model = llm_model
+        window = MODEL_CONTEXT_WINDOWS.get(llm_model, DEFAULT_CONTEXT_WINDOW)
+        self.max_tokens = min(max_tokens, window - reserved_tokens)
+        self.encoding = None
+        if tiktoken is not None:
+            try:
+                self.encoding = tiktoken.encoding_for_model(llm_model)
+            except KeyError:
+                self.encoding = tiktoken.get_encoding("cl100k_base")
+
+    def count_tokens(self, text):
+        """
+        Number of tokens in text for the target model (estimated at ~4 chars/token without tiktoken).
+        """
+        if self.encoding is not None:
+            return len(self.encoding.encode(text))
+        return len(text) // 4 + 1
+
+    def _chunk_time(self, result):
+        """
+        Sort key placing chunks in chronological order (unknown dates last).
+        """
+        meta = result.get("metadata") or {}
+        ts = meta.get("start_date_ts")
+        if isinstance(ts, (int, float)):
+            return ts
+        try:
+            return datetime.fromisoformat(str(meta.get("start_date"))).timestamp()
+        except ValueError:
+            return float("inf")
+
+    def _chunk_span(self, result):
+        """
+        (contact, start_ts, end_ts) of a chunk, or None if its start time is unknown.
+        """
+        meta = result.get("metadata") or {}
+        start = self._chunk_time(result)
+        if start == float("inf"):
+            return None
+        end = meta.get("end_date_ts")
+        return meta.get("contact"), start, end if isinstance(end, (int, float)) else start
+
+    def pack(self, retrieved, max_tokens=None):
+        """
+        Pack retrieved results (most relevant first) into a context string.
+        Chunks claim budget in relevance order; each contributes whole, not-yet-seen message
+        lines until the next line would exceed the budget. Returns (context, token_count).
+        """
+        budget = self.max_tokens if max_tokens is None else min(max_tokens, self.max_tokens)
+        separator_tokens = self.count_tokens("\n---\n")
+        seen_ids = set()
+        seen_lines = {}  # line text -> spans of the packed chunks that contained it
+        packed = []  # (result, header, lines)
+        used = 0
+        for result in retrieved:
+            if result.get("id") is not None:
+                if result["id"] in seen_ids:
+                    continue
+                seen_ids.add(result["id"])
+            meta = result.get("metadata") or {}
+            span = self._chunk_span(result)
+            header = f"[{meta['start_date']}]" if meta.get("start_date") else ""
+            cost = self.count_tokens(header) + (separator_tokens if packed else 0)
+            lines = []
+            for line in result["text"].split("\n"):
+                if not line.strip() or self._seen(seen_lines.get(line, ()), span):
+                    continue
+                line_tokens = self.count_tokens(line) + 1  # + newline
+                if used + cost + line_tokens > budget:
+                    break
+                lines.append(line)
+                cost += line_tokens
+            if lines:
+                for line in lines:
+                    seen_lines.setdefault(line, []).append(span)
+                packed.append((result, header, lines))
+                used += cost
+        packed.sort(key=lambda item: self._chunk_time(item[0]))
+        context = "\n---\n".join("\n".join(([header] if header else []) + lines) for _, header, lines in packed)
+        return context, used
+
+    @staticmethod
+    def _seen(spans, span):
+        """
+        Was a line already packed from a chunk overlapping `span` (same contact, overlapping time)?
+        """
+        if span is None:
+            return False
+        contact, start, end = span
+        return any(other is not None and other[0] == contact and other[1] <= end and start <= other[2]
+                   for other in spans)
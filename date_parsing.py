@@ -0,0 +1,219 @@
+import re
+from datetime import datetime, timedelta
+
+# --- Natural-Language Date Ranges ---
+# Turns date expressions in a question into a (start, end) datetime range, fully offline.
+# Ranges are inclusive and use naive local time, matching the chunk timestamps.
+
+MONTHS = {
+    "january": 1, "jan": 1, "february": 2, "feb": 2, "march": 3, "mar": 3, "april": 4, "apr": 4,
+    "may": 5, "june": 6, "jun": 6, "july": 7, "jul": 7, "august": 8, "aug": 8,
+    "september": 9, "sep": 9, "sept": 9, "october": 10, "oct": 10, "november": 11, "nov": 11,
+    "december": 12, "dec": 12,
+}
+MONTH_RE = "|".join(sorted(MONTHS, key=len, reverse=True))
+UNIT_RE = r"(day|week|month|year)s?"
+NUMBER_WORDS = {"a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+                "seven": 7, "eight": 8, "nine": 9, "ten": 10, "couple of": 2, "few": 3}
+NUMBER_RE = r"(\d+|" + "|".join(sorted(NUMBER_WORDS, key=len, reverse=True)) + ")"
+# A four-digit year not followed by a unit, so "2000 dollars" or "1920 broadway st" stays a number
+YEAR_RE = r"(?:19|20)\d{2}(?!\s*(?:dollars|bucks|usd|euros|pounds|k\b|people|miles|km|calories|words|steps|times|\w+ (?:st|street|ave|avenue|rd|road)\b))"
+# Prepositions that make a bare year a date: "in 2021", "during 2019", "summer of 2018"
+YEAR_CONTEXT_RE = r"(?:in|during|of|around|throughout|back in|since|from|until|before|after)"
+
+def _day_start(dt):
+    return dt.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def _add_months(dt, months):
+    """
+    Shift by whole months, clamping the day to the target month's length.
+    """
+    month_index = dt.year * 12 + dt.month - 1 + months
+    year, month = month_index // 12, month_index % 12 + 1
+    days_in_month = ((datetime(year + month // 12, month % 12 + 1, 1)) - datetime(year, month, 1)).days
+    return dt.replace(year=year, month=month, day=min(dt.day, days_in_month))
+
+def _period(start, unit, count=1):
+    """
+    Inclusive range covering `count` units starting at `start`.
+    """
+    if unit == "day":
+        end = start + timedelta(days=count)
+    elif unit == "week":
+        end = start + timedelta(weeks=count)
+    elif unit == "month":
+        end = _add_months(start, count)
+    else:
+        end = start.replace(year=start.year + count)
+    return start, end - timedelta(microseconds=1)
+
+def _unit_start(now, unit):
+    """
+    Start of the calendar day/week (Monday)/month/year containing now.
+    """
+    day = _day_start(now)
+    if unit == "day":
+        return day
+    if unit == "week":
+        return day - timedelta(days=day.weekday())
+    if unit == "month":
+        return day.replace(day=1)
+    return day.replace(month=1, day=1)
+
+def _shift(dt, unit, count):
+    if unit == "day":
+        return dt + timedelta(days=count)
+    if unit == "week":
+        return dt + timedelta(weeks=count)
+    if unit == "month":
+        return _add_months(dt, count)
+    return dt.replace(year=dt.year + count)
+
+def _number(text):
+    return int(text) if text.isdigit() else NUMBER_WORDS[text]
+
+def _month_range(month, year, now, qualifier):
+    """
+    Range for a named month. Without a year, 'last <month>' is the most recent one strictly
+    before the current month; a bare '<month>' or 'this <month>' is the most recent one
+    including the current month.
+    """
+    if year is None:
+        year = now.year
+        if month > now.month or (qualifier == "last" and month == now.month):
+            year -= 1
+    return _period(datetime(year, month, 1), "month")
+
+def _day_range(month, day, year, now):
+    """
+    Range for one calendar day. Without a year, the most recent such day up to today.
+    """
+    year = int(year) if year else (now.year if (month, day) <= (now.month, now.day) else now.year - 1)
+    try:
+        return _period(datetime(year, month, day), "day")
+    except ValueError:
+        return None
+
+def _parse_point(text, now):
+    """
+    Parse a single date reference ('2022', 'march 2021', 'june', 'march 5th', 'the 4th of july',
+    '2023-05-04') to the range it names.
+    """
+    text = text.strip()
+    m = re.fullmatch(r"(\d{4})-(\d{2})-(\d{2})", text)
+    if m:
+        return _period(datetime(int(m.group(1)), int(m.group(2)), int(m.group(3))), "day")
+    m = re.fullmatch(rf"({MONTH_RE})\.? (\d{{1,2}})(?:st|nd|rd|th)?(?:,? (\d{{4}}))?", text)
+    if m:
+        return _day_range(MONTHS[m.group(1)], int(m.group(2)), m.group(3), now)
+    m = re.fullmatch(rf"(?:the )?(\d{{1,2}})(?:(?:st|nd|rd|th)(?: of)?| of) ({MONTH_RE})\.?(?:,? (\d{{4}}))?", text)
+    if m:
+        return _day_range(MONTHS[m.group(2)], int(m.group(1)), m.group(3), now)
+    m = re.fullmatch(rf"(last |this )?({MONTH_RE})\.?(?:,? (\d{{4}}))?", text)
+    if m:
+        year = int(m.group(3)) if m.group(3) else None
+        return _month_range(MONTHS[m.group(2)], year, now, (m.group(1) or "").strip())
+    m = re.fullmatch(r"((?:19|20)\d{2})", text)
+    if m:
+        return _period(datetime(int(m.group(1)), 1, 1), "year")
+    return None
+
+POINT_RE = rf"(?:\d{{4}}-\d{{2}}-\d{{2}}|(?:{MONTH_RE})\.? \d{{1,2}}(?:st|nd|rd|th)?(?:,? \d{{4}})?|(?:the )?\d{{1,2}}(?:(?:st|nd|rd|th)(?: of)?| of) (?:{MONTH_RE})\.?(?:,? \d{{4}})?|(?:last |this )?(?:{MONTH_RE})\.?(?:,? \d{{4}})?|{YEAR_RE})"
+
+def _parse_range(first, second, now):
+    """
+    Inclusive range from the start of `first` to the end of `second` ('between march and may 2023').
+    A first point without a year takes the second's year, or the year before when that would
+    start the range after its end.
+    """
+    end = _parse_point(second, now)
+    if end is None:
+        return None
+    start = None
+    if not re.search(r"\d{4}", first):
+        for year in (end[1].year, end[1].year - 1):
+            start = _parse_point(f"{first} {year}", now)
+            if start is not None and start[0] <= end[1]:
+                break
+    if start is None or start[0] > end[1]:
+        start = _parse_point(first, now)
+    if start is None or start[0] > end[1]:
+        return None
+    return start[0], end[1]
+
+def extract_date_range(question, now=None):
+    """
+    Find the first date expression in a question and return it as (start, end) datetimes.
+    Either bound may be None for open ranges ('since March', 'before 2020').
+    Returns (None, None) if the question has no recognizable date expression.
+    """
+    now = now or datetime.now()
+    q = " ".join(question.lower().split())
+
+    # Two-sided ranges first, so "from X to Y" isn't read as the open range "from X"
+    m = re.search(rf"\b(?:between ({POINT_RE}) and|from ({POINT_RE}) (?:to|until|till|through|thru)) ({POINT_RE})\b", q)
+    if m:
+        time_range = _parse_range(m.group(1) or m.group(2), m.group(3), now)
+        if time_range:
+            return time_range
+
+    # Open ranges: "since ...", "after ...", "before ..." ("after"/"before" exclude the point itself)
+    m = re.search(rf"\b(since|after|from) ({POINT_RE})\b", q)
+    if m:
+        point = _parse_point(m.group(2), now)
+        if point:
+            return (point[0] if m.group(1) != "after" else point[1] + timedelta(microseconds=1), None)
+    m = re.search(rf"\b(before|until|till) ({POINT_RE})\b", q)
+    if m:
+        point = _parse_point(m.group(2), now)
+        if point:
+            return (None, point[0] - timedelta(microseconds=1) if m.group(1) == "before" else point[1])
+
+    # Relative days
+    if re.search(r"\btoday\b|\btonight\b|\bthis morning\b", q):
+        return _period(_day_start(now), "day")
+    if re.search(r"\byesterday\b|\blast night\b", q):
+        return _period(_day_start(now) - timedelta(days=1), "day")
+
+    # "past/last 3 weeks", "in the last few days": rolling window ending now.
+    # Not "the last 2 days of the trip" / "the last day of school", which name part of an event.
+    m = re.search(rf"\b(?:past|last|previous) {NUMBER_RE} {UNIT_RE}\b(?! of\b)", q)
+    if m:
+        return _shift(_day_start(now), m.group(2), -_number(m.group(1))), now
+    # "3 weeks ago", "a year ago": the unit-long window that far back
+    m = re.search(rf"\b{NUMBER_RE} {UNIT_RE} ago\b", q)
+    if m:
+        unit = m.group(2)
+        start = _shift(_unit_start(now, unit), unit, -_number(m.group(1)))
+        return _period(start, unit)
+    # "last week", "this month", "last year" ("last day" is nearly always "the last day of ...")
+    m = re.search(rf"\b(last|this|past|previous) (week|month|year)\b(?! of\b)", q)
+    if m:
+        unit = m.group(2)
+        offset = 0 if m.group(1) == "this" else -1
+        return _period(_shift(_unit_start(now, unit), unit, offset), unit)
+
+    # Specific day: "on march 5th", "march 5, 2022", "the 4th of july"
+    m = re.search(rf"\b(?:({MONTH_RE})\.? (\d{{1,2}})(?:st|nd|rd|th)?|(\d{{1,2}})(?:(?:st|nd|rd|th)(?: of)?| of) "
+                  rf"({MONTH_RE})\.?)(?:,? (\d{{4}}))?\b", q)
+    if m:
+        month, day = (m.group(1), m.group(2)) if m.group(1) else (m.group(4), m.group(3))
+        point = _day_range(MONTHS[month], int(day), m.group(5), now)
+        if point:
+            return point
+
+    # Named months and years: "last december", "in march 2021", "in 2022", ISO dates.
+    # A bare month name needs a preposition or a year so words like "may" aren't read as dates,
+    # and a bare year needs a preposition so amounts and street numbers aren't either.
+    m = re.search(rf"\b(?:in|during|of|around|over) ((?:{MONTH_RE})\.?)(?!,? \d{{4}})\b", q)
+    if m:
+        return _month_range(MONTHS[m.group(1).rstrip(".")], None, now, "")
+    m = re.search(rf"\b(?:\d{{4}}-\d{{2}}-\d{{2}}|(?:last |this )(?:{MONTH_RE})\b|(?:{MONTH_RE})\.?,? \d{{4}})\b", q)
+    if m:
+        point = _parse_point(m.group(0), now)
+        if point:
+            return point
+    m = re.search(rf"\b{YEAR_CONTEXT_RE} ({YEAR_RE})\b", q)
+    if m:
+        return _parse_point(m.group(1), now)
+    return None, None
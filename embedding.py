@@ -1,6 +1,7 @@
 from sentence_transformers import SentenceTransformer
 import numpy as np
 import os
+from imessage_insight import instrumentation
 
 # Import OpenAIEmbeddings only if needed to avoid unnecessary dependency for local users
 try:
@@ -12,23 +13,27 @@ class MessageEmbedder:
     """
     Handles embedding generation for message chunks using SentenceTransformers or OpenAI.
     """
-    def __init__(self, model_name='all-MiniLM-L6-v2', backend='sentence_transformers'):
+    def __init__(self, model_name=None, backend='sentence_transformers'):
         """
         Initialize the embedding model. backend: 'sentence_transformers' or 'openai'.
+        model_name defaults to all-MiniLM-L6-v2 for sentence_transformers and
+        text-embedding-ada-002 for openai; it names the model that actually embeds.
         """
         self.backend = backend
-        self.model_name = model_name
         if backend == 'sentence_transformers':
-            print(f"Loading embedding model: {model_name}")
-            self.model = SentenceTransformer(model_name)
+            self.model_name = model_name or 'all-MiniLM-L6-v2'
+            print(f"Loading embedding model: {self.model_name}")
+            self.model = SentenceTransformer(self.model_name)
         elif backend == 'openai':
             if OpenAIEmbeddings is None:
                 raise ImportError("langchain_openai is not installed. Please install it to use OpenAI embeddings.")
-            print("Using OpenAIEmbeddings (text-embedding-ada-002)")
-            self.model = OpenAIEmbeddings()
+            self.model_name = model_name or 'text-embedding-ada-002'
+            print(f"Using OpenAIEmbeddings ({self.model_name})")
+            self.model = OpenAIEmbeddings(model=self.model_name)
         else:
             raise ValueError(f"Unknown backend: {backend}")
 
+    @instrumentation.timed("generate_embeddings")
     def generate_embeddings(self, chunks):
         """
         Generate embeddings for a list of message chunks.
@@ -45,8 +50,29 @@ class MessageEmbedder:
             raise ValueError(f"Unknown backend: {self.backend}")
         for i, chunk in enumerate(chunks):
             chunk['embedding'] = embeddings[i] if isinstance(embeddings[i], list) else embeddings[i].tolist()
+        instrumentation.counter("chunks_embedded_total", len(chunks), backend=self.backend)
         return chunks
 
+    @instrumentation.timed("embed_query")
+    def embed_query(self, text):
+        """
+        Embed a single query string with the same backend used for the chunks.
+        Returns the embedding as a list.
+        """
+        if self.backend == 'openai':
+            return self.model.embed_query(text)
+        return self.model.encode([text])[0].tolist()
+
+    @instrumentation.timed("embed_queries")
+    def embed_queries(self, texts):
+        """
+        Embed many query strings in a single model call.
+        Returns a list of embeddings (lists).
+        """
+        if self.backend == 'openai':
+            return self.model.embed_documents(texts)
+        return [vec.tolist() for vec in self.model.encode(texts)]
+
     def get_dimension(self):
         if self.backend == 'sentence_transformers':
             return self.model.get_sentence_embedding_dimension()
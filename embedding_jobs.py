@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+import time
+import numpy as np
+from imessage_insight import instrumentation
+
+MANIFEST = "manifest.json"
+
+def text_hash(text):
+    return hashlib.sha1(text.encode()).hexdigest()[:16]
+
+def read_manifest(job_dir):
+    """
+    The manifest of a job directory, or None if no job has started there.
+    Safe to call from another process while the job runs.
+    """
+    try:
+        with open(os.path.join(job_dir, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def format_progress(manifest):
+    total = manifest.get("total")
+    done = manifest["embedded"] + manifest["resumed"]
+    progress = f"{done}/{total} chunks ({done / total:.0%})" if total else f"{done} chunks"
+    return (f"{manifest['status']}: {progress}, {len(manifest['batches'])} batches checkpointed, "
+            f"{manifest['resumed']} resumed from an earlier run")
+
+class EmbeddingJob:
+    """
+    Checkpointed embedding for long ingests. Every completed batch is written to the job
+    directory (batch_NNNNN.npy with the vectors, batch_NNNNN.json with chunk ids and text hashes)
+    before the manifest lists it, so a job killed by an API error, Ctrl-C or OOM loses at most
+    the batch in flight. Re-running with the same job directory reuses every checkpointed
+    vector whose chunk id and text are unchanged and embeds only the rest.
+    The manifest (manifest.json) is rewritten after each batch and doubles as a progress report.
+    """
+    def __init__(self, job_dir, embedder, batch_size=256, verbose=True):
+        self.job_dir = job_dir
+        self.embedder = embedder
+        self.batch_size = batch_size
+        self.verbose = verbose
+        os.makedirs(job_dir, exist_ok=True)
+        model = f"{embedder.backend}:{getattr(embedder, 'model_name', '')}"
+        self.manifest = read_manifest(job_dir)
+        if self.manifest is not None and self.manifest["model"] != model:
+            raise ValueError(f"Embedding job in {job_dir} was started with {self.manifest['model']}, not {model}; "
+                             f"remove it or use another job directory")
+        if self.manifest is None:
+            self.manifest = {"model": model, "status": "running", "total": None, "embedded": 0, "resumed": 0,
+                             "batches": [], "started": time.time(), "updated": time.time(), "error": None}
+        else:
+            self.manifest.update(status="running", embedded=0, resumed=0, error=None)
+        # chunk id -> (text hash, batch name, row) of every checkpointed vector
+        self._index = {}
+        for name in self.manifest["batches"]:
+            with open(os.path.join(job_dir, f"{name}.json")) as f:
+                entries = json.load(f)
+            for row, (chunk_id, digest) in enumerate(zip(entries["ids"], entries["hashes"])):
+                self._index[chunk_id] = (digest, name, row)
+        self._arrays = {}
+        self._started = time.perf_counter()
+
+    def __len__(self):
+        return len(self._index)
+
+    def _vectors(self, name):
+        if name not in self._arrays:
+            self._arrays[name] = np.load(os.path.join(self.job_dir, f"{name}.npy"), mmap_mode="r")
+        return self._arrays[name]
+
+    def _write_json(self, path, data):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def _save_manifest(self):
+        self.manifest["updated"] = time.time()
+        self._write_json(os.path.join(self.job_dir, MANIFEST), self.manifest)
+
+    def _checkpoint(self, batch):
+        name = f"batch_{len(self.manifest['batches']):05d}"
+        vectors = np.asarray([chunk['embedding'] for chunk in batch], dtype=np.float32)
+        with open(os.path.join(self.job_dir, f"{name}.npy.tmp"), "wb") as f:
+            np.save(f, vectors)
+        os.replace(os.path.join(self.job_dir, f"{name}.npy.tmp"), os.path.join(self.job_dir, f"{name}.npy"))
+        ids, hashes = [str(chunk['id']) for chunk in batch], [text_hash(chunk['text']) for chunk in batch]
+        self._write_json(os.path.join(self.job_dir, f"{name}.json"), {"ids": ids, "hashes": hashes})
+        # Only a batch listed in the manifest counts as done
+        self.manifest["batches"].append(name)
+        self.manifest["embedded"] += len(batch)
+        self._save_manifest()
+        for row, (chunk_id, digest) in enumerate(zip(ids, hashes)):
+            self._index[chunk_id] = (digest, name, row)
+
+    def _report(self):
+        if not self.verbose:
+            return
+        line = format_progress(self.manifest)
+        total, done = self.manifest.get("total"), self.manifest["embedded"] + self.manifest["resumed"]
+        elapsed = time.perf_counter() - self._started
+        if total and self.manifest["embedded"] and done < total:
+            eta = elapsed / self.manifest["embedded"] * (total - done)
+            line += f", ~{eta:.0f}s left"
+        print(f"Embedding job: {line}")
+
+    def embed(self, chunks, total=None):
+        """
+        Add an 'embedding' to every chunk (each needs an 'id' and 'text'), from a checkpoint
+        when one matches, otherwise from the embedder in checkpointed batches.
+        total (chunks expected over the whole job) is only used for progress reporting.
+        Returns the chunks.
+        """
+        if total is not None:
+            self.manifest["total"] = total
+        pending = []
+        for chunk in chunks:
+            entry = self._index.get(str(chunk['id']))
+            if entry is not None and entry[0] == text_hash(chunk['text']):
+                chunk['embedding'] = self._vectors(entry[1])[entry[2]].tolist()
+                self.manifest["resumed"] += 1
+            else:
+                pending.append(chunk)
+        instrumentation.counter("embedding_job_chunks_total", len(chunks) - len(pending), source="checkpoint")
+        if len(pending) < len(chunks):
+            self._save_manifest()
+            self._report()
+        try:
+            for i in range(0, len(pending), self.batch_size):
+                batch = self.embedder.generate_embeddings(pending[i:i + self.batch_size])
+                self._checkpoint(batch)
+                instrumentation.counter("embedding_job_chunks_total", len(batch), source="embedder")
+                self._report()
+        except BaseException as e:
+            # Ctrl-C, API errors, ...: record where the job stopped, then let it propagate
+            self.manifest.update(status="interrupted", error=f"{type(e).__name__}: {e}")
+            self._save_manifest()
+            raise
+        return chunks
+
+    def finish(self, cleanup=True):
+        """
+        Mark the job complete once its chunks are safely in the vector store. With cleanup
+        the checkpointed vectors are deleted; the manifest stays as a record of the run.
+        """
+        self.manifest["status"] = "complete"
+        if cleanup:
+            self._arrays.clear()
+            for name in self.manifest["batches"]:
+                for ext in (".npy", ".json"):
+                    path = os.path.join(self.job_dir, name + ext)
+                    if os.path.exists(path):
+                        os.remove(path)
+            self.manifest["batches"] = []
+            self._index = {}
+        self._save_manifest()
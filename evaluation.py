@@ -0,0 +1,153 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+# --- Question Sets ---
+def load_questions(path):
+    """
+    Load a JSONL question set. Each line is an object with a 'question' and, optionally,
+    'expected_ids' (chunk ids that should be retrieved) and start/end/sender filters.
+    """
+    questions = []
+    with open(path) as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            if "question" not in item:
+                raise ValueError(f"{path}:{line_no}: missing 'question'")
+            item["expected_ids"] = [str(i) for i in item.get("expected_ids", [])]
+            questions.append(item)
+    return questions
+
+# --- Metrics ---
+def recall_at_k(expected_ids, retrieved_ids, k):
+    """
+    Fraction of expected ids found in the first k retrieved ids.
+    """
+    if not expected_ids:
+        return None
+    return len(set(expected_ids).intersection(retrieved_ids[:k])) / len(expected_ids)
+
+def reciprocal_rank(expected_ids, retrieved_ids):
+    """
+    1 / rank of the first retrieved id that is expected (0 if none is).
+    """
+    if not expected_ids:
+        return None
+    for rank, doc_id in enumerate(retrieved_ids, start=1):
+        if doc_id in expected_ids:
+            return 1.0 / rank
+    return 0.0
+
+def percentiles(values, points=(50, 90, 99)):
+    """
+    Latency percentiles in milliseconds for a list of durations in seconds.
+    """
+    if not values:
+        return {}
+    arr = np.asarray(values) * 1000
+    return {f"p{p}": float(np.percentile(arr, p)) for p in points}
+
+# --- Harness ---
+class EvaluationHarness:
+    """
+    Runs a question set through a RAGPipeline and reports retrieval quality
+    (recall@k, MRR), per-stage latency percentiles and throughput.
+    Questions run closed-loop with `concurrency` workers, or open-loop at a fixed
+    request rate (questions/sec) for load testing. Point the pipeline at the local
+    stub LLM (llm_base_url) to measure everything but the model.
+    """
+    def __init__(self, rag, top_k=5, concurrency=1, rate=None):
+        self.rag = rag
+        self.top_k = top_k
+        self.concurrency = concurrency
+        self.rate = rate
+
+    def _run_one(self, item, scheduled_at=None):
+        started = time.perf_counter()
+        result = self.rag.answer_query(
+            item["question"], top_k=self.top_k,
+            start=item.get("start"), end=item.get("end"), sender=item.get("sender")
+        )
+        timings = dict(result["timings"])
+        if scheduled_at is not None:
+            # Open-loop: latency as seen by the caller includes time queued behind busy workers
+            timings["queue"] = started - scheduled_at
+            timings["total"] += timings["queue"]
+        retrieved_ids = [str(r["id"]) for r in result["retrieved"]]
+        return {
+            "question": item["question"],
+            "answer": result["answer"],
+            "retrieved_ids": retrieved_ids,
+            "recall": recall_at_k(item["expected_ids"], retrieved_ids, self.top_k),
+            "rr": reciprocal_rank(item["expected_ids"], retrieved_ids),
+            "context_tokens": result["context_tokens"],
+            "timings": timings
+        }
+
+    def run(self, questions):
+        """
+        Run all questions and return (per-question records, summary report dict).
+        """
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            if self.rate:
+                futures = []
+                for i, item in enumerate(questions):
+                    scheduled_at = started + i / self.rate
+                    delay = scheduled_at - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    futures.append(pool.submit(self._run_one, item, scheduled_at))
+                records = [f.result() for f in futures]
+            else:
+                records = list(pool.map(self._run_one, questions))
+        wall = time.perf_counter() - started
+        return records, self.summarize(records, wall)
+
+    def summarize(self, records, wall):
+        """
+        Aggregate per-question records into a report.
+        """
+        recalls = [r["recall"] for r in records if r["recall"] is not None]
+        rrs = [r["rr"] for r in records if r["rr"] is not None]
+        stages = {}
+        for record in records:
+            for stage, seconds in record["timings"].items():
+                stages.setdefault(stage, []).append(seconds)
+        tokens = [r["context_tokens"] for r in records if r["context_tokens"] is not None]
+        return {
+            "questions": len(records),
+            "top_k": self.top_k,
+            f"recall@{self.top_k}": float(np.mean(recalls)) if recalls else None,
+            "mrr": float(np.mean(rrs)) if rrs else None,
+            "labelled_questions": len(recalls),
+            "mean_context_tokens": float(np.mean(tokens)) if tokens else None,
+            "latency_ms": {stage: percentiles(values) for stage, values in stages.items()},
+            "wall_seconds": wall,
+            "throughput_qps": len(records) / wall if wall > 0 else 0.0,
+            "target_rate_qps": self.rate
+        }
+
+def format_report(report):
+    """
+    Render a summary report as a readable text table.
+    """
+    lines = [f"Questions: {report['questions']} (labelled: {report['labelled_questions']})"]
+    recall = report[f"recall@{report['top_k']}"]
+    if recall is not None:
+        lines.append(f"Recall@{report['top_k']}: {recall:.3f}   MRR: {report['mrr']:.3f}")
+    if report["mean_context_tokens"] is not None:
+        lines.append(f"Mean context tokens: {report['mean_context_tokens']:.0f}")
+    rate = f" (target {report['target_rate_qps']} q/s)" if report["target_rate_qps"] else ""
+    lines.append(f"Throughput: {report['throughput_qps']:.2f} q/s over {report['wall_seconds']:.1f}s{rate}")
+    lines.append("")
+    lines.append(f"{'stage':<10} {'p50 ms':>10} {'p90 ms':>10} {'p99 ms':>10}")
+    lines.append('-' * 43)
+    for stage, pct in report["latency_ms"].items():
+        lines.append(f"{stage:<10} {pct['p50']:>10.1f} {pct['p90']:>10.1f} {pct['p99']:>10.1f}")
+    return "\n".join(lines)
@@ -0,0 +1,114 @@
+import heapq
+import time
+from concurrent.futures import ThreadPoolExecutor
+from imessage_insight.ranking import normalize_scores
+from imessage_insight.vector_store import ChromaVectorStore
+
+class FederatedRetriever:
+    """
+    Searches several ChromaVectorStore collections (e.g. per-contact collections, or the
+    MiniLM and OpenAI collections) for one question and merges them into a global top_k.
+    Every distinct embedder embeds the question once; with several embedders (e.g. a local
+    model and the OpenAI API) those embeddings run concurrently. The shard searches themselves
+    run one after another: Chroma's HNSW search holds the GIL, so threads add overhead without
+    overlapping them, and latency is roughly the sum of the shards. Results are merged with a
+    heap on their scores and each result is labelled with its shard in 'source'.
+    Use as a context manager, or call close(), to stop the embedding threads.
+    """
+    def __init__(self, shards, normalization="auto", fetch_k=20):
+        """
+        shards: list of (label, ChromaVectorStore, embedder) tuples.
+        normalization: 'zscore' or 'minmax' rescale each shard's scores before merging, None merges
+        raw scores. 'auto' keeps raw scores when every shard uses the same embedding model (cosine
+        scores are then directly comparable, and standardizing would promote a shard whose best
+        matches are weak) and z-scores otherwise.
+        fetch_k candidates per shard give the score normalization a stable baseline.
+        """
+        if not shards:
+            raise ValueError("FederatedRetriever requires at least one shard.")
+        self.shards = shards
+        if normalization == "auto":
+            models = {(embedder.backend, getattr(embedder, "model_name", None)) for _, _, embedder in shards}
+            normalization = None if len(models) == 1 else "zscore"
+        self.normalization = normalization
+        self.fetch_k = fetch_k
+        embedders = {id(embedder) for _, _, embedder in shards}
+        self.pool = ThreadPoolExecutor(max_workers=len(embedders)) if len(embedders) > 1 else None
+
+    @property
+    def stores(self):
+        return [store for _, store, _ in self.shards]
+
+    def _embed(self, query, query_embeddings):
+        """
+        id(embedder) -> query embedding for every shard's embedder, reusing query_embeddings.
+        """
+        embeddings = dict(query_embeddings or {})
+        pending = {}
+        for _, _, embedder in self.shards:
+            key = id(embedder)
+            if key in embeddings or key in pending:
+                continue
+            if self.pool is not None:
+                pending[key] = self.pool.submit(embedder.embed_query, query)
+            else:
+                embeddings[key] = embedder.embed_query(query)
+        embeddings.update((key, future.result()) for key, future in pending.items())
+        return embeddings
+
+    def search(self, query, top_k=5, start=None, end=None, sender=None, timings=None, query_embeddings=None):
+        """
+        Search every shard and return the merged top_k results.
+        If a timings dict is given, it receives per-shard and total seconds.
+        query_embeddings optionally maps id(embedder) to an already computed query embedding.
+        """
+        started = time.perf_counter()
+        embeddings = self._embed(query, query_embeddings)
+        merged = []
+        for label, store, embedder in self.shards:
+            shard_start = time.perf_counter()
+            results = store.query(embeddings[id(embedder)], top_k=max(top_k, self.fetch_k),
+                                  start=start, end=end, sender=sender)
+            if self.normalization is not None:
+                results = normalize_scores(results, self.normalization)
+            for result in results:
+                result["source"] = label
+            merged.extend(results)
+            if timings is not None:
+                timings[label] = time.perf_counter() - shard_start
+        top = heapq.nlargest(top_k, merged, key=lambda r: r["score"])
+        if timings is not None:
+            timings["total"] = time.perf_counter() - started
+        return top
+
+    def close(self):
+        """
+        Shut down the embedding threads (if any).
+        """
+        if self.pool is not None:
+            self.pool.shutdown(wait=True)
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def build_shards(specs, persist_dir, embedder):
+    """
+    Shards for 'collection' or 'collection:backend' specs (as given to --federate).
+    Collections without a backend are searched with `embedder`; each other backend gets
+    one MessageEmbedder. Missing collections raise ValueError instead of being created.
+    """
+    embedders = {embedder.backend: embedder}
+    shards = []
+    for spec in specs:
+        collection, _, backend = spec.partition(":")
+        backend = backend or embedder.backend
+        if backend not in embedders:
+            from imessage_insight.embedding import MessageEmbedder
+            embedders[backend] = MessageEmbedder(backend=backend)
+        store = ChromaVectorStore(collection_name=collection, persist_dir=persist_dir, create=False)
+        shards.append((collection, store, embedders[backend]))
+    return shards
@@ -0,0 +1,25 @@
+import contextlib
+import os
+
+# Advisory locks are POSIX-only; elsewhere the lock is a no-op and writers must not overlap
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+@contextlib.contextmanager
+def exclusive_lock(path):
+    """
+    Hold an exclusive advisory lock on `path` (created if needed) for the duration of the block.
+    Serializes read-modify-write of sidecar files between processes sharing a persist dir,
+    e.g. the daemon and a watcher both writing to one collection.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
@@ -0,0 +1,170 @@
+import gc
+import os
+import time
+from imessage_insight import chat_db
+from imessage_insight.utils import normalize
+from imessage_insight.chunking import chunk_messages
+from imessage_insight.embedding_jobs import EmbeddingJob
+from imessage_insight.memory import MB, BatchSizer, current_rss
+
+def job_dir_for(store, contact):
+    """
+    Default checkpoint directory of a contact's embedding job, next to the collection's data.
+    """
+    return os.path.join(os.path.dirname(store._version_path), f"{store.collection.name}.embed.{normalize(contact)}")
+
+def assign_rowid_ids(chunks, messages, contact):
+    """
+    Give chunks built from chat.db rows stable ids from their first message's ROWID,
+    so re-chunking a range that starts at the same message replaces the same chunk.
+    """
+    offset = 0
+    for chunk in chunks:
+        first_rowid = messages[offset]['id']
+        offset += chunk['metadata']['message_count']
+        chunk['id'] = f"{normalize(contact)}:r{first_rowid}"
+        chunk['metadata']['contact'] = normalize(contact)
+        chunk['metadata']['first_rowid'] = first_rowid
+    return chunks
+
+def remove_stale_chunks(store, contact, keep_ids):
+    """
+    After a full re-ingest of a contact, delete its chunks that the run did not write:
+    chunks from an earlier chunking of the same messages, and chunks stored under the old
+    position-based ids ("<contact>:<n>"), which would otherwise duplicate the ROWID-keyed ones.
+    Returns the number deleted.
+    """
+    stored = store.collection.get(where={"contact": normalize(contact)}, include=[])["ids"]
+    return store.delete_chunks(ids=[doc_id for doc_id in stored if doc_id not in keep_ids])
+
+def ingest_contact(contact, store, embedder, db_path=chat_db.DEFAULT_DB_PATH, strategy='time', chunk_size=10,
+                   hours_gap=1.0, job_dir=None):
+    """
+    Fetch, preprocess, chunk, embed and upsert one contact's messages into a vector store.
+    Chunks are tagged with the normalized contact (for sender filtering) and keyed by their
+    first message's ROWID, like the paged ingest and the watcher, so every path updates the
+    same chunks; the contact's chunks this run did not produce are removed.
+    With job_dir, embedding runs as a checkpointed EmbeddingJob that a re-run resumes after
+    a crash. Returns a dict with counts and per-stage seconds.
+    """
+    timings = {}
+    started = time.perf_counter()
+    processed = chat_db.load_contact_messages(contact, db_path=db_path)
+    print(f"Total processed messages: {len(processed)}")
+    timings["fetch"] = time.perf_counter() - started
+    if not processed:
+        return {"messages": 0, "chunks": 0, "timings": timings}
+    stage_start = time.perf_counter()
+    chunks = assign_rowid_ids(chunk_messages(processed, strategy=strategy, chunk_size=chunk_size,
+                                             hours_gap=hours_gap), processed, contact)
+    timings["chunk"] = time.perf_counter() - stage_start
+    stage_start = time.perf_counter()
+    job = EmbeddingJob(job_dir, embedder) if job_dir else None
+    if job is not None:
+        chunks = job.embed(chunks, total=len(chunks))
+    else:
+        chunks = embedder.generate_embeddings(chunks)
+    timings["embed"] = time.perf_counter() - stage_start
+    stage_start = time.perf_counter()
+    store.add_chunks(chunks, upsert=True)
+    remove_stale_chunks(store, contact, {chunk['id'] for chunk in chunks})
+    timings["store"] = time.perf_counter() - stage_start
+    if job is not None:
+        job.finish()
+    timings["total"] = time.perf_counter() - started
+    return {"messages": len(processed), "chunks": len(chunks), "timings": timings}
+
+def ingest_contact_paged(contact, store, embedder, db_path=chat_db.DEFAULT_DB_PATH, strategy='time',
+                         chunk_size=10, hours_gap=1.0, memory_budget=None, page_size=20000, embed_batch=256,
+                         job_dir=None):
+    """
+    Ingest one contact from chat.db in ROWID pages instead of all at once, embedding and
+    storing each page's chunks in batches. The last chunk of a page is carried over into the
+    next page so chunk boundaries match a single-pass run.
+    With memory_budget (bytes), page and embedding batch sizes adapt after every batch to keep
+    RSS under the budget. With job_dir, embedding batches are checkpointed as in ingest_contact(),
+    so a restarted run re-reads the pages but re-embeds nothing it already embedded.
+    As in ingest_contact(), chunks the run did not write are removed at the end.
+    Returns the same dict as ingest_contact(), plus final batch sizes.
+    """
+    timings = {"fetch": 0.0, "chunk": 0.0, "embed": 0.0, "store": 0.0}
+    started = time.perf_counter()
+    page_sizer = embed_sizer = None
+    if memory_budget is not None:
+        baseline = current_rss()
+        if baseline > memory_budget * 0.6:
+            print(f"Warning: {baseline / MB:.0f} MB already resident (models, store) against a "
+                  f"{memory_budget / MB:.0f} MB budget; using minimum batch sizes")
+        page_sizer = BatchSizer(memory_budget, page_size, minimum=500, maximum=200000)
+        embed_sizer = BatchSizer(memory_budget, embed_batch, minimum=8, maximum=4096)
+        page_size, embed_batch = page_sizer.update(), embed_sizer.update()
+
+    job = EmbeddingJob(job_dir, embedder, batch_size=embed_batch) if job_dir else None
+    conn = chat_db.connect(db_path)
+    handle_ids = chat_db.find_handle_ids(conn, contact)
+    after_rowid, carry = 0, []
+    total_messages = total_chunks = 0
+    written = set()
+    try:
+        while True:
+            stage_start = time.perf_counter()
+            rows = chat_db.fetch_messages_since(conn, handle_ids, after_rowid=after_rowid, limit=page_size)
+            fetched = len(rows)
+            if rows:
+                after_rowid = rows[-1][0]
+            messages = chat_db.process_rows(rows)
+            total_messages += len(messages)
+            messages = carry + messages
+            del rows
+            timings["fetch"] += time.perf_counter() - stage_start
+            final = fetched < page_size
+            if not messages:
+                # A full page can preprocess to nothing (attachments, reactions); only a short page ends the scan
+                if final:
+                    break
+                continue
+            stage_start = time.perf_counter()
+            chunks = assign_rowid_ids(chunk_messages(messages, strategy=strategy, chunk_size=chunk_size,
+                                                     hours_gap=hours_gap), messages, contact)
+            carry = []
+            if not final and len(chunks) > 1:
+                # The last chunk may continue into the next page: re-chunk its messages with it
+                carry = messages[-chunks[-1]['metadata']['message_count']:]
+                chunks.pop()
+            elif not final:
+                carry, chunks = messages, []
+            del messages
+            timings["chunk"] += time.perf_counter() - stage_start
+
+            while chunks:
+                batch, chunks = chunks[:embed_batch], chunks[embed_batch:]
+                stage_start = time.perf_counter()
+                if job is not None:
+                    job.batch_size = embed_batch
+                    batch = job.embed(batch)
+                else:
+                    batch = embedder.generate_embeddings(batch)
+                timings["embed"] += time.perf_counter() - stage_start
+                stage_start = time.perf_counter()
+                store.add_chunks(batch, upsert=True)
+                timings["store"] += time.perf_counter() - stage_start
+                total_chunks += len(batch)
+                written.update(chunk['id'] for chunk in batch)
+                del batch
+                if embed_sizer is not None:
+                    gc.collect()
+                    embed_batch = embed_sizer.update()
+            if page_sizer is not None:
+                page_size = page_sizer.update()
+            if final:
+                break
+    finally:
+        conn.close()
+    stage_start = time.perf_counter()
+    remove_stale_chunks(store, contact, written)
+    timings["store"] += time.perf_counter() - stage_start
+    if job is not None:
+        job.finish()
+    timings["total"] = time.perf_counter() - started
+    return {"messages": total_messages, "chunks": total_chunks, "timings": timings,
+            "page_size": page_size, "embed_batch": embed_batch}
@@ -0,0 +1,245 @@
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# Upper bounds (seconds) of the stage duration histogram buckets
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+METRIC_PREFIX = "imessage_rag"
+
+class _NullSpan:
+    """
+    Shared no-op context manager returned while instrumentation is disabled.
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **labels):
+        pass
+
+_NULL_SPAN = _NullSpan()
+
+class Span:
+    """
+    Times a block of code and records it on exit: a span event, a stage histogram
+    observation and, if it raised, an error counter.
+    """
+    def __init__(self, registry, name, labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def set(self, **labels):
+        self.labels.update(labels)
+
+    def __enter__(self):
+        if self.registry.memory is not None:
+            self.registry.memory.enter(self.name)
+        self.start = time.time()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self._started
+        if self.registry.memory is not None:
+            self.registry.memory.exit(self.name)
+        self.registry._record_span(self.name, self.start, duration, self.labels, exc_type)
+        return False
+
+class Histogram:
+    """
+    Cumulative-bucket histogram in the Prometheus sense.
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+class MetricsRegistry:
+    """
+    In-process spans, counters and histograms for the pipeline stages.
+    Disabled by default: span() then returns a shared no-op context manager and
+    counter()/observe() return immediately, so instrumented code pays one attribute check.
+    Recent span events are kept in a bounded buffer for JSON lines export.
+    With a MemoryTracker attached (see track_memory()), spans also account memory per stage.
+    """
+    def __init__(self, enabled=False, max_events=10000):
+        self.enabled = enabled
+        self.memory = None
+        self._lock = threading.Lock()
+        self.reset(max_events)
+
+    def reset(self, max_events=None):
+        with self._lock:
+            self.counters = {}
+            self.histograms = {}
+            self.events = deque(maxlen=max_events or self.events.maxlen)
+
+    def span(self, name, **labels):
+        if not self.enabled:
+            return _NULL_SPAN
+        return Span(self, name, labels)
+
+    def counter(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def _record_span(self, name, start, duration, labels, exc_type):
+        self.observe("stage_seconds", duration, stage=name)
+        if exc_type is not None:
+            self.counter("stage_errors_total", stage=name, error=exc_type.__name__)
+        with self._lock:
+            self.events.append({"type": "span", "name": name, "start": start, "duration": duration, **labels})
+
+    # --- Export ---
+    def snapshot(self):
+        """
+        Counters and histogram summaries as plain dicts.
+        """
+        with self._lock:
+            counters = [{"name": name, "labels": dict(labels), "value": value}
+                        for (name, labels), value in self.counters.items()]
+            histograms = [{"name": name, "labels": dict(labels), "count": h.count, "sum": h.sum,
+                           "buckets": dict(zip(map(str, h.buckets), h.counts))}
+                          for (name, labels), h in self.histograms.items()]
+        return {"counters": counters, "histograms": histograms}
+
+    def to_jsonl(self):
+        """
+        Span events followed by one line per counter and histogram.
+        """
+        with self._lock:
+            events = list(self.events)
+        snapshot = self.snapshot()
+        lines = [json.dumps(event) for event in events]
+        lines += [json.dumps({"type": "counter", **c}) for c in snapshot["counters"]]
+        lines += [json.dumps({"type": "histogram", **h}) for h in snapshot["histograms"]]
+        return "\n".join(lines) + ("\n" if lines else "")
+
+    def to_prometheus(self):
+        """
+        Counters and histograms in the Prometheus text exposition format.
+        """
+        def fmt_labels(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ""
+            return "{" + ",".join(f'{k}="{str(v)}"' for k, v in pairs) + "}"
+
+        lines = []
+        with self._lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(self.histograms.items(), key=lambda item: item[0])
+            typed = set()
+            for (name, labels), value in counters:
+                full = f"{METRIC_PREFIX}_{name}"
+                if full not in typed:
+                    lines.append(f"# TYPE {full} counter")
+                    typed.add(full)
+                lines.append(f"{full}{fmt_labels(labels)} {value}")
+            for (name, labels), h in histograms:
+                full = f"{METRIC_PREFIX}_{name}"
+                if full not in typed:
+                    lines.append(f"# TYPE {full} histogram")
+                    typed.add(full)
+                for bound, count in zip(h.buckets, h.counts):
+                    lines.append(f"{full}_bucket{fmt_labels(labels, [('le', bound)])} {count}")
+                lines.append(f"{full}_bucket{fmt_labels(labels, [('le', '+Inf')])} {h.count}")
+                lines.append(f"{full}_sum{fmt_labels(labels)} {h.sum}")
+                lines.append(f"{full}_count{fmt_labels(labels)} {h.count}")
+        return "\n".join(lines) + ("\n" if lines else "")
+
+    def export(self, path):
+        """
+        Write metrics to path: Prometheus text for .prom/.txt files, JSON lines otherwise.
+        """
+        text = self.to_prometheus() if path.endswith((".prom", ".txt")) else self.to_jsonl()
+        with open(path, "w") as f:
+            f.write(text)
+
+# --- Process-wide registry ---
+registry = MetricsRegistry(enabled=os.getenv("IMESSAGE_RAG_METRICS", "").lower() in ("1", "true", "yes"))
+
+def enable():
+    registry.enabled = True
+
+def disable():
+    registry.enabled = False
+
+def track_memory(trace=True, interval=0.01):
+    """
+    Enable instrumentation with per-stage memory accounting. Returns the MemoryTracker.
+    trace=False skips tracemalloc and samples RSS only, which costs next to nothing.
+    """
+    from imessage_insight.memory import MemoryTracker
+    registry.memory = MemoryTracker(trace=trace, interval=interval)
+    registry.enabled = True
+    return registry.memory
+
+def stop_memory():
+    """
+    Detach and stop the memory tracker, returning it for reporting.
+    """
+    tracker, registry.memory = registry.memory, None
+    if tracker is not None:
+        tracker.stop()
+    return tracker
+
+def span(name, **labels):
+    return registry.span(name, **labels)
+
+def counter(name, value=1, **labels):
+    registry.counter(name, value, **labels)
+
+def observe(name, value, **labels):
+    registry.observe(name, value, **labels)
+
+def timed(name):
+    """
+    Decorator recording each call of a function (sync or async) as a span named `name`.
+    """
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not registry.enabled:
+                    return await func(*args, **kwargs)
+                with registry.span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not registry.enabled:
+                return func(*args, **kwargs)
+            with registry.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,238 @@
+import json
+import math
+import os
+import re
+import threading
+from imessage_insight.file_locks import exclusive_lock
+
+# --- Tokenization ---
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+# Speaker labels prefix every line of every chunk, plus the most common English filler words
+STOPWORDS = {
+    "me", "friend", "a", "an", "and", "are", "as", "at", "be", "but", "by", "for", "i", "if", "in",
+    "is", "it", "its", "of", "on", "or", "so", "that", "the", "this", "to", "was", "we", "with", "you"
+}
+
+def tokenize(text):
+    """
+    Lowercase and split text into word tokens, dropping stopwords.
+    Digits are kept so addresses and dates ('5th', '2022') stay searchable.
+    """
+    return [tok for tok in TOKEN_RE.findall(text.lower()) if tok not in STOPWORDS]
+
+# The log is folded into the snapshot once it is larger than both this and the snapshot itself
+COMPACT_MIN_LOG_BYTES = 1024 * 1024
+
+class BM25Index:
+    """
+    Incremental Okapi BM25 inverted index over chunk texts.
+    Complements embedding search for exact names, places and rare words.
+    Persisted as a JSON snapshot (path) plus an append-only JSON-lines log of changes
+    (path + '.log'): save() appends only the changes since the last save and folds the log
+    into a new snapshot once it outgrows the snapshot, so saving costs O(changes) amortized. Several processes can share one index
+    (the daemon and a watcher): writes are serialized with a lock file and refresh() replays
+    changes other processes appended. All methods are thread-safe.
+    """
+    def __init__(self, path=None, k1=1.5, b=0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.postings = {}     # term -> {doc_id: term frequency}
+        self.doc_terms = {}    # doc_id -> {term: term frequency}, needed to update/remove docs
+        self.doc_lengths = {}  # doc_id -> number of tokens
+        self.total_length = 0
+        self._lock = threading.RLock()
+        self._pending = []     # changes since the last save: [doc_id, counts] or [doc_id, None] for removals
+        self._log_position = (None, 0)  # (inode, offset) of the log up to which this copy is current
+        if path and (os.path.exists(path) or os.path.exists(path + ".log")):
+            self.load()
+
+    def __len__(self):
+        return len(self.doc_terms)
+
+    def add(self, ids, texts):
+        """
+        Index (or re-index) documents. Re-adding an existing id replaces its old postings.
+        """
+        with self._lock:
+            for doc_id, text in zip(ids, texts):
+                counts = {}
+                for tok in tokenize(text):
+                    counts[tok] = counts.get(tok, 0) + 1
+                self._apply(str(doc_id), counts)
+                self._pending.append([str(doc_id), counts])
+
+    def remove(self, doc_id):
+        """
+        Remove a document from the index if present.
+        """
+        with self._lock:
+            self._apply(str(doc_id), None)
+            self._pending.append([str(doc_id), None])
+
+    def _apply(self, doc_id, counts):
+        """
+        Set a document's term counts (None removes it).
+        """
+        old = self.doc_terms.pop(doc_id, None)
+        if old is not None:
+            self.total_length -= self.doc_lengths.pop(doc_id)
+            for tok in old:
+                docs = self.postings.get(tok)
+                if docs is not None:
+                    docs.pop(doc_id, None)
+                    if not docs:
+                        del self.postings[tok]
+        if counts is None:
+            return
+        self.doc_terms[doc_id] = counts
+        self.doc_lengths[doc_id] = sum(counts.values())
+        self.total_length += self.doc_lengths[doc_id]
+        for tok, tf in counts.items():
+            self.postings.setdefault(tok, {})[doc_id] = tf
+
+    def search(self, query, top_k=10, allowed_ids=None):
+        """
+        Score documents against the query with BM25.
+        allowed_ids optionally restricts scoring to a set of ids (e.g. a time-range pre-filter).
+        Returns a list of (doc_id, score) sorted by descending score.
+        """
+        with self._lock:
+            n_docs = len(self.doc_terms)
+            if not n_docs:
+                return []
+            avg_len = self.total_length / n_docs
+            scores = {}
+            for tok in set(tokenize(query)):
+                docs = self.postings.get(tok)
+                if not docs:
+                    continue
+                idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+                for doc_id, tf in docs.items():
+                    if allowed_ids is not None and doc_id not in allowed_ids:
+                        continue
+                    norm = tf + self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_len)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+
+    # --- Persistence ---
+    @property
+    def _log_path(self):
+        return self.path + ".log"
+
+    def _log_stat(self):
+        try:
+            stat = os.stat(self._log_path)
+            return stat.st_ino, stat.st_size
+        except FileNotFoundError:
+            return None, 0
+
+    def _replay_log(self):
+        """
+        Apply log entries appended since this copy last read the log, by any process.
+        A log replaced by another process's compaction means reloading the snapshot.
+        """
+        inode, size = self._log_stat()
+        if inode != self._log_position[0]:
+            self._load()
+            return
+        if size == self._log_position[1]:
+            return
+        with open(self._log_path) as f:
+            f.seek(self._log_position[1])
+            data = f.read()
+        complete = data[:data.rfind("\n") + 1]  # a line still being written is picked up next time
+        for line in complete.splitlines():
+            doc_id, counts = json.loads(line)
+            self._apply(doc_id, counts)
+        self._log_position = (inode, self._log_position[1] + len(complete.encode()))
+
+    def refresh(self):
+        """
+        Pick up changes other processes saved since this copy last loaded or saved.
+        Costs one stat() when nothing changed.
+        """
+        if not self.path:
+            return
+        with self._lock:
+            if self._log_stat() == self._log_position:
+                return
+            with exclusive_lock(self.path + ".lock"):
+                pending, self._pending = self._pending, []
+                self._replay_log()
+                # Unsaved local changes stay on top of what other processes wrote
+                for doc_id, counts in pending:
+                    self._apply(doc_id, counts)
+                self._pending = pending
+
+    def save(self):
+        """
+        Persist changes since the last save: append them to the log, or rewrite the snapshot
+        (and start a new log) once the log holds more entries than the index has documents.
+        """
+        if not self.path:
+            return
+        with self._lock, exclusive_lock(self.path + ".lock"):
+            pending, self._pending = self._pending, []
+            self._replay_log()
+            for doc_id, counts in pending:
+                self._apply(doc_id, counts)
+            if not pending:
+                return
+            lines = "".join(json.dumps([doc_id, counts]) + "\n" for doc_id, counts in pending)
+            log_bytes = self._log_position[1] + len(lines.encode())
+            snapshot_bytes = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+            if log_bytes > max(snapshot_bytes, COMPACT_MIN_LOG_BYTES):
+                self._write_snapshot()
+                return
+            with open(self._log_path, "a") as f:
+                f.write(lines)
+            self._log_position = self._log_stat()
+
+    def _write_snapshot(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"k1": self.k1, "b": self.b, "doc_terms": self.doc_terms}, f)
+        os.replace(tmp_path, self.path)
+        # A fresh (new inode) log tells other processes to reload the snapshot
+        with open(self._log_path + ".tmp", "w"):
+            pass
+        os.replace(self._log_path + ".tmp", self._log_path)
+        self._log_position = self._log_stat()
+
+    def compact(self):
+        """
+        Fold the log into a fresh snapshot.
+        """
+        if not self.path:
+            return
+        with self._lock, exclusive_lock(self.path + ".lock"):
+            pending, self._pending = self._pending, []
+            self._replay_log()
+            for doc_id, counts in pending:
+                self._apply(doc_id, counts)
+            self._write_snapshot()
+
+    def load(self):
+        """
+        Load the index from the snapshot and replay its log.
+        """
+        with self._lock, exclusive_lock(self.path + ".lock"):
+            self._load()
+
+    def _load(self):
+        data = {"k1": self.k1, "b": self.b, "doc_terms": {}}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                data = json.load(f)
+        self.k1, self.b = data["k1"], data["b"]
+        self.doc_terms = data["doc_terms"]
+        self.postings = {}
+        self.doc_lengths = {doc_id: sum(counts.values()) for doc_id, counts in self.doc_terms.items()}
+        self.total_length = sum(self.doc_lengths.values())
+        for doc_id, counts in self.doc_terms.items():
+            for tok, tf in counts.items():
+                self.postings.setdefault(tok, {})[doc_id] = tf
+        self._log_position = (self._log_stat()[0], 0)
+        self._replay_log()
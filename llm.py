@@ -0,0 +1,115 @@
+import asyncio
+import os
+import time
+import httpx
+from openai import OpenAI, AsyncOpenAI
+
+class LLMClient:
+    """
+    Interface for chat LLM backends used by RAGPipeline.
+    Subclasses implement complete() and stream(); acomplete() defaults to running
+    complete() in a worker thread.
+    """
+    def complete(self, messages, model, max_tokens=512, temperature=0.2):
+        """
+        Return the full answer text for a list of chat messages.
+        """
+        raise NotImplementedError
+
+    def stream(self, messages, model, max_tokens=512, temperature=0.2):
+        """
+        Yield answer text pieces as they are generated.
+        """
+        raise NotImplementedError
+
+    async def acomplete(self, messages, model, max_tokens=512, temperature=0.2):
+        """
+        Async complete(); override when the backend has a native async client.
+        """
+        return await asyncio.to_thread(self.complete, messages, model, max_tokens, temperature)
+
+class OpenAILLMClient(LLMClient):
+    """
+    OpenAI chat completions with pooled keep-alive connections, a request timeout
+    and automatic retries (exponential backoff, handled by the openai client).
+    """
+    def __init__(self, api_key=None, base_url=None, timeout=30.0, max_retries=3, max_connections=20):
+        api_key = api_key or os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise ValueError("OPENAI_API_KEY not set in environment.")
+        limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self.client = OpenAI(
+            api_key=api_key, base_url=base_url, timeout=timeout, max_retries=max_retries,
+            http_client=httpx.Client(limits=limits, timeout=timeout)
+        )
+        self.async_client = AsyncOpenAI(
+            api_key=api_key, base_url=base_url, timeout=timeout, max_retries=max_retries,
+            http_client=httpx.AsyncClient(limits=limits, timeout=timeout)
+        )
+
+    def complete(self, messages, model, max_tokens=512, temperature=0.2):
+        response = self.client.chat.completions.create(
+            model=model, messages=messages, max_tokens=max_tokens, temperature=temperature
+        )
+        return response.choices[0].message.content.strip()
+
+    def stream(self, messages, model, max_tokens=512, temperature=0.2):
+        stream = self.client.chat.completions.create(
+            model=model, messages=messages, max_tokens=max_tokens, temperature=temperature, stream=True
+        )
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    async def acomplete(self, messages, model, max_tokens=512, temperature=0.2):
+        response = await self.async_client.chat.completions.create(
+            model=model, messages=messages, max_tokens=max_tokens, temperature=temperature
+        )
+        return response.choices[0].message.content.strip()
+
+class OpenAICompatibleLLMClient(OpenAILLMClient):
+    """
+    Any server speaking the OpenAI chat completions API (vLLM, llama.cpp, Ollama,
+    the local stub in test_scripts). An API key is optional.
+    """
+    def __init__(self, base_url, api_key=None, **kwargs):
+        super().__init__(api_key=api_key or os.getenv("OPENAI_API_KEY") or "not-needed", base_url=base_url, **kwargs)
+
+class StubLLMClient(LLMClient):
+    """
+    Deterministic in-process LLM for tests and benchmarks.
+    Waits `latency` seconds (time to first token), then returns an answer built from the
+    question, streamed word by word with `token_latency` seconds between words.
+    """
+    def __init__(self, latency=0.3, token_latency=0.0, answer_fn=None):
+        self.latency = latency
+        self.token_latency = token_latency
+        self.answer_fn = answer_fn or self._default_answer
+        self.calls = 0
+
+    @staticmethod
+    def _default_answer(messages):
+        question = messages[-1]["content"].rsplit("Question:", 1)[-1].split("Answer:")[0].strip()
+        return f"Stub answer to: {question}"
+
+    def _words(self, messages):
+        self.calls += 1
+        return self.answer_fn(messages).split(" ")
+
+    def complete(self, messages, model, max_tokens=512, temperature=0.2):
+        words = self._words(messages)
+        time.sleep(self.latency + self.token_latency * (len(words) - 1))
+        return " ".join(words)
+
+    def stream(self, messages, model, max_tokens=512, temperature=0.2):
+        words = self._words(messages)
+        time.sleep(self.latency)
+        for i, word in enumerate(words):
+            if i:
+                time.sleep(self.token_latency)
+            yield word if i == len(words) - 1 else word + " "
+
+    async def acomplete(self, messages, model, max_tokens=512, temperature=0.2):
+        words = self._words(messages)
+        await asyncio.sleep(self.latency + self.token_latency * (len(words) - 1))
+        return " ".join(words)
@@ -1,10 +1,17 @@
+import argparse
+import contextlib
+import json
 import os
+import sys
+import time
 from dotenv import load_dotenv
-from imessage_insight.utils import get_processed_messages_for_contact
+from imessage_insight.utils import get_processed_messages_for_contact, normalize
 from imessage_insight.chunking import chunk_messages
 from imessage_insight.embedding import MessageEmbedder
 from imessage_insight.vector_store import ChromaVectorStore
 from imessage_insight.rag import RAGPipeline
+from imessage_insight.answer_cache import SemanticAnswerCache
+from imessage_insight import chat_db, instrumentation
 
 load_dotenv()
 
@@ -41,8 +48,8 @@ def prompt_float(prompt, default):
         print("Invalid input, using default.")
         return default
 
-# --- Main Workflow ---
-def main():
+# --- Interactive Workflow ---
+def interactive():
     print("\n=== iMessage RAG CLI ===\n")
     contact = input("Enter the phone number or Apple ID of the contact (no spaces, include country code if phone): ").strip()
     if not contact:
@@ -60,6 +67,9 @@ def main():
         print("Invalid choice. Using SentenceTransformers.")
         emb_choice = "1"
     top_k = prompt_int("How many chunks to retrieve for each query?", 5)
+    hybrid = prompt_choice("Combine keyword (BM25) and vector search?", ["y", "n"], default="y") == "y"
+    start = input("Only use messages from (YYYY-MM-DD, blank for no limit): ").strip() or None
+    end = input("Only use messages until (YYYY-MM-DD, blank for no limit): ").strip() or None
 
     print(f"\nFetching and processing messages for: {contact} ...")
     try:
@@ -77,6 +87,9 @@ def main():
         chunk_size=chunk_size,
         hours_gap=hours_gap
     )
+    # Tag chunks with the contact so retrieval can be filtered by sender
+    for chunk in chunks:
+        chunk['metadata']['contact'] = normalize(contact)
 
     # --- Use a unique collection name for each embedding backend ---
     if emb_choice == "2":
@@ -105,22 +118,349 @@ def main():
 
     # --- Use unified RAGPipeline for both backends ---
     llm_model = 'gpt-4o' if emb_choice == "2" else 'gpt-3.5-turbo'
-    rag = RAGPipeline(collection_name=collection_name, persist_dir="imessage_insight/chromadb_data", embedder=embedder, llm_model=llm_model)
+    rag = RAGPipeline(collection_name=collection_name, persist_dir="imessage_insight/chromadb_data", embedder=embedder, llm_model=llm_model, hybrid=hybrid,
+                      answer_cache=SemanticAnswerCache("imessage_insight/chromadb_data/answer_cache.sqlite"))
 
     print("\n--- Ready for Q&A! ---\nType your question, or 'exit' to quit.")
     while True:
         query = input("\nYour question: ").strip()
         if query.lower() == 'exit':
+            stats = rag.answer_cache.stats()
+            print(f"Answer cache: {stats['hits']} hits / {stats['hits'] + stats['misses']} questions "
+                  f"({stats['hit_rate']:.0%}), saved {stats['saved_seconds']:.1f}s")
             print("Goodbye!")
             break
         try:
-            answer, context = rag.generate_answer(query, top_k=top_k)
+            result = rag.stream_answer(query, top_k=top_k, start=start, end=end)
             print("\n--- Answer ---")
-            print(answer)
+            for token in result:
+                print(token, end="", flush=True)
+            print()
             print("\n--- Context Used ---")
-            print(context)
+            print(result.context)
+            timings = result.timings
+            print(f"\n(retrieval {timings['retrieval']:.2f}s, first token {timings.get('ttft', timings['total']):.2f}s, "
+                  f"total {timings['total']:.2f}s)")
         except Exception as e:
             print(f"Error during RAG Q&A: {e}")
 
+# --- Non-Interactive Subcommands ---
+CHROMA_DIR = "imessage_insight/chromadb_data"
+
+def default_collection(backend):
+    """
+    Collection name used for each embedding backend (same as the interactive flow).
+    """
+    return "imessage_chunks_openai" if backend == "openai" else "imessage_chunks"
+
+def build_pipeline(args, embedder=None):
+    """
+    Build a RAGPipeline from parsed CLI flags.
+    """
+    from imessage_insight.llm import StubLLMClient
+    from imessage_insight.retrieval_cache import RetrievalCache
+    embedder = embedder or MessageEmbedder(backend=args.backend)
+    llm_model = args.llm_model or ('gpt-4o' if args.backend == 'openai' else 'gpt-3.5-turbo')
+    shards = None
+    if args.federate:
+        from imessage_insight.federated import build_shards
+        shards = build_shards(args.federate, args.persist_dir, embedder)
+    reranker = None
+    if args.rerank:
+        from imessage_insight.reranker import CrossEncoderReranker
+        reranker = CrossEncoderReranker()
+    summaries = None
+    if args.summaries:
+        from imessage_insight.summaries import SummaryIndex
+        summaries = SummaryIndex(collection_name=args.collection, persist_dir=args.persist_dir)
+    return RAGPipeline(
+        collection_name=args.collection, persist_dir=args.persist_dir, embedder=embedder, llm_model=llm_model,
+        hybrid=args.hybrid, mmr_lambda=args.mmr_lambda, llm_base_url=args.llm_base_url,
+        llm_client=StubLLMClient(latency=0.3) if args.stub_llm else None, summaries=summaries,
+        retrieval_cache=RetrievalCache(args.retrieval_cache) if args.retrieval_cache else None, shards=shards,
+        reranker=reranker
+    )
+
+def build_summary_builder(args, store, embedder, levels=None):
+    """
+    SummaryBuilder for the summarize command and for ingest/watch --summarize.
+    """
+    from imessage_insight.llm import OpenAICompatibleLLMClient, OpenAILLMClient, StubLLMClient
+    from imessage_insight.summaries import LEVELS, SummaryBuilder, SummaryIndex, stub_summary
+    if args.stub_llm:
+        llm_client = StubLLMClient(latency=0.05, answer_fn=stub_summary)
+    else:
+        llm_client = OpenAICompatibleLLMClient(args.llm_base_url) if args.llm_base_url else OpenAILLMClient()
+    index = SummaryIndex(collection_name=args.collection, persist_dir=args.persist_dir, levels=levels or LEVELS)
+    return SummaryBuilder(store, index, embedder, llm_client, llm_model=args.llm_model)
+
+def cmd_ingest(args):
+    from imessage_insight.ingest import ingest_contact, ingest_contact_paged, job_dir_for
+    from imessage_insight.memory import parse_size
+    embedder = MessageEmbedder(backend=args.backend)
+    store = ChromaVectorStore(collection_name=args.collection, persist_dir=args.persist_dir)
+    budget = parse_size(args.memory_budget) if args.memory_budget else None
+    builder = build_summary_builder(args, store, embedder) if args.summarize else None
+    for contact in args.contacts:
+        job_dir = None if args.no_checkpoint else job_dir_for(store, contact)
+        if budget is not None:
+            result = ingest_contact_paged(contact, store, embedder, db_path=args.db_path, strategy=args.strategy,
+                                          chunk_size=args.chunk_size, hours_gap=args.hours_gap,
+                                          memory_budget=budget, job_dir=job_dir)
+        else:
+            result = ingest_contact(contact, store, embedder, db_path=args.db_path, strategy=args.strategy,
+                                    chunk_size=args.chunk_size, hours_gap=args.hours_gap, job_dir=job_dir)
+        timings = " ".join(f"{stage}={seconds:.2f}s" for stage, seconds in result["timings"].items())
+        print(f"{contact}: {result['messages']} messages -> {result['chunks']} chunks ({timings})", file=sys.stderr)
+        if builder is not None:
+            updated = builder.update(contact)
+            print(f"{contact}: re-summarized " + " ".join(f"{level}={n}" for level, n in updated.items()),
+                  file=sys.stderr)
+
+def cmd_jobs(args):
+    from imessage_insight.embedding_jobs import format_progress, read_manifest
+    found = False
+    for name in sorted(os.listdir(args.persist_dir)) if os.path.isdir(args.persist_dir) else []:
+        manifest = read_manifest(os.path.join(args.persist_dir, name))
+        if manifest is not None and name.startswith(f"{args.collection}.embed."):
+            found = True
+            print(f"{name[len(args.collection) + 7:]}: {format_progress(manifest)}")
+    if not found:
+        print(f"No embedding jobs for collection '{args.collection}'")
+
+def cmd_watch(args):
+    from imessage_insight.watcher import ChatDBWatcher
+    embedder = MessageEmbedder(backend=args.backend)
+    store = ChromaVectorStore(collection_name=args.collection, persist_dir=args.persist_dir)
+    watcher = ChatDBWatcher(args.contact, store, embedder, db_path=args.db_path, strategy=args.strategy,
+                            chunk_size=args.chunk_size, hours_gap=args.hours_gap, debounce=args.debounce,
+                            poll_interval=args.poll_interval,
+                            summary_builder=build_summary_builder(args, store, embedder) if args.summarize else None)
+    print(f"Watching {args.db_path} for new messages with {args.contact} (Ctrl-C to stop)", file=sys.stderr)
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        pass
+    print(json.dumps(watcher.metrics), file=sys.stderr)
+
+def cmd_sweep(args):
+    from imessage_insight.evaluation import load_questions
+    from imessage_insight.sweep import ChunkingSweep, format_sweep, known_item_questions, parse_variant
+    variants = [parse_variant(spec) for spec in args.variants]
+    messages = chat_db.load_contact_messages(args.contact, db_path=args.db_path)
+    if not messages:
+        print(f"No messages found for {args.contact}", file=sys.stderr)
+        return
+    if args.questions:
+        questions = load_questions(args.questions)
+    else:
+        questions = known_item_questions(messages, n=args.sample_questions)
+        print(f"No question set given; sampled {len(questions)} known-item questions", file=sys.stderr)
+    sweep = ChunkingSweep(messages, MessageEmbedder(backend=args.backend), contact=args.contact,
+                          top_k=args.top_k, max_workers=args.workers)
+    reports = sweep.run(variants, questions, keep=args.keep)
+    print(json.dumps(reports, indent=2) if args.json else format_sweep(reports, args.top_k))
+
+def cmd_summarize(args):
+    store = ChromaVectorStore(collection_name=args.collection, persist_dir=args.persist_dir)
+    builder = build_summary_builder(args, store, MessageEmbedder(backend=args.backend), levels=args.levels)
+    for contact in args.contacts:
+        started = time.perf_counter()
+        updated = builder.update(contact)
+        counts = " ".join(f"{level}={n}" for level, n in updated.items())
+        print(f"{contact}: re-summarized {counts} in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+def read_questions(stream):
+    """
+    Yield question dicts from JSONL (objects with a 'question' key) or plain text lines.
+    """
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("{"):
+            yield json.loads(line)
+        else:
+            yield {"question": line}
+
+def cmd_query(args):
+    if args.jsonl:
+        # stdout carries only JSONL; progress prints from model loading go to stderr
+        out = sys.stdout
+        with contextlib.redirect_stdout(sys.stderr):
+            rag = build_pipeline(args)
+        # One pipeline (and one model load) serves every question on stdin
+        with contextlib.closing(rag):
+            for item in read_questions(sys.stdin):
+                started = time.perf_counter()
+                try:
+                    result = rag.answer_query(
+                        item["question"], top_k=item.get("top_k", args.top_k),
+                        start=item.get("start", args.start), end=item.get("end", args.end),
+                        sender=item.get("sender", args.sender)
+                    )
+                    record = {
+                        "id": item.get("id"),
+                        "question": item["question"],
+                        "answer": result["answer"],
+                        "retrieved_ids": [r["id"] for r in result["retrieved"]],
+                        "context_tokens": result["context_tokens"],
+                        "cached": result["cached"],
+                        "timings": result["timings"]
+                    }
+                except Exception as e:
+                    record = {"id": item.get("id"), "question": item.get("question"), "error": str(e),
+                              "timings": {"total": time.perf_counter() - started}}
+                out.write(json.dumps(record, default=str) + "\n")
+                out.flush()
+        return
+    if not args.question:
+        raise SystemExit("query needs a question, or --jsonl to read questions from stdin")
+    with contextlib.closing(build_pipeline(args)) as rag:
+        answer, context = rag.generate_answer(args.question, top_k=args.top_k, start=args.start, end=args.end,
+                                              sender=args.sender)
+    print(answer)
+    if args.show_context:
+        print("\n--- Context Used ---")
+        print(context)
+
+def cmd_stats(args):
+    from datetime import datetime
+    store = ChromaVectorStore(collection_name=args.collection, persist_dir=args.persist_dir)
+    count = store.collection.count()
+    print(f"Collection:     {args.collection} ({args.persist_dir})")
+    print(f"Chunks:         {count}")
+    print(f"Write version:  {store.version}")
+    print(f"Distance space: {store.space}")
+    index = store.timestamp_index
+    if len(index):
+        first, last = index.starts[0], index.starts[-1]
+        print(f"Date range:     {datetime.fromtimestamp(first):%Y-%m-%d} to {datetime.fromtimestamp(last):%Y-%m-%d}")
+    print(f"Chunks with start_date_ts: {len(index)}")
+    print(f"BM25 index:     {len(store.lexical_index)} documents, {len(store.lexical_index.postings)} terms")
+
+def cmd_bench(args):
+    from imessage_insight.evaluation import EvaluationHarness, load_questions, format_report
+    with contextlib.closing(build_pipeline(args)) as rag:
+        harness = EvaluationHarness(rag, top_k=args.top_k, concurrency=args.concurrency, rate=args.rate)
+        _, report = harness.run(load_questions(args.questions))
+    print(format_report(report))
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="iMessage RAG CLI. Run without arguments for the interactive flow.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--backend", choices=["sentence_transformers", "openai"], default="sentence_transformers")
+    common.add_argument("--collection", help="Defaults to the backend's collection")
+    common.add_argument("--persist-dir", default=CHROMA_DIR)
+    common.add_argument("--metrics", metavar="PATH",
+                        help="Record per-stage metrics and write them to PATH (.prom for Prometheus text, else JSON lines)")
+    common.add_argument("--memory-report", action="store_true",
+                        help="Track peak memory per stage (tracemalloc + RSS) and print a table at the end")
+
+    chunking = argparse.ArgumentParser(add_help=False, parents=[common])
+    chunking.add_argument("--strategy", choices=["fixed", "time", "timeandfixed"], default="time")
+    chunking.add_argument("--chunk-size", type=int, default=10)
+    chunking.add_argument("--hours-gap", type=float, default=1.0)
+
+    summary_llm = argparse.ArgumentParser(add_help=False)
+    summary_llm.add_argument("--llm-model", default="gpt-4o-mini", help="Model that writes summaries")
+    summary_llm.add_argument("--llm-base-url")
+    summary_llm.add_argument("--stub-llm", action="store_true", help="Use the in-process stub LLM")
+
+    ingest = sub.add_parser("ingest", parents=[chunking, summary_llm], help="Fetch, chunk, embed and store contacts' messages")
+    ingest.add_argument("contacts", nargs="+")
+    ingest.add_argument("--memory-budget", metavar="SIZE",
+                        help="Target RSS such as 512MB; reads chat.db in pages and sizes batches to stay under it")
+    ingest.add_argument("--db-path", default=chat_db.DEFAULT_DB_PATH, help="chat.db to read messages from")
+    ingest.add_argument("--no-checkpoint", action="store_true",
+                        help="Don't checkpoint embedding batches (a failed run then starts over)")
+    ingest.add_argument("--summarize", action="store_true", help="Update the contacts' summaries after ingesting")
+    ingest.set_defaults(func=cmd_ingest)
+
+    jobs = sub.add_parser("jobs", parents=[common], help="Show the progress of checkpointed embedding jobs")
+    jobs.set_defaults(func=cmd_jobs)
+
+    watch = sub.add_parser("watch", parents=[chunking, summary_llm], help="Incrementally index new messages as chat.db changes")
+    watch.add_argument("contact")
+    watch.add_argument("--db-path", default=chat_db.DEFAULT_DB_PATH)
+    watch.add_argument("--debounce", type=float, default=2.0, help="Seconds of quiet before indexing a burst of writes")
+    watch.add_argument("--poll-interval", type=float, default=0.5)
+    watch.add_argument("--summarize", action="store_true", help="Update the contact's summaries after each batch")
+    watch.set_defaults(func=cmd_watch)
+
+    sweep = sub.add_parser("sweep", parents=[common], help="Build and score several chunking variants side by side")
+    sweep.add_argument("contact")
+    sweep.add_argument("--variants", nargs="+",
+                       default=["fixed:10", "fixed:20", "time:0.5", "time:1", "time:3", "timeandfixed:1:20"],
+                       help="fixed:<size>, time:<hours> or timeandfixed:<hours>:<size>")
+    sweep.add_argument("--questions", help="JSONL question set with expected_texts (or expected_ids)")
+    sweep.add_argument("--sample-questions", type=int, default=50, help="Known-item questions to sample without --questions")
+    sweep.add_argument("--db-path", default=chat_db.DEFAULT_DB_PATH)
+    sweep.add_argument("--top-k", type=int, default=5)
+    sweep.add_argument("--workers", type=int, default=4)
+    sweep.add_argument("--keep", action="store_true", help="Keep the temporary variant collections")
+    sweep.add_argument("--json", action="store_true")
+    sweep.set_defaults(func=cmd_sweep)
+
+    summarize = sub.add_parser("summarize", parents=[common, summary_llm],
+                               help="Build or update day/week/month summaries used for broad questions")
+    summarize.add_argument("contacts", nargs="+")
+    summarize.add_argument("--levels", nargs="+", choices=["day", "week", "month"], default=["day", "week", "month"])
+    summarize.set_defaults(func=cmd_summarize)
+
+    retrieval = argparse.ArgumentParser(add_help=False, parents=[common])
+    retrieval.add_argument("--top-k", type=int, default=5)
+    retrieval.add_argument("--hybrid", action="store_true")
+    retrieval.add_argument("--mmr-lambda", type=float)
+    retrieval.add_argument("--rerank", action="store_true", help="Rerank the over-fetched candidates with a cross-encoder")
+    retrieval.add_argument("--llm-model")
+    retrieval.add_argument("--llm-base-url")
+    retrieval.add_argument("--stub-llm", action="store_true", help="Use the in-process stub LLM")
+    retrieval.add_argument("--summaries", action="store_true", help="Answer broad questions from precomputed summaries")
+    retrieval.add_argument("--retrieval-cache", type=int, default=0, metavar="N",
+                           help="Cache up to N retrieval results, useful for repeated questions in --jsonl/bench runs")
+    retrieval.add_argument("--federate", nargs="+", metavar="COLLECTION[:BACKEND]",
+                           help="Also search these collections (e.g. imessage_chunks_openai:openai) and merge the results")
+
+    query = sub.add_parser("query", parents=[retrieval], help="Answer one question, or a JSONL stream with --jsonl")
+    query.add_argument("question", nargs="?")
+    query.add_argument("--jsonl", action="store_true", help="Read questions from stdin, write JSONL answers to stdout")
+    query.add_argument("--start")
+    query.add_argument("--end")
+    query.add_argument("--sender")
+    query.add_argument("--show-context", action="store_true")
+    query.set_defaults(func=cmd_query)
+
+    stats = sub.add_parser("stats", parents=[common], help="Show collection statistics")
+    stats.set_defaults(func=cmd_stats)
+
+    bench = sub.add_parser("bench", parents=[retrieval], help="Run the evaluation harness on a JSONL question set")
+    bench.add_argument("questions")
+    bench.add_argument("--concurrency", type=int, default=1)
+    bench.add_argument("--rate", type=float)
+    bench.set_defaults(func=cmd_bench)
+    return parser
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        interactive()
+        return
+    args = build_parser().parse_args(argv)
+    args.collection = args.collection or default_collection(args.backend)
+    if args.metrics:
+        instrumentation.enable()
+    if args.memory_report:
+        instrumentation.track_memory()
+    try:
+        args.func(args)
+    finally:
+        if args.metrics:
+            instrumentation.registry.export(args.metrics)
+        if args.memory_report:
+            print(instrumentation.stop_memory().report(), file=sys.stderr)
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,154 @@
+import os
+import sys
+import threading
+import tracemalloc
+
+# psutil gives the current RSS on every platform; without it we read /proc (Linux) or fall
+# back to the process's peak RSS from getrusage (macOS), which can only grow.
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+MB = 1024 * 1024
+
+def parse_size(value):
+    """
+    Parse a size such as "512MB", "2G" or "1500000" into bytes.
+    """
+    text = str(value).strip().upper().rstrip("B")
+    units = {"K": 1024, "M": MB, "G": 1024 * MB}
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(float(text))
+
+def current_rss():
+    """
+    Resident set size of this process in bytes.
+    """
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+class StageMemory:
+    """
+    Per-stage memory figures accumulated over all calls of the stage.
+    """
+    def __init__(self):
+        self.calls = 0
+        self.peak_traced = 0     # Highest Python allocation peak above the stage's starting point
+        self.peak_rss = 0        # Highest sampled RSS while the stage ran
+        self.max_rss_growth = 0  # Largest RSS increase from entry to exit
+
+class MemoryTracker:
+    """
+    Samples memory per pipeline stage. Attached to the instrumentation registry, it is
+    fed by the same spans that time the stages.
+    - tracemalloc: peak Python allocations during each stage (exact, but slows allocation-heavy code)
+    - RSS: sampled every `interval` seconds on a background thread, plus at stage entry and exit
+    Nested stages are handled; concurrent stages on several threads share the process-wide
+    figures, so attribute with care there.
+    """
+    def __init__(self, trace=True, interval=0.01):
+        self.trace = trace
+        self.interval = interval
+        self.stages = {}
+        self._active = []  # Stack of [name, traced_start, traced_peak, rss_start]
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.start_rss = current_rss()
+        self.peak_rss = self.start_rss
+        if trace and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+        self._sampler.start()
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self._record_rss(current_rss())
+
+    def _record_rss(self, rss):
+        with self._lock:
+            self.peak_rss = max(self.peak_rss, rss)
+            for frame in self._active:
+                stage = self.stages[frame[0]]
+                stage.peak_rss = max(stage.peak_rss, rss)
+
+    def _fold_traced_peak(self):
+        # tracemalloc has a single peak counter; fold it into every open stage before it is reset
+        peak = tracemalloc.get_traced_memory()[1]
+        for frame in self._active:
+            frame[2] = max(frame[2], peak)
+
+    def enter(self, name):
+        rss = current_rss()
+        with self._lock:
+            self.stages.setdefault(name, StageMemory())
+            traced = 0
+            if self.trace:
+                self._fold_traced_peak()
+                tracemalloc.reset_peak()
+                traced = tracemalloc.get_traced_memory()[0]
+            self._active.append([name, traced, traced, rss])
+        self._record_rss(rss)
+
+    def exit(self, name):
+        rss = current_rss()
+        self._record_rss(rss)
+        with self._lock:
+            if self.trace:
+                self._fold_traced_peak()
+            for i in range(len(self._active) - 1, -1, -1):
+                if self._active[i][0] == name:
+                    _, traced_start, traced_peak, rss_start = self._active.pop(i)
+                    break
+            else:
+                return
+            stage = self.stages[name]
+            stage.calls += 1
+            stage.peak_traced = max(stage.peak_traced, traced_peak - traced_start)
+            stage.max_rss_growth = max(stage.max_rss_growth, rss - rss_start)
+
+    def stop(self):
+        self._stop.set()
+        if self.trace and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def report(self):
+        """
+        Table of per-stage memory, largest Python allocation peak first.
+        """
+        lines = [f"{'stage':<22}{'calls':>7}{'peak alloc MB':>15}{'peak RSS MB':>13}{'RSS growth MB':>15}"]
+        for name, stage in sorted(self.stages.items(), key=lambda item: -item[1].peak_traced):
+            traced = f"{stage.peak_traced / MB:.1f}" if self.trace else "-"
+            lines.append(f"{name:<22}{stage.calls:>7}{traced:>15}{stage.peak_rss / MB:>13.1f}"
+                         f"{stage.max_rss_growth / MB:>15.1f}")
+        lines.append(f"process RSS: start {self.start_rss / MB:.1f} MB, peak {self.peak_rss / MB:.1f} MB")
+        return "\n".join(lines)
+
+class BatchSizer:
+    """
+    Feedback controller keeping RSS under a budget: after each batch, shrink the batch size
+    when RSS nears the budget and grow it again when there is plenty of headroom.
+    """
+    def __init__(self, budget, initial, minimum, maximum, high=0.85, low=0.6):
+        self.budget = budget
+        self.size = max(minimum, min(maximum, initial))
+        self.minimum = minimum
+        self.maximum = maximum
+        self.high = high
+        self.low = low
+
+    def update(self, rss=None):
+        rss = current_rss() if rss is None else rss
+        if rss > self.budget * self.high:
+            self.size = max(self.minimum, self.size // 2)
+        elif rss < self.budget * self.low:
+            self.size = min(self.maximum, int(self.size * 1.5) + 1)
+        return self.size
@@ -1,5 +1,6 @@
 import re
 from datetime import datetime
+from imessage_insight import instrumentation
 
 class MessagePreprocessor:
     """
@@ -42,6 +43,7 @@ class MessagePreprocessor:
         except Exception:
             return None
 
+    @instrumentation.timed("process_messages")
     def process_messages(self, raw_messages):
         """
         Process a list of raw messages from the database.
@@ -0,0 +1,127 @@
+import json
+import os
+import time
+from imessage_insight.vector_store import to_timestamp
+
+# --- Migration Registry ---
+# Each migration is a function taking one document's metadata dict and returning
+# the updated metadata, or None if the document needs no change.
+MIGRATIONS = {}
+
+def register_migration(name):
+    """
+    Decorator registering a metadata transform under `name`.
+    """
+    def decorator(fn):
+        MIGRATIONS[name] = fn
+        return fn
+    return decorator
+
+def _set_date_ts(meta, field):
+    """
+    Return a copy of meta with '<field>_ts' set from its ISO date, or None if unchanged/invalid.
+    """
+    ts = to_timestamp(meta.get(field))
+    if ts is None or meta.get(f"{field}_ts") == ts:
+        return None
+    meta = dict(meta)
+    meta[f"{field}_ts"] = ts
+    return meta
+
+@register_migration("start_date_ts")
+def add_start_date_ts(meta):
+    """
+    Add a float 'start_date_ts' computed from 'start_date'.
+    """
+    return _set_date_ts(meta, "start_date")
+
+@register_migration("end_date_ts")
+def add_end_date_ts(meta):
+    """
+    Add a float 'end_date_ts' computed from 'end_date' (needed for time-range retrieval).
+    """
+    return _set_date_ts(meta, "end_date")
+
+# --- Runner ---
+class MigrationRunner:
+    """
+    Applies a registered metadata migration to a ChromaVectorStore's collection.
+    Pages through the collection with limit/offset, writes updates in batches through the
+    store (so its write version, and with it every retrieval cache, moves on),
+    and checkpoints the offset to disk after every batch so an interrupted run
+    resumes where it stopped. In dry-run mode nothing is written (not even the checkpoint).
+    Checkpoints default to <persist_dir>/migration_checkpoints, so they belong to the store
+    they describe wherever the runner is started from.
+    """
+    def __init__(self, store, migration_name, batch_size=500, checkpoint_dir=None, dry_run=False):
+        if migration_name not in MIGRATIONS:
+            raise ValueError(f"Unknown migration: {migration_name}. Available: {', '.join(sorted(MIGRATIONS))}")
+        self.store = store
+        self.collection = store.collection
+        self.migration_name = migration_name
+        self.transform = MIGRATIONS[migration_name]
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        checkpoint_dir = checkpoint_dir or os.path.join(store.persist_dir, "migration_checkpoints")
+        self.checkpoint_path = os.path.join(checkpoint_dir, f"{self.collection.name}__{migration_name}.json")
+
+    def load_checkpoint(self):
+        """
+        Load the saved checkpoint, or a fresh one if none exists.
+        """
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path) as f:
+                return json.load(f)
+        return {"offset": 0, "updated": 0, "unchanged": 0, "completed": False}
+
+    def save_checkpoint(self, checkpoint):
+        """
+        Atomically write the checkpoint so a crash mid-write can't corrupt it.
+        """
+        os.makedirs(os.path.dirname(self.checkpoint_path), exist_ok=True)
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def run(self, restart=False):
+        """
+        Run (or resume) the migration. Returns the final checkpoint dict with counts.
+        """
+        checkpoint = {"offset": 0, "updated": 0, "unchanged": 0, "completed": False} if restart else self.load_checkpoint()
+        if checkpoint["completed"]:
+            print(f"Migration '{self.migration_name}' already completed for '{self.collection.name}'. Use restart to run again.")
+            return checkpoint
+        total = self.collection.count()
+        if checkpoint["offset"]:
+            print(f"Resuming '{self.migration_name}' at offset {checkpoint['offset']}/{total}.")
+        mode = " (dry run)" if self.dry_run else ""
+        start_time = time.perf_counter()
+        scanned = 0
+        while True:
+            page = self.collection.get(include=["metadatas"], limit=self.batch_size, offset=checkpoint["offset"])
+            ids = page["ids"]
+            if not ids:
+                break
+            updates = []
+            for doc_id, meta in zip(ids, page["metadatas"]):
+                new_meta = self.transform(meta or {})
+                if new_meta is None:
+                    checkpoint["unchanged"] += 1
+                else:
+                    updates.append({'id': doc_id, 'metadata': new_meta})
+            if updates and not self.dry_run:
+                self.store.update_chunks(updates)
+            checkpoint["updated"] += len(updates)
+            checkpoint["offset"] += len(ids)
+            scanned += len(ids)
+            if not self.dry_run:
+                self.save_checkpoint(checkpoint)
+            elapsed = time.perf_counter() - start_time
+            rate = scanned / elapsed if elapsed > 0 else 0.0
+            print(f"[{self.migration_name}{mode}] {checkpoint['offset']}/{total} docs, "
+                  f"{checkpoint['updated']} updated, {rate:.0f} docs/sec")
+        checkpoint["completed"] = True
+        if not self.dry_run:
+            self.save_checkpoint(checkpoint)
+        return checkpoint
@@ -1,6 +1,14 @@
-import os
-from openai import OpenAI
+import asyncio
+import time
 from imessage_insight.vector_store import ChromaVectorStore
+from imessage_insight.federated import FederatedRetriever
+from imessage_insight.utils import normalize
+from imessage_insight.ranking import reciprocal_rank_fusion, mmr_select
+from imessage_insight.context_packing import ContextPacker
+from imessage_insight.llm import OpenAILLMClient, OpenAICompatibleLLMClient
+from imessage_insight.date_parsing import extract_date_range
+from imessage_insight.summaries import is_broad_question
+from imessage_insight import instrumentation
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -10,54 +18,445 @@ class RAGPipeline:
     Retrieval-Augmented Generation pipeline for iMessage insight.
     Handles embedding, retrieval, and LLM answer generation.
     """
-    def __init__(self, collection_name="imessage_chunks", persist_dir="chromadb_data", embedder=None, llm_model="gpt-4o"):
+    def __init__(self, collection_name="imessage_chunks", persist_dir="chromadb_data", embedder=None, llm_model="gpt-4o",
+                 hybrid=False, mmr_lambda=None, fetch_k=20, answer_cache=None, llm_base_url=None,
+                 max_context_tokens=1500, llm_client=None, parse_dates=True, reranker=None, summaries=None,
+                 summary_top_k=12, retrieval_cache=None, shards=None):
+        """
+        hybrid fuses BM25 keyword results with vector results (reciprocal rank fusion).
+        mmr_lambda (0-1) enables maximal-marginal-relevance diversification of the results,
+        so near-duplicate adjacent chunks don't crowd out the context; None disables it.
+        Both stages over-fetch fetch_k candidates before narrowing to top_k.
+        answer_cache is an optional SemanticAnswerCache consulted by generate_answer.
+        llm_client is any LLMClient (see llm.py); by default an OpenAILLMClient is built,
+        or an OpenAICompatibleLLMClient when llm_base_url is given (no API key required).
+        parse_dates turns date expressions in questions ("last December", "in 2022") into
+        start/end retrieval filters when no explicit range is passed.
+        max_context_tokens is the default token budget for the packed context.
+        summaries is an optional SummaryIndex (see summaries.py); broad questions ("how has our
+        relationship changed this year?") are then answered from up to summary_top_k
+        precomputed day/week/month summaries instead of a handful of raw chunks.
+        retrieval_cache is an optional RetrievalCache used by retrieve_context.
+        shards is an optional list of extra (label, ChromaVectorStore, embedder) collections, e.g.
+        other contacts' collections or the other backend's; vector (and BM25) candidates are then
+        gathered from this collection and every shard by a FederatedRetriever.
+        """
         if embedder is None:
             raise ValueError("RAGPipeline requires an embedder instance.")
         self.embedder = embedder
         self.vector_store = ChromaVectorStore(collection_name=collection_name, persist_dir=persist_dir)
-        self.openai_api_key = os.getenv("OPENAI_API_KEY")
-        if not self.openai_api_key:
-            raise ValueError("OPENAI_API_KEY not set in environment.")
-        self.openai_client = OpenAI(api_key=self.openai_api_key)
+        if llm_client is None:
+            llm_client = OpenAICompatibleLLMClient(llm_base_url) if llm_base_url else OpenAILLMClient()
+        self.llm = llm_client
         self.llm_model = llm_model
+        self.context_packer = ContextPacker(llm_model, max_tokens=max_context_tokens)
+        self.hybrid = hybrid
+        self.mmr_lambda = mmr_lambda
+        self.fetch_k = fetch_k
+        self.answer_cache = answer_cache
+        self.parse_dates = parse_dates
+        self.reranker = reranker
+        self.summaries = summaries
+        self.summary_top_k = summary_top_k
+        self.retrieval_cache = retrieval_cache
+        self.federated = None
+        if shards:
+            self.federated = FederatedRetriever([(collection_name, self.vector_store, embedder)] + list(shards),
+                                                fetch_k=fetch_k)
+            if mmr_lambda is not None and self.federated.normalization is not None:
+                raise ValueError("MMR needs every federated shard to use the pipeline's embedding model.")
+
+    def close(self):
+        """
+        Release background resources (the federated retriever's embedding threads).
+        """
+        if self.federated is not None:
+            self.federated.close()
 
-    def retrieve_context(self, query, top_k=5):
+    def analyze_query(self, query, start=None, end=None):
+        """
+        Query-analysis stage: resolve the time range to search.
+        An explicit start/end always wins; otherwise, with parse_dates enabled, a date
+        expression in the question becomes the range. Returns (start, end).
+        """
+        if start is None and end is None and self.parse_dates:
+            return extract_date_range(query)
+        return start, end
+
+    def retrieve_context(self, query, top_k=5, start=None, end=None, sender=None, query_embedding=None,
+                         range_parsed=False):
         """
         Embed the query and retrieve top-k most similar chunks from ChromaDB.
+        Optional start/end (datetime, ISO string, or timestamp) restrict retrieval to chunks
+        overlapping that time range; sender restricts it to one contact's chunks.
+        Pass query_embedding to skip re-embedding a query that was already embedded.
+        With a retrieval cache, a repeated (query, top_k, filters) against an unchanged
+        collection returns the cached results without embedding or searching.
+        A time range parsed from the question (rather than passed in; callers that already ran
+        analyze_query pass range_parsed=True) is dropped again if nothing matches it, since the
+        parse may have misread the question.
         Returns a list of dicts with text and metadata.
         """
+        explicit_range = (start is not None or end is not None) and not range_parsed
+        start, end = self.analyze_query(query, start, end)
+        if sender is not None:
+            sender = normalize(sender)
+        cache_key = None
+        if self.retrieval_cache is not None:
+            cache_key = self._retrieval_cache_key(query, top_k, start, end, sender)
+            cached = self.retrieval_cache.get(cache_key)
+            if cached is not None:
+                return cached
         # Use the embedder's backend to embed the query
-        if hasattr(self.embedder, 'backend') and self.embedder.backend == 'openai':
-            query_embedding = self.embedder.model.embed_query(query)
-        else:
-            query_embedding = self.embedder.model.encode([query])[0]
-        results = self.vector_store.query(query_embedding, top_k=top_k)
+        if query_embedding is None:
+            query_embedding = self.embedder.embed_query(query)
+        results = self._search(query, query_embedding, top_k, start, end, sender)
+        if not results and not explicit_range and (start is not None or end is not None):
+            results = self._search(query, query_embedding, top_k, None, None, sender)
+        if cache_key is not None:
+            self.retrieval_cache.put(cache_key, results)
         return results
 
-    def generate_answer(self, query, top_k=5, max_context_chars=3000):
+    def _search(self, query, query_embedding, top_k, start, end, sender):
         """
-        Retrieve context and generate an answer using OpenAI LLM.
-        Returns the answer string and the context used.
+        Chunks, interleaved with summaries for broad questions (when built): summaries give the
+        overview, chunks the specifics, and a misclassified question still gets its chunks.
+        """
+        results = self._vector_candidates(query, query_embedding, self._fetch_k(top_k), start, end, sender)
+        results = self._refine_candidates(query, query_embedding, results, top_k, start=start, end=end, sender=sender)
+        if self.summaries is not None and is_broad_question(query):
+            _, summaries = self.summaries.search(query_embedding, top_k=max(top_k, self.summary_top_k),
+                                                 start=start, end=end, sender=sender)
+            # Alternate (summary first) so both survive the context token budget
+            merged = []
+            for i in range(max(len(summaries), len(results))):
+                merged.extend(r[i] for r in (summaries, results) if i < len(r))
+            results = merged
+        return results
+
+    def _vector_candidates(self, query, query_embedding, top_k, start, end, sender):
+        """
+        Nearest chunks from this collection, or from every shard when federated.
+        """
+        if self.federated is None:
+            return self.vector_store.query(query_embedding, top_k=top_k, start=start, end=end, sender=sender)
+        return self.federated.search(query, top_k=top_k, start=start, end=end, sender=sender,
+                                     query_embeddings={id(self.embedder): query_embedding})
+
+    def _stores(self):
+        return self.federated.stores if self.federated is not None else [self.vector_store]
+
+    def _retrieval_settings(self):
+        """
+        Every pipeline setting that shapes retrieval results, plus the summary collections'
+        write versions and any federated shards' write versions, for cache keys.
+        """
+        summary_versions = shard_versions = None
+        if self.summaries is not None:
+            summary_versions = tuple(store.version for store in self.summaries.stores.values())
+        if self.federated is not None:
+            shard_versions = tuple((label, store.version) for label, store, _ in self.federated.shards)
+        return (self.hybrid, self.mmr_lambda, self.fetch_k, self.reranker is not None, summary_versions,
+                shard_versions)
+
+    def _retrieval_cache_key(self, query, top_k, start, end, sender):
+        """
+        Retrieval-cache key: collection write version(s) plus every setting that shapes the results.
+        """
+        return self.retrieval_cache.make_key(self.vector_store.collection.name, self.vector_store.version, query, top_k,
+                                             settings=self._retrieval_settings(), start=start, end=end, sender=sender)
+
+    def _fetch_k(self, top_k):
+        """
+        Number of vector candidates to fetch: over-fetch only when hybrid fusion, reranking
+        or MMR will narrow them.
+        """
+        if self.hybrid or self.reranker is not None or self.mmr_lambda is not None:
+            return max(top_k, self.fetch_k)
+        return top_k
+
+    def _refine_candidates(self, query, query_embedding, results, top_k, start=None, end=None, sender=None):
+        """
+        Apply the optional hybrid fusion, MMR and reranking stages to vector candidates and keep top_k.
+        """
+        fetch_k = self._fetch_k(top_k)
+        if self.hybrid:
+            lexical_results = [store.lexical_query(query, top_k=fetch_k, start=start, end=end, sender=sender)
+                               for store in self._stores()]
+            results = reciprocal_rank_fusion([results] + lexical_results, top_k=fetch_k)
+        if self.mmr_lambda is not None:
+            results = mmr_select(query_embedding, results, top_k=top_k, lambda_mult=self.mmr_lambda)
+        if self.reranker is not None:
+            # After MMR, so its diverse selection survives and the reranker only orders it
+            results = self.reranker.rerank(query, results, top_k=top_k)
+        return results[:top_k]
+
+    def _build_context(self, retrieved, max_context_tokens=None):
+        """
+        Pack retrieved chunks into the context string sent to the LLM.
+        Returns (context, context_tokens).
+        """
+        return self.context_packer.pack(retrieved, max_tokens=max_context_tokens)
+
+    def _build_messages(self, query, context):
+        """
+        Build the chat messages for a question and its retrieved context.
         """
-        retrieved = self.retrieve_context(query, top_k=top_k)
-        context_chunks = [r['text'] for r in retrieved]
-        context = "\n---\n".join(context_chunks)
-        if len(context) > max_context_chars:
-            context = context[:max_context_chars] + "..."
         prompt = f"""
 Context:
 {context}
 
 Question: {query}
 Answer:"""
-        response = self.openai_client.chat.completions.create(
-            model=self.llm_model,
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that answers questions based on the provided iMessage conversation context."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=512,
-            temperature=0.2
+        return [
+            {"role": "system", "content": "You are a helpful assistant that answers questions based on the provided iMessage conversation context."},
+            {"role": "user", "content": prompt}
+        ]
+
+    def _cache_key(self, top_k, start, end, sender):
+        """
+        Answer-cache key prefix for the current collection version and retrieval settings.
+        """
+        return (self.vector_store.collection.name, self.vector_store.version, top_k,
+                self.answer_cache.filters_key(start=start, end=end, sender=sender, settings=self._retrieval_settings()))
+
+    def generate_answer(self, query, top_k=5, max_context_tokens=None, start=None, end=None, sender=None):
+        """
+        Retrieve context and generate an answer using the configured LLM client.
+        start/end/sender are passed through to retrieve_context as retrieval filters.
+        max_context_tokens overrides the pipeline's context token budget for this call.
+        If an answer cache is configured, a semantically equivalent earlier question against
+        the same collection version returns its cached answer without retrieval or an LLM call.
+        Returns the answer string and the context used.
+        """
+        result = self.answer_query(query, top_k=top_k, max_context_tokens=max_context_tokens,
+                                   start=start, end=end, sender=sender)
+        return result["answer"], result["context"]
+
+    def answer_query(self, query, top_k=5, max_context_tokens=None, start=None, end=None, sender=None):
+        """
+        generate_answer with details, for evaluation and serving.
+        Returns a dict with answer, context, context_tokens, retrieved (result dicts),
+        cached (bool), route ('chunks' or the summary level answered from), and timings: seconds spent in each stage ('analyze', 'embed', 'cache',
+        'retrieve', 'pack', 'llm') plus 'total'.
+        """
+        timings = {}
+        started = stage_start = time.perf_counter()
+
+        def lap(stage):
+            nonlocal stage_start
+            now = time.perf_counter()
+            timings[stage] = now - stage_start
+            stage_start = now
+
+        range_parsed = start is None and end is None
+        start, end = self.analyze_query(query, start, end)
+        lap("analyze")
+        query_embedding = self.embedder.embed_query(query)
+        lap("embed")
+        if self.answer_cache is not None:
+            cache_key = self._cache_key(top_k, start, end, sender)
+            cached = self.answer_cache.lookup(*cache_key, query_embedding)
+            lap("cache")
+            if cached is not None:
+                timings["total"] = time.perf_counter() - started
+                return {"answer": cached[0], "context": cached[1], "context_tokens": None,
+                        "retrieved": [], "cached": True, "route": "cache", "timings": timings}
+        retrieved = self.retrieve_context(query, top_k=top_k, start=start, end=end, sender=sender,
+                                          query_embedding=query_embedding, range_parsed=range_parsed)
+        lap("retrieve")
+        context, context_tokens = self._build_context(retrieved, max_context_tokens)
+        lap("pack")
+        with instrumentation.span("llm", model=self.llm_model):
+            answer = self.llm.complete(self._build_messages(query, context), model=self.llm_model)
+        lap("llm")
+        timings["total"] = time.perf_counter() - started
+        if self.answer_cache is not None:
+            self.answer_cache.store(*cache_key, query, query_embedding, answer, context, timings["total"])
+        route = (retrieved[0].get("metadata") or {}).get("level", "chunks") if retrieved else "chunks"
+        return {"answer": answer, "context": context, "context_tokens": context_tokens,
+                "retrieved": retrieved, "cached": False, "route": route, "timings": timings}
+
+    def stream_answer(self, query, top_k=5, max_context_tokens=None, start=None, end=None, sender=None):
+        """
+        Streaming variant of generate_answer.
+        Retrieval happens immediately, so the returned StreamingAnswer's .context is available
+        before the first token; iterating it yields answer tokens as the LLM produces them.
+        Time-to-first-token and total latency are recorded in its .timings dict.
+        """
+        started = time.perf_counter()
+        range_parsed = start is None and end is None
+        start, end = self.analyze_query(query, start, end)
+        query_embedding = self.embedder.embed_query(query)
+        cache_key = None
+        if self.answer_cache is not None:
+            cache_key = self._cache_key(top_k, start, end, sender)
+            cached = self.answer_cache.lookup(*cache_key, query_embedding)
+            if cached is not None:
+                answer, context = cached
+                return StreamingAnswer(context, iter([answer]), started)
+        retrieved = self.retrieve_context(query, top_k=top_k, start=start, end=end, sender=sender,
+                                          query_embedding=query_embedding, range_parsed=range_parsed)
+        context, context_tokens = self._build_context(retrieved, max_context_tokens)
+        tokens = self.llm.stream(self._build_messages(query, context), model=self.llm_model)
+
+        def on_complete(answer, elapsed):
+            if cache_key is not None:
+                self.answer_cache.store(*cache_key, query, query_embedding, answer, context, elapsed)
+
+        return StreamingAnswer(context, tokens, started, retrieved=retrieved, on_complete=on_complete,
+                               context_tokens=context_tokens)
+
+    # --- Async API ---
+    async def aretrieve_context(self, query, top_k=5, start=None, end=None, sender=None, query_embedding=None,
+                                range_parsed=False):
+        """
+        Async retrieve_context. Embedding and the vector search run in a worker thread
+        so the event loop stays free for other questions.
+        """
+        return await asyncio.to_thread(
+            self.retrieve_context, query, top_k=top_k, start=start, end=end, sender=sender,
+            query_embedding=query_embedding, range_parsed=range_parsed
         )
-        answer = response.choices[0].message.content.strip()
-        return answer, context 
\ No newline at end of file
+
+    def _vector_candidates_batch(self, queries, query_embeddings, top_k, start, end, sender):
+        """
+        _vector_candidates for many questions: one batched vector query, or a federated search each.
+        """
+        if self.federated is None:
+            return self.vector_store.query_batch(query_embeddings, top_k=top_k, start=start, end=end, sender=sender)
+        return [self._vector_candidates(query, emb, top_k, start, end, sender)
+                for query, emb in zip(queries, query_embeddings)]
+
+    async def _acomplete(self, query, context):
+        """
+        Ask the LLM for an answer without blocking the event loop.
+        """
+        with instrumentation.span("llm", model=self.llm_model):
+            return await self.llm.acomplete(self._build_messages(query, context), model=self.llm_model)
+
+    async def agenerate_answer(self, query, top_k=5, max_context_tokens=None, start=None, end=None, sender=None):
+        """
+        Async generate_answer. Returns the answer string and the context used.
+        """
+        started = time.perf_counter()
+        range_parsed = start is None and end is None
+        start, end = self.analyze_query(query, start, end)
+        query_embedding = await asyncio.to_thread(self.embedder.embed_query, query)
+        if self.answer_cache is not None:
+            cache_key = self._cache_key(top_k, start, end, sender)
+            cached = await asyncio.to_thread(self.answer_cache.lookup, *cache_key, query_embedding)
+            if cached is not None:
+                return cached
+        retrieved = await self.aretrieve_context(query, top_k=top_k, start=start, end=end, sender=sender,
+                                                 query_embedding=query_embedding, range_parsed=range_parsed)
+        context, _ = await asyncio.to_thread(self._build_context, retrieved, max_context_tokens)
+        answer = await self._acomplete(query, context)
+        if self.answer_cache is not None:
+            await asyncio.to_thread(self.answer_cache.store, *cache_key, query, query_embedding, answer, context,
+                                    time.perf_counter() - started)
+        return answer, context
+
+    async def agenerate_answers_batch(self, queries, top_k=5, max_context_tokens=None, start=None, end=None,
+                                      sender=None, concurrency=8):
+        """
+        Answer many questions at once. All queries are embedded in one embedder call and
+        searched in one batched vector query; the LLM calls then run concurrently,
+        at most `concurrency` at a time. Returns a list of (answer, context) in input order.
+        """
+        query_embeddings = await asyncio.to_thread(self.embedder.embed_queries, queries)
+        normalized_sender = normalize(sender) if sender is not None else None
+        # Questions resolving to the same time range share one batched vector query
+        ranges = [self.analyze_query(query, start, end) for query in queries]
+        groups = {}
+        for i, time_range in enumerate(ranges):
+            groups.setdefault(time_range, []).append(i)
+        candidate_lists = [None] * len(queries)
+        for (range_start, range_end), indices in groups.items():
+            results = await asyncio.to_thread(
+                self._vector_candidates_batch, [queries[i] for i in indices], [query_embeddings[i] for i in indices],
+                self._fetch_k(top_k), range_start, range_end, normalized_sender
+            )
+            for i, candidates in zip(indices, results):
+                candidate_lists[i] = candidates
+        # Parsed ranges that matched nothing may be misreads: search those questions unfiltered
+        if start is None and end is None:
+            retry = [i for i, candidates in enumerate(candidate_lists) if not candidates and ranges[i] != (None, None)]
+            if retry:
+                results = await asyncio.to_thread(
+                    self._vector_candidates_batch, [queries[i] for i in retry], [query_embeddings[i] for i in retry],
+                    self._fetch_k(top_k), None, None, normalized_sender
+                )
+                for i, candidates in zip(retry, results):
+                    candidate_lists[i], ranges[i] = candidates, (None, None)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def answer_one(query, query_embedding, candidates, time_range):
+            started = time.perf_counter()
+            range_start, range_end = time_range
+            cache_key = None
+            if self.answer_cache is not None:
+                cache_key = self._cache_key(top_k, range_start, range_end, sender)
+                cached = await asyncio.to_thread(self.answer_cache.lookup, *cache_key, query_embedding)
+                if cached is not None:
+                    return cached
+            if self.summaries is not None and is_broad_question(query):
+                retrieved = await self.aretrieve_context(query, top_k=top_k, start=range_start, end=range_end,
+                                                         sender=sender, query_embedding=query_embedding,
+                                                         range_parsed=start is None and end is None)
+            else:
+                # Reranking/MMR and context packing are CPU-bound: keep them off the event loop
+                retrieved = await asyncio.to_thread(self._refine_candidates, query, query_embedding, candidates, top_k,
+                                                    start=range_start, end=range_end, sender=normalized_sender)
+            context, _ = await asyncio.to_thread(self._build_context, retrieved, max_context_tokens)
+            async with semaphore:
+                answer = await self._acomplete(query, context)
+            if cache_key is not None:
+                await asyncio.to_thread(self.answer_cache.store, *cache_key, query, query_embedding, answer, context,
+                                        time.perf_counter() - started)
+            return answer, context
+
+        return await asyncio.gather(*(
+            answer_one(query, emb, candidates, time_range)
+            for query, emb, candidates, time_range in zip(queries, query_embeddings, candidate_lists, ranges)
+        ))
+
+    def generate_answers_batch(self, queries, top_k=5, max_context_tokens=None, start=None, end=None,
+                               sender=None, concurrency=8):
+        """
+        Synchronous wrapper around agenerate_answers_batch for scripts and the CLI.
+        """
+        return asyncio.run(self.agenerate_answers_batch(
+            queries, top_k=top_k, max_context_tokens=max_context_tokens, start=start, end=end,
+            sender=sender, concurrency=concurrency
+        ))
+
+class StreamingAnswer:
+    """
+    Iterable over the tokens of a streamed answer.
+    .context holds the retrieved context; .answer accumulates the text yielded so far;
+    .timings gets 'retrieval', 'ttft' (time to first token) and 'total' in seconds,
+    all measured from when the question was asked. .context_tokens is the packed context size.
+    """
+    def __init__(self, context, tokens, started, retrieved=None, on_complete=None, context_tokens=None):
+        self.context = context
+        self.context_tokens = context_tokens
+        self.retrieved = retrieved or []
+        self.answer = ""
+        self.timings = {"retrieval": time.perf_counter() - started}
+        self._tokens = tokens
+        self._started = started
+        self._on_complete = on_complete
+
+    def __iter__(self):
+        for token in self._tokens:
+            if "ttft" not in self.timings:
+                self.timings["ttft"] = time.perf_counter() - self._started
+            self.answer += token
+            yield token
+        self.answer = self.answer.strip()
+        self.timings["total"] = time.perf_counter() - self._started
+        # Streamed LLM time runs from the end of retrieval to the last token
+        instrumentation.observe("stage_seconds", self.timings["total"] - self.timings["retrieval"], stage="llm_stream")
+        if self._on_complete is not None:
+            self._on_complete(self.answer, self.timings["total"])
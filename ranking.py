@@ -0,0 +1,71 @@
+import numpy as np
+
+# --- Result Ranking Helpers ---
+# Functions that combine or re-order lists of result dicts as returned by ChromaVectorStore.query.
+
+def reciprocal_rank_fusion(result_lists, top_k=5, k=60):
+    """
+    Merge several ranked result lists with reciprocal rank fusion.
+    Each result's fused score is sum(1 / (k + rank)) over the lists it appears in,
+    so no score normalization between BM25 and vector similarity is needed.
+    Results are matched by 'id'; the first occurrence supplies text/metadata/embedding.
+    Returns the top_k fused results with 'score' set to the fused score.
+    """
+    fused = {}
+    for results in result_lists:
+        for rank, result in enumerate(results, start=1):
+            entry = fused.get(result["id"])
+            if entry is None:
+                entry = fused[result["id"]] = dict(result, score=0.0)
+            entry["score"] += 1.0 / (k + rank)
+    return sorted(fused.values(), key=lambda r: r["score"], reverse=True)[:top_k]
+
+def mmr_select(query_embedding, results, top_k=5, lambda_mult=0.5):
+    """
+    Pick a diverse top_k from candidate results with maximal marginal relevance.
+    Each step selects the candidate maximizing
+        lambda_mult * sim(query, c) - (1 - lambda_mult) * max(sim(c, already selected)),
+    using cosine similarities from one vectorized similarity matrix over the candidates'
+    'embedding' fields. lambda_mult=1 is pure relevance, 0 is pure diversity.
+    """
+    if len(results) <= top_k:
+        return list(results)
+    emb = np.asarray([r["embedding"] for r in results], dtype=np.float32)
+    emb /= np.maximum(np.linalg.norm(emb, axis=1, keepdims=True), 1e-12)
+    q = np.asarray(query_embedding, dtype=np.float32)
+    q /= max(np.linalg.norm(q), 1e-12)
+    relevance = emb @ q
+    similarity = emb @ emb.T
+    selected = [int(np.argmax(relevance))]
+    # Highest similarity of every candidate to anything selected so far
+    max_sim = similarity[selected[0]].copy()
+    available = np.ones(len(results), dtype=bool)
+    available[selected[0]] = False
+    while len(selected) < top_k:
+        mmr = lambda_mult * relevance - (1 - lambda_mult) * max_sim
+        mmr[~available] = -np.inf
+        best = int(np.argmax(mmr))
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_sim, similarity[best], out=max_sim)
+    return [results[i] for i in selected]
+
+def normalize_scores(results, method="zscore"):
+    """
+    Rescale the 'score' of one source's results so scores from different collections
+    (and different embedding models, whose similarity ranges differ) are comparable.
+    'zscore' standardizes against the mean/std of the given results; 'minmax' maps them to [0, 1].
+    Returns new result dicts with the original score kept as 'raw_score'.
+    """
+    if not results:
+        return []
+    scores = np.asarray([r["score"] for r in results], dtype=np.float64)
+    if method == "zscore":
+        std = scores.std()
+        normalized = (scores - scores.mean()) / std if std > 0 else np.zeros_like(scores)
+    elif method == "minmax":
+        span = scores.max() - scores.min()
+        normalized = (scores - scores.min()) / span if span > 0 else np.ones_like(scores)
+    else:
+        raise ValueError(f"Unknown normalization method: {method}")
+    return [dict(r, raw_score=r["score"], score=float(s)) for r, s in zip(results, normalized)]
@@ -0,0 +1,69 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Import CrossEncoder lazily-tolerant so the rest of the pipeline works without it
+try:
+    from sentence_transformers import CrossEncoder
+except ImportError:
+    CrossEncoder = None
+
+class CrossEncoderReranker:
+    """
+    Second-stage reranker scoring (query, chunk) pairs with a small CPU cross-encoder.
+    Pairs are scored in batches and cached (LRU), so repeated questions and chunks that
+    keep showing up as candidates aren't re-scored.
+    """
+    def __init__(self, model_name="cross-encoder/ms-marco-MiniLM-L-6-v2", batch_size=32, cache_size=20000, device="cpu"):
+        if CrossEncoder is None:
+            raise ImportError("sentence_transformers is not installed. Please install it to use reranking.")
+        print(f"Loading cross-encoder: {model_name}")
+        self.model = CrossEncoder(model_name, device=device)
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._lock = threading.Lock()
+
+    def _key(self, query, text):
+        return hashlib.sha1(f"{query}\x00{text}".encode()).hexdigest()
+
+    def score(self, query, texts):
+        """
+        Relevance score for each text against the query (higher is more relevant).
+        """
+        keys = [self._key(query, text) for text in texts]
+        scores = [None] * len(texts)
+        missing = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                if key in self.cache:
+                    self.cache.move_to_end(key)
+                    scores[i] = self.cache[key]
+                    self.cache_hits += 1
+                else:
+                    missing.append(i)
+                    self.cache_misses += 1
+        if missing:
+            predicted = self.model.predict([(query, texts[i]) for i in missing], batch_size=self.batch_size)
+            with self._lock:
+                for i, value in zip(missing, predicted):
+                    scores[i] = float(value)
+                    self.cache[keys[i]] = scores[i]
+                while len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+        return scores
+
+    def rerank(self, query, results, top_k=None):
+        """
+        Reorder result dicts by cross-encoder score (stored as 'rerank_score') and keep top_k.
+        """
+        if not results:
+            return []
+        scores = self.score(query, [r["text"] for r in results])
+        reranked = sorted(
+            (dict(r, rerank_score=s) for r, s in zip(results, scores)),
+            key=lambda r: r["rerank_score"], reverse=True
+        )
+        return reranked[:top_k] if top_k else reranked
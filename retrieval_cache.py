@@ -0,0 +1,68 @@
+import copy
+import json
+import threading
+from collections import OrderedDict
+from imessage_insight import instrumentation
+
+def normalize_query(query):
+    """
+    Case- and whitespace-insensitive form of a query for cache keys.
+    """
+    return " ".join(query.lower().split())
+
+class RetrievalCache:
+    """
+    Bounded in-memory LRU cache of retrieval results.
+    Keys are (collection, collection write version, normalized query, top_k, filters, settings),
+    so a write to the collection (add, update, delete all bump the version) makes every
+    earlier entry unreachable; those entries then age out of the LRU.
+    Hits skip both query embedding and the vector search.
+    """
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(collection, version, query, top_k, settings=None, **filters):
+        filters_key = json.dumps({k: str(v) for k, v in sorted(filters.items()) if v is not None})
+        return (collection, version, normalize_query(query), top_k, filters_key, settings)
+
+    def get(self, key):
+        """
+        Cached results for key (a deep copy, so callers may modify results and their metadata), or None.
+        """
+        with self._lock:
+            results = self._entries.get(key)
+            if results is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        instrumentation.counter("retrieval_cache_requests_total", result="miss" if results is None else "hit")
+        return None if results is None else copy.deepcopy(results)
+
+    def put(self, key, results):
+        with self._lock:
+            self._entries[key] = copy.deepcopy(results)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
@@ -0,0 +1,51 @@
+# Offline batch Q&A evaluation and load harness.
+# Usage:
+#   python -m imessage_insight.scripts.evaluate_rag questions.jsonl --collection imessage_chunks --stub-llm
+#   python -m imessage_insight.scripts.evaluate_rag questions.jsonl --rate 5 --concurrency 8 --stub-llm
+# questions.jsonl lines look like: {"question": "...", "expected_ids": ["12", "13"]}
+
+import argparse
+import json
+from imessage_insight.embedding import MessageEmbedder
+from imessage_insight.evaluation import EvaluationHarness, load_questions, format_report
+from imessage_insight.llm import StubLLMClient
+from imessage_insight.rag import RAGPipeline
+
+# --- Config ---
+CHROMA_DIR = "imessage_insight/chromadb_data"
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate retrieval quality and latency of the RAG pipeline.")
+    parser.add_argument("questions", help="JSONL file of questions")
+    parser.add_argument("--collection", default="imessage_chunks")
+    parser.add_argument("--persist-dir", default=CHROMA_DIR)
+    parser.add_argument("--backend", choices=["sentence_transformers", "openai"], default="sentence_transformers")
+    parser.add_argument("--llm-model", default="gpt-3.5-turbo")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--hybrid", action="store_true")
+    parser.add_argument("--mmr-lambda", type=float)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--rate", type=float, help="Open-loop request rate in questions/sec (load test)")
+    parser.add_argument("--llm-base-url", help="OpenAI-compatible server to use instead of OpenAI")
+    parser.add_argument("--stub-llm", action="store_true", help="Use the deterministic in-process stub LLM")
+    parser.add_argument("--stub-latency-ms", type=float, default=300)
+    parser.add_argument("--output", help="Write per-question records as JSONL here")
+    args = parser.parse_args()
+
+    llm_client = StubLLMClient(latency=args.stub_latency_ms / 1000) if args.stub_llm else None
+
+    embedder = MessageEmbedder(backend=args.backend)
+    rag = RAGPipeline(collection_name=args.collection, persist_dir=args.persist_dir, embedder=embedder,
+                      llm_model=args.llm_model, hybrid=args.hybrid, mmr_lambda=args.mmr_lambda,
+                      llm_base_url=args.llm_base_url, llm_client=llm_client)
+    questions = load_questions(args.questions)
+    harness = EvaluationHarness(rag, top_k=args.top_k, concurrency=args.concurrency, rate=args.rate)
+    records, report = harness.run(questions)
+    if args.output:
+        with open(args.output, "w") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+    print(format_report(report))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+# Run a registered metadata migration over a ChromaDB collection.
+# Usage: python -m imessage_insight.scripts.migrate_chromadb start_date_ts --collection imessage_chunks [--dry-run]
+
+import argparse
+import sys
+from imessage_insight.migrations import MIGRATIONS, MigrationRunner
+from imessage_insight.vector_store import ChromaVectorStore
+
+# --- Config ---
+CHROMA_DIR = "imessage_insight/chromadb_data"
+
+def main(default_migration=None):
+    parser = argparse.ArgumentParser(description="Resumable, paged metadata migration for ChromaDB collections.")
+    parser.add_argument("migration", nargs="?" if default_migration else None, default=default_migration,
+                        choices=sorted(MIGRATIONS), help="Name of the registered migration to run")
+    parser.add_argument("--collection", default="imessage_chunks")
+    parser.add_argument("--persist-dir", default=CHROMA_DIR)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true", help="Compute changes without writing anything")
+    parser.add_argument("--restart", action="store_true", help="Ignore any saved checkpoint and start from offset 0")
+    args = parser.parse_args()
+
+    print(f"Opening ChromaDB collection '{args.collection}' in '{args.persist_dir}'...")
+    try:
+        store = ChromaVectorStore(collection_name=args.collection, persist_dir=args.persist_dir, create=False)
+    except ValueError as e:
+        sys.exit(str(e))
+    runner = MigrationRunner(store, args.migration, batch_size=args.batch_size, dry_run=args.dry_run)
+    result = runner.run(restart=args.restart)
+    print(f"\nMigration '{args.migration}' complete.")
+    print(f"Documents {'that would be ' if args.dry_run else ''}updated: {result['updated']}")
+    print(f"Documents unchanged or missing a date: {result['unchanged']}")
+
+if __name__ == "__main__":
+    main()
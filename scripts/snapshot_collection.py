@@ -0,0 +1,39 @@
+# Export a ChromaDB collection to a snapshot bundle, or import one without re-embedding.
+# Usage:
+#   python -m imessage_insight.scripts.snapshot_collection export imessage_chunks snapshots/imessage_chunks
+#   python -m imessage_insight.scripts.snapshot_collection import imessage_chunks snapshots/imessage_chunks
+
+import argparse
+import time
+from imessage_insight.embedding import MessageEmbedder
+from imessage_insight.vector_store import ChromaVectorStore
+
+# --- Config ---
+CHROMA_DIR = "imessage_insight/chromadb_data"
+
+def main():
+    parser = argparse.ArgumentParser(description="Export/import ChromaDB collections as columnar snapshot bundles.")
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("collection")
+    parser.add_argument("bundle_dir")
+    parser.add_argument("--persist-dir", default=CHROMA_DIR)
+    parser.add_argument("--backend", choices=["sentence_transformers", "openai"], default="sentence_transformers",
+                        help="Embedding backend the collection was built with (recorded in / validated against the manifest)")
+    parser.add_argument("--model-name", help="Defaults to the backend's model (all-MiniLM-L6-v2 / text-embedding-ada-002)")
+    parser.add_argument("--compress", action="store_true", help="Write data.npz compressed (smaller, slower)")
+    parser.add_argument("--no-validate", action="store_true", help="Skip loading the embedder to validate on import")
+    args = parser.parse_args()
+
+    store = ChromaVectorStore(collection_name=args.collection, persist_dir=args.persist_dir)
+    embedder = None if args.no_validate else MessageEmbedder(model_name=args.model_name, backend=args.backend)
+    start = time.perf_counter()
+    if args.command == "export":
+        manifest = store.export_snapshot(args.bundle_dir, embedder=embedder, compress=args.compress)
+        print(f"Exported {manifest['count']} chunks (dimension {manifest['dimension']}) to {args.bundle_dir}")
+    else:
+        imported = store.import_snapshot(args.bundle_dir, embedder=embedder)
+        print(f"Imported {imported} chunks into '{args.collection}'")
+    print(f"Done in {time.perf_counter() - start:.2f}s")
+
+if __name__ == "__main__":
+    main()
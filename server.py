@@ -0,0 +1,217 @@
+# Long-running daemon keeping the embedder, vector store and RAG pipeline warm.
+# Usage:
+#   python -m imessage_insight.server [--port 8750 | --socket /tmp/imessage_rag.sock] [--backend openai] [--stub-llm]
+# Endpoints (JSON):
+#   GET  /health    readiness, collection size and retrieval cache stats (503 while models are loading)
+#   GET  /metrics   per-stage timings and counters, Prometheus text format (with --metrics)
+#   POST /ingest    {"contact", "strategy", "chunk_size", "hours_gap"}
+#   POST /retrieve  {"query", "top_k", "start", "end", "sender"}
+#   POST /answer    {"query", "top_k", "start", "end", "sender"}
+
+import argparse
+import json
+import os
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from dotenv import load_dotenv
+from imessage_insight import instrumentation
+
+load_dotenv()
+
+CHROMA_DIR = "imessage_insight/chromadb_data"
+
+class RAGService:
+    """
+    Owns the warm MessageEmbedder, ChromaVectorStore and RAGPipeline.
+    Loading happens on a background thread so the server can report readiness while it runs.
+    """
+    def __init__(self, args):
+        self.args = args
+        self.ready = threading.Event()
+        self.error = None
+        self.load_seconds = None
+        self.rag = None
+        self.ingest_lock = threading.Lock()  # Serialize writes; reads stay concurrent
+
+    def load(self):
+        started = time.perf_counter()
+        try:
+            from imessage_insight.embedding import MessageEmbedder
+            from imessage_insight.llm import StubLLMClient
+            from imessage_insight.rag import RAGPipeline
+            from imessage_insight.retrieval_cache import RetrievalCache
+            embedder = MessageEmbedder(backend=self.args.backend)
+            reranker = None
+            if self.args.rerank:
+                from imessage_insight.reranker import CrossEncoderReranker
+                reranker = CrossEncoderReranker()
+            shards = None
+            if self.args.federate:
+                from imessage_insight.federated import build_shards
+                shards = build_shards(self.args.federate, self.args.persist_dir, embedder)
+            llm_client = StubLLMClient(latency=0.3) if self.args.stub_llm else None
+            self.rag = RAGPipeline(
+                collection_name=self.args.collection, persist_dir=self.args.persist_dir, embedder=embedder,
+                llm_model=self.args.llm_model, hybrid=self.args.hybrid, llm_base_url=self.args.llm_base_url,
+                llm_client=llm_client,
+                retrieval_cache=RetrievalCache(self.args.retrieval_cache) if self.args.retrieval_cache else None,
+                shards=shards, reranker=reranker
+            )
+            # Warm up the query path once so the first real request doesn't pay for lazy initialization
+            embedder.embed_query("warm up")
+            self.load_seconds = time.perf_counter() - started
+            self.ready.set()
+            print(f"Ready in {self.load_seconds:.1f}s (collection '{self.args.collection}', "
+                  f"{self.rag.vector_store.collection.count()} chunks)")
+        except Exception as e:
+            self.error = str(e)
+            print(f"Failed to load pipeline: {e}")
+
+    def health(self):
+        status = {"ready": self.ready.is_set(), "error": self.error, "load_seconds": self.load_seconds}
+        if self.ready.is_set():
+            status["collection"] = self.args.collection
+            status["count"] = self.rag.vector_store.collection.count()
+            if self.rag.federated is not None:
+                status["shards"] = {label: store.collection.count() for label, store, _ in self.rag.federated.shards}
+            if self.rag.retrieval_cache is not None:
+                status["retrieval_cache"] = self.rag.retrieval_cache.stats()
+        return status
+
+    def ingest(self, body):
+        from imessage_insight.ingest import ingest_contact, job_dir_for
+        with self.ingest_lock:
+            return ingest_contact(
+                body["contact"], self.rag.vector_store, self.rag.embedder,
+                strategy=body.get("strategy", "time"),
+                chunk_size=int(body.get("chunk_size", 10)),
+                hours_gap=float(body.get("hours_gap", 1.0)),
+                job_dir=job_dir_for(self.rag.vector_store, body["contact"])
+            )
+
+    def retrieve(self, body):
+        started = time.perf_counter()
+        results = self.rag.retrieve_context(
+            body["query"], top_k=int(body.get("top_k", 5)),
+            start=body.get("start"), end=body.get("end"), sender=body.get("sender")
+        )
+        return {
+            "results": [{k: v for k, v in r.items() if k != "embedding"} for r in results],
+            "timings": {"total": time.perf_counter() - started}
+        }
+
+    def answer(self, body):
+        result = self.rag.answer_query(
+            body["query"], top_k=int(body.get("top_k", 5)),
+            start=body.get("start"), end=body.get("end"), sender=body.get("sender")
+        )
+        result["retrieved"] = [{k: v for k, v in r.items() if k != "embedding"} for r in result["retrieved"]]
+        return result
+
+def make_handler(service):
+    class RAGHandler(BaseHTTPRequestHandler):
+        routes = {"/ingest": service.ingest, "/retrieve": service.retrieve, "/answer": service.answer}
+
+        def log_message(self, format, *args):
+            pass  # Per-request logging would dominate warm-query latency
+
+        def _reply(self, status, payload):
+            data = json.dumps(payload, default=str).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/metrics":
+                data = instrumentation.registry.to_prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+                return
+            if self.path != "/health":
+                self._reply(404, {"error": "not found"})
+                return
+            status = service.health()
+            self._reply(200 if status["ready"] else 503, status)
+
+        def do_POST(self):
+            route = self.routes.get(self.path)
+            if route is None:
+                self._reply(404, {"error": "not found"})
+                return
+            if not service.ready.is_set():
+                self._reply(503, {"error": service.error or "loading"})
+                return
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                self._reply(200, route(body))
+            except KeyError as e:
+                self._reply(400, {"error": f"missing field: {e}"})
+            except Exception as e:
+                self._reply(500, {"error": str(e)})
+
+    return RAGHandler
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    HTTP over a Unix domain socket, one thread per connection.
+    """
+    daemon_threads = True
+
+    def get_request(self):
+        request, _ = super().get_request()
+        return request, ("unix", 0)  # BaseHTTPRequestHandler expects a (host, port) address
+
+def main():
+    parser = argparse.ArgumentParser(description="iMessage RAG daemon.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8750)
+    parser.add_argument("--socket", help="Listen on a Unix socket instead of TCP")
+    parser.add_argument("--collection", default="imessage_chunks")
+    parser.add_argument("--persist-dir", default=CHROMA_DIR)
+    parser.add_argument("--backend", choices=["sentence_transformers", "openai"], default="sentence_transformers")
+    parser.add_argument("--llm-model", default="gpt-3.5-turbo")
+    parser.add_argument("--llm-base-url")
+    parser.add_argument("--hybrid", action="store_true")
+    parser.add_argument("--rerank", action="store_true", help="Rerank the over-fetched candidates with a cross-encoder")
+    parser.add_argument("--stub-llm", action="store_true", help="Use the in-process stub LLM (benchmarks)")
+    parser.add_argument("--metrics", action="store_true", help="Record per-stage metrics, served at /metrics")
+    parser.add_argument("--retrieval-cache", type=int, default=1024, metavar="N",
+                        help="Cache up to N retrieval results per collection version (0 disables)")
+    parser.add_argument("--federate", nargs="+", metavar="COLLECTION[:BACKEND]",
+                        help="Also search these collections and merge the results")
+    args = parser.parse_args()
+    if args.metrics:
+        instrumentation.enable()
+
+    service = RAGService(args)
+    handler = make_handler(service)
+    if args.socket:
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+        server = ThreadingUnixHTTPServer(args.socket, handler)
+        where = args.socket
+    else:
+        server = ThreadingHTTPServer((args.host, args.port), handler)
+        where = f"http://{args.host}:{args.port}"
+    threading.Thread(target=service.load, daemon=True).start()
+    print(f"Listening on {where} (loading models...)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Shutting down.")
+    finally:
+        server.server_close()
+        if service.rag is not None:
+            service.rag.close()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import json
+import os
+import time
+import numpy as np
+
+# --- Columnar Snapshot Bundles ---
+# A bundle is a directory holding:
+#   manifest.json  - format version, collection name and metadata, count, dimension, embedding model
+#   data.npz       - embeddings (float32 matrix), plus ids, documents and metadatas (JSON strings),
+#                    each stored as one UTF-8 byte buffer (<column>_bytes) with n+1 offsets (<column>_offsets)
+FORMAT_VERSION = 2
+MANIFEST_FILE = "manifest.json"
+DATA_FILE = "data.npz"
+STRING_COLUMNS = ("ids", "documents", "metadatas")
+
+def pack_strings(strings):
+    """
+    Concatenate strings into a uint8 UTF-8 buffer and an int64 offsets array (string i is
+    buffer[offsets[i]:offsets[i + 1]]). Unlike a numpy unicode array, nothing is padded to the
+    longest string.
+    """
+    encoded = [text.encode("utf-8") for text in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+def unpack_strings(buffer, offsets, start=0, stop=None):
+    """
+    Decode strings start..stop of a packed column.
+    """
+    stop = len(offsets) - 1 if stop is None else min(stop, len(offsets) - 1)
+    raw = buffer[offsets[start]:offsets[stop]].tobytes()
+    base = offsets[start]
+    return [raw[offsets[i] - base:offsets[i + 1] - base].decode("utf-8") for i in range(start, stop)]
+
+def export_collection(collection, bundle_dir, model_name=None, backend=None, page_size=1000, compress=False):
+    """
+    Write every id, document, metadata and embedding of a ChromaDB collection to a snapshot bundle.
+    Pages through the collection so memory holds one page of Chroma results at a time
+    plus the final float32 matrix and packed string columns. Returns the manifest dict.
+    """
+    ids, documents, metadatas, embeddings = [], [], [], []
+    offset = 0
+    while True:
+        page = collection.get(include=["documents", "metadatas", "embeddings"], limit=page_size, offset=offset)
+        if not page["ids"]:
+            break
+        ids.extend(page["ids"])
+        documents.extend(page["documents"])
+        metadatas.extend(json.dumps(meta or {}) for meta in page["metadatas"])
+        embeddings.append(np.asarray(page["embeddings"], dtype=np.float32))
+        offset += len(page["ids"])
+    matrix = np.vstack(embeddings) if embeddings else np.zeros((0, 0), dtype=np.float32)
+    columns = {"embeddings": matrix}
+    for name, strings in zip(STRING_COLUMNS, (ids, documents, metadatas)):
+        columns[f"{name}_bytes"], columns[f"{name}_offsets"] = pack_strings(strings)
+    os.makedirs(bundle_dir, exist_ok=True)
+    save = np.savez_compressed if compress else np.savez
+    save(os.path.join(bundle_dir, DATA_FILE), **columns)
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "collection": collection.name,
+        "count": len(ids),
+        "dimension": int(matrix.shape[1]) if len(ids) else None,
+        "model_name": model_name,
+        "backend": backend,
+        "dtype": "float32",
+        "collection_metadata": collection.metadata,
+        "created_at": time.time()
+    }
+    with open(os.path.join(bundle_dir, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+def load_manifest(bundle_dir):
+    """
+    Read a bundle's manifest.json.
+    """
+    with open(os.path.join(bundle_dir, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot format version: {manifest.get('format_version')}")
+    return manifest
+
+def validate_manifest(manifest, embedder):
+    """
+    Check that a bundle was produced by an embedding model compatible with `embedder`.
+    Raises ValueError on a dimension or model mismatch.
+    """
+    dimension = embedder.get_dimension()
+    if manifest["dimension"] is not None and manifest["dimension"] != dimension:
+        raise ValueError(
+            f"Snapshot dimension {manifest['dimension']} does not match embedder dimension {dimension}."
+        )
+    if manifest.get("model_name") and manifest["model_name"] != embedder.model_name:
+        raise ValueError(
+            f"Snapshot was built with model '{manifest['model_name']}', but the embedder uses '{embedder.model_name}'."
+        )
+
+def iter_bundle_chunks(bundle_dir, batch_size=5000):
+    """
+    Yield batches of chunk dicts (id, text, metadata, embedding) from a bundle,
+    in the same shape ChromaVectorStore.add_chunks expects.
+    """
+    with np.load(os.path.join(bundle_dir, DATA_FILE)) as data:
+        embeddings = data["embeddings"]
+        packed = [(data[f"{name}_bytes"], data[f"{name}_offsets"]) for name in STRING_COLUMNS]
+        for i in range(0, len(embeddings), batch_size):
+            ids, documents, metadatas = [unpack_strings(buffer, offsets, i, i + batch_size)
+                                         for buffer, offsets in packed]
+            yield [
+                {
+                    "id": doc_id,
+                    "text": doc,
+                    "metadata": json.loads(meta),
+                    "embedding": emb
+                }
+                for doc_id, doc, meta, emb in zip(ids, documents, metadatas, embeddings[i:i + batch_size])
+            ]
@@ -0,0 +1,232 @@
+import hashlib
+import re
+from datetime import datetime, timedelta
+from imessage_insight import instrumentation
+from imessage_insight.context_packing import ContextPacker
+from imessage_insight.utils import normalize
+from imessage_insight.vector_store import ChromaVectorStore, to_end_timestamp, to_timestamp
+
+LEVELS = ("day", "week", "month")
+
+# Questions about the conversation as a whole rather than a specific exchange. Each needs a
+# phrase, not a lone word: "overall" or "pattern" also turn up in questions about one detail.
+BROAD_QUESTION_PATTERNS = [
+    r"\bhow (has|have|did)\b.*\b(change|changed|evolve|evolved|develop|developed|grow|grown)\b",
+    r"\b(over|throughout|across) (the|this|last|that|our)\b.*\b(year|years|months|time|summer|winter|spring|fall)\b",
+    r"\b(overall|in general|generally)\b.*\b(relationship|conversations?|friendship|tone|mood|vibe)\b",
+    r"\b(big picture|overview|recap) of\b",
+    r"\bsummar(ise|ize)\b",
+    r"\b(main|common|recurring|biggest) (topics|themes|things)\b",
+    r"\bwhat (did|do|have) we (mostly|usually|generally) (talk|talked|text|texted)\b",
+    r"\b(trends?|patterns?) (in|of|over|across) (our|the way|how|when)\b",
+]
+
+def is_broad_question(query):
+    """
+    Heuristic: does the question ask about a long stretch of the conversation rather than a detail?
+    """
+    text = query.lower()
+    return any(re.search(pattern, text) for pattern in BROAD_QUESTION_PATTERNS)
+
+def stub_summary(messages, max_words=60):
+    """
+    answer_fn for StubLLMClient: an extractive "summary" (the first words of the input after
+    the instruction), so the summary pipeline can run offline.
+    """
+    body = messages[-1]["content"].split("\n\n", 1)[-1]
+    return " ".join(body.split()[:max_words])
+
+def period_key(level, dt):
+    """
+    (key, period start, period end) of the day, ISO week or month containing dt.
+    """
+    day = datetime(dt.year, dt.month, dt.day)
+    if level == "day":
+        return day.strftime("%Y-%m-%d"), day, day + timedelta(days=1)
+    if level == "week":
+        start = day - timedelta(days=day.weekday())
+        year, week, _ = start.isocalendar()
+        return f"{year}-W{week:02d}", start, start + timedelta(days=7)
+    if level == "month":
+        start = datetime(dt.year, dt.month, 1)
+        end = datetime(dt.year + (dt.month == 12), dt.month % 12 + 1, 1)
+        return start.strftime("%Y-%m"), start, end
+    raise ValueError(f"Unknown summary level: {level}")
+
+def period_label(level, start):
+    if level == "day":
+        return start.strftime("%A %B %d, %Y").replace(" 0", " ")
+    if level == "week":
+        return f"the week of {start.strftime('%B %d, %Y').replace(' 0', ' ')}"
+    return start.strftime("%B %Y")
+
+class SummaryIndex:
+    """
+    Per-level summary collections stored next to a chunk collection
+    (<collection>_summaries_day, _week, _month), each a regular ChromaVectorStore so
+    summaries are searched with the same time-range and sender filters as chunks.
+    """
+    def __init__(self, collection_name="imessage_chunks", persist_dir="imessage_insight/chromadb_data", levels=LEVELS):
+        self.collection_name = collection_name
+        self.stores = {
+            level: ChromaVectorStore(collection_name=f"{collection_name}_summaries_{level}", persist_dir=persist_dir,
+                                     lexical=False)
+            for level in levels
+        }
+
+    def count(self):
+        return {level: store.collection.count() for level, store in self.stores.items()}
+
+    def level_for_range(self, start=None, end=None):
+        """
+        Coarsest useful level for a time range: months for long or open-ended ranges,
+        weeks for a few weeks to months, days for anything shorter.
+        """
+        start_ts, end_ts = to_timestamp(start), to_end_timestamp(end)
+        span_days = (end_ts - start_ts) / 86400 if start_ts is not None and end_ts is not None else None
+        if span_days is None or span_days > 120:
+            level = "month"
+        elif span_days > 21:
+            level = "week"
+        else:
+            level = "day"
+        # Fall back to the nearest level that was actually built
+        for candidate in (level,) + LEVELS[::-1]:
+            if candidate in self.stores and self.stores[candidate].collection.count():
+                return candidate
+        return None
+
+    def search(self, query_embedding, top_k=12, start=None, end=None, sender=None, level=None):
+        """
+        Search one summary level (chosen from the time range by default).
+        Returns (level, results).
+        """
+        level = level or self.level_for_range(start, end)
+        if level is None:
+            return None, []
+        return level, self.stores[level].query(query_embedding, top_k=top_k, start=start, end=end, sender=sender)
+
+class SummaryBuilder:
+    """
+    Offline summarization: day summaries from a contact's chunks, week and month summaries
+    from the day summaries, all written through the pluggable LLM client.
+    Incremental: every summary stores a hash of its inputs, so re-running after new chunks
+    arrive only re-summarizes the periods whose inputs changed (and the weeks/months above them).
+    """
+    def __init__(self, chunk_store, summary_index, embedder, llm_client, llm_model="gpt-4o-mini",
+                 max_input_tokens=3000, max_summary_words=120):
+        self.chunk_store = chunk_store
+        self.index = summary_index
+        self.embedder = embedder
+        self.llm = llm_client
+        self.llm_model = llm_model
+        self.max_summary_words = max_summary_words
+        self.max_input_tokens = max_input_tokens
+        self.packer = ContextPacker(llm_model)
+        self.llm_calls = 0
+
+    def _contact_chunks(self, contact, page_size=1000):
+        chunks, offset = [], 0
+        while True:
+            page = self.chunk_store.collection.get(where={"contact": contact}, include=["documents", "metadatas"],
+                                                   limit=page_size, offset=offset)
+            if not page["ids"]:
+                break
+            chunks.extend(zip(page["ids"], page["documents"], page["metadatas"]))
+            offset += len(page["ids"])
+        return chunks
+
+    def _existing_hashes(self, level, contact):
+        page = self.index.stores[level].collection.get(where={"contact": contact}, include=["metadatas"])
+        return {meta["period"]: meta.get("source_hash") for meta in page["metadatas"]}
+
+    def _trim(self, texts):
+        """
+        Keep whole lines from the start of the inputs until the token budget is used.
+        """
+        kept, used = [], 0
+        for text in texts:
+            for line in text.split("\n"):
+                cost = self.packer.count_tokens(line) + 1
+                if used + cost > self.max_input_tokens:
+                    return "\n".join(kept)
+                kept.append(line)
+                used += cost
+        return "\n".join(kept)
+
+    def _summarize(self, level, label, inputs):
+        if level == "day":
+            instruction = (f"Summarize this iMessage conversation from {label} between me and a friend in at most "
+                           f"{self.max_summary_words} words. Cover the topics, plans, events and the overall tone.")
+        else:
+            instruction = (f"Combine these daily summaries into one summary of {label} in at most "
+                           f"{self.max_summary_words} words. Cover recurring topics, notable events, plans and how "
+                           f"the tone of the relationship came across.")
+        messages = [
+            {"role": "system", "content": "You write concise, factual summaries of personal message history."},
+            {"role": "user", "content": f"{instruction}\n\n{self._trim(inputs)}"}
+        ]
+        self.llm_calls += 1
+        with instrumentation.span("summarize", level=level):
+            return self.llm.complete(messages, model=self.llm_model, max_tokens=self.max_summary_words * 2).strip()
+
+    def _build_level(self, level, contact, groups):
+        """
+        groups: period key -> (start, end, [input texts]). Summarizes changed periods and
+        upserts them. Returns ({period: summary document} for every period, number re-summarized).
+        """
+        existing = self._existing_hashes(level, contact)
+        store = self.index.stores[level]
+        summaries, changed = {}, []
+        for key, (start, end, texts) in sorted(groups.items()):
+            source_hash = hashlib.sha1("\x1e".join(texts).encode()).hexdigest()
+            if existing.get(key) == source_hash:
+                continue
+            label = period_label(level, start)
+            summary = self._summarize(level, label, texts)
+            changed.append({
+                'id': f"{contact}:{level}:{key}",
+                'text': f"Summary of {label}:\n{summary}",
+                'metadata': {
+                    'level': level, 'period': key, 'contact': contact, 'source_hash': source_hash,
+                    'source_count': len(texts),
+                    'start_date': start.isoformat(sep=' '),
+                    'end_date': (end - timedelta(seconds=1)).isoformat(sep=' ')
+                }
+            })
+        if changed:
+            changed = self.embedder.generate_embeddings(changed)
+            store.add_chunks(changed, upsert=True)
+        # Current text of every period, for the level above
+        page = store.collection.get(where={"contact": contact}, include=["documents", "metadatas"])
+        for document, meta in zip(page["documents"], page["metadatas"]):
+            summaries[meta["period"]] = document
+        return summaries, len(changed)
+
+    def update(self, contact):
+        """
+        Bring a contact's summaries up to date. Returns {level: periods re-summarized}.
+        """
+        contact = normalize(contact)
+        days = {}
+        for _, text, meta in sorted(self._contact_chunks(contact), key=lambda c: c[2].get("start_date_ts", 0)):
+            ts = meta.get("start_date_ts")
+            if not isinstance(ts, (int, float)):
+                continue
+            key, start, end = period_key("day", datetime.fromtimestamp(ts))
+            days.setdefault(key, (start, end, []))[2].append(text)
+        updated = {}
+        day_summaries = {}
+        if "day" in self.index.stores:
+            day_summaries, updated["day"] = self._build_level("day", contact, days)
+        for level in ("week", "month"):
+            if level not in self.index.stores:
+                continue
+            groups = {}
+            for day_key, (day_start, _, chunk_texts) in sorted(days.items()):
+                # Roll up from the day summaries when they were built, otherwise straight from the chunks
+                texts = [day_summaries[day_key]] if day_key in day_summaries else chunk_texts
+                key, start, end = period_key(level, day_start)
+                groups.setdefault(key, (start, end, []))[2].extend(texts)
+            _, updated[level] = self._build_level(level, contact, groups)
+        return updated
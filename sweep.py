@@ -0,0 +1,189 @@
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from imessage_insight.chunking import chunk_messages
+from imessage_insight.evaluation import percentiles, reciprocal_rank
+from imessage_insight.ingest import assign_rowid_ids
+from imessage_insight.vector_store import ChromaVectorStore
+
+# Chroma's client start-up (SQLite migrations) is not safe to run concurrently
+_CLIENT_LOCK = threading.Lock()
+
+# --- Variants ---
+def parse_variant(spec):
+    """
+    Parse "fixed:<chunk_size>", "time:<hours_gap>" or "timeandfixed:<hours_gap>:<chunk_size>"
+    into a variant dict with a display name.
+    """
+    parts = spec.split(":")
+    strategy = parts[0]
+    try:
+        if strategy == "fixed" and len(parts) == 2:
+            return {"name": spec, "strategy": strategy, "chunk_size": int(parts[1]), "hours_gap": 1.0}
+        if strategy == "time" and len(parts) == 2:
+            return {"name": spec, "strategy": strategy, "chunk_size": 10, "hours_gap": float(parts[1])}
+        if strategy == "timeandfixed" and len(parts) == 3:
+            return {"name": spec, "strategy": strategy, "hours_gap": float(parts[1]), "chunk_size": int(parts[2])}
+    except ValueError:
+        pass
+    raise ValueError(f"Bad chunking variant '{spec}': use fixed:<size>, time:<hours> or timeandfixed:<hours>:<size>")
+
+def known_item_questions(messages, n=50, min_words=6, seed=0):
+    """
+    Build a question set from the messages themselves: each question is half of a message's
+    words, and recall counts a hit when a retrieved chunk contains that message.
+    Lets a sweep run on data without a hand-labelled question set.
+    """
+    rng = random.Random(seed)
+    candidates = [msg for msg in messages if len(msg['text'].split()) >= min_words]
+    questions = []
+    for msg in rng.sample(candidates, min(n, len(candidates))):
+        words = msg['text'].split()
+        questions.append({"question": " ".join(rng.sample(words, len(words) // 2)), "expected_texts": [msg['text']]})
+    return questions
+
+def text_recall(expected_texts, retrieved_texts):
+    """
+    Fraction of expected message texts contained in any retrieved chunk. Unlike chunk-id
+    recall this is comparable across chunkings of the same messages.
+    """
+    if not expected_texts:
+        return None
+    return sum(any(text in chunk for chunk in retrieved_texts) for text in expected_texts) / len(expected_texts)
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+# --- Sweep ---
+class ChunkingSweep:
+    """
+    Builds several chunking variants of one contact's messages side by side and scores them.
+    Every variant is chunked first, then the union of their chunk texts is embedded once
+    (variants often share chunks, e.g. a quiet day is one chunk under most settings), and
+    each variant is written to its own temporary persist directory concurrently. Once all are
+    built, variants are scored one at a time, so query latencies don't compete with other
+    builds or queries. Each variant is scored on text recall@k / MRR, index size on disk,
+    estimated ingest time and query latency.
+    """
+    def __init__(self, messages, embedder, contact="sweep", top_k=5, max_workers=4, workdir=None, embed_batch=256):
+        self.messages = messages
+        self.embedder = embedder
+        self.contact = contact
+        self.top_k = top_k
+        self.max_workers = max_workers
+        self.workdir = workdir
+        self.embed_batch = embed_batch
+
+    def _chunk(self, variant):
+        started = time.perf_counter()
+        chunks = chunk_messages(self.messages, strategy=variant["strategy"], chunk_size=variant["chunk_size"],
+                                hours_gap=variant["hours_gap"])
+        assign_rowid_ids(chunks, self.messages, self.contact)
+        return chunks, time.perf_counter() - started
+
+    def _embed_unique(self, texts):
+        """
+        Embed each distinct text once. Returns (text -> embedding, seconds).
+        """
+        started = time.perf_counter()
+        embeddings = {}
+        for i in range(0, len(texts), self.embed_batch):
+            batch = self.embedder.generate_embeddings([{'text': text} for text in texts[i:i + self.embed_batch]])
+            embeddings.update((item['text'], item['embedding']) for item in batch)
+        return embeddings, time.perf_counter() - started
+
+    def _build(self, variant, chunks, embeddings, persist_dir):
+        started = time.perf_counter()
+        for chunk in chunks:
+            chunk['embedding'] = embeddings[chunk['text']]
+        with _CLIENT_LOCK:
+            store = ChromaVectorStore(collection_name="sweep", persist_dir=persist_dir, lexical=False)
+        for i in range(0, len(chunks), 1000):
+            store.add_chunks(chunks[i:i + 1000])
+        return store, time.perf_counter() - started
+
+    def _score(self, store, questions, query_embeddings):
+        recalls, rrs, latencies = [], [], []
+        for item, query_embedding in zip(questions, query_embeddings):
+            started = time.perf_counter()
+            results = store.query(query_embedding, top_k=self.top_k, start=item.get("start"), end=item.get("end"))
+            latencies.append(time.perf_counter() - started)
+            texts = [r["text"] for r in results]
+            expected = item.get("expected_texts")
+            if expected:
+                recalls.append(text_recall(expected, texts))
+                ranks = [rank for rank, text in enumerate(texts, start=1) if any(e in text for e in expected)]
+                rrs.append(1.0 / ranks[0] if ranks else 0.0)
+            elif item.get("expected_ids"):
+                ids = [str(r["id"]) for r in results]
+                recalls.append(len(set(item["expected_ids"]).intersection(ids)) / len(item["expected_ids"]))
+                rrs.append(reciprocal_rank(item["expected_ids"], ids))
+        return {
+            f"recall@{self.top_k}": float(np.mean(recalls)) if recalls else None,
+            "mrr": float(np.mean(rrs)) if rrs else None,
+            "query_ms": percentiles(latencies, points=(50, 90))
+        }
+
+    def run(self, variants, questions, keep=False):
+        """
+        Build and score every variant. Returns a list of per-variant report dicts, in input order.
+        """
+        workdir = self.workdir or tempfile.mkdtemp(prefix="chunking_sweep_")
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                chunked = list(pool.map(self._chunk, variants))
+            texts = list(dict.fromkeys(chunk['text'] for chunks, _ in chunked for chunk in chunks))
+            total_chunks = sum(len(chunks) for chunks, _ in chunked)
+            print(f"{len(variants)} variants: {total_chunks} chunks, {len(texts)} distinct texts to embed")
+            embeddings, embed_seconds = self._embed_unique(texts)
+            seconds_per_text = embed_seconds / len(texts) if texts else 0.0
+            query_embeddings = self.embedder.embed_queries([item["question"] for item in questions])
+
+            def build(i):
+                variant, (chunks, _) = variants[i], chunked[i]
+                return self._build(variant, chunks, embeddings, os.path.join(workdir, f"variant_{i}"))
+
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                built = list(pool.map(build, range(len(variants))))
+            reports = []
+            for i, (store, store_seconds) in enumerate(built):
+                chunks, chunk_seconds = chunked[i]
+                report = {
+                    "variant": variants[i]["name"],
+                    "chunks": len(chunks),
+                    "messages_per_chunk": len(self.messages) / len(chunks) if chunks else 0.0,
+                    # An estimate, not a measurement: embedding is shared between variants (charged
+                    # per chunk at the average rate) and stores are written concurrently
+                    "est_ingest_seconds": chunk_seconds + store_seconds + seconds_per_text * len(chunks),
+                    "index_mb": directory_size(os.path.join(workdir, f"variant_{i}")) / 1024 ** 2
+                }
+                report.update(self._score(store, questions, query_embeddings))
+                reports.append(report)
+            return reports
+        finally:
+            if keep:
+                print(f"Variant collections kept in {workdir}")
+            else:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+def format_sweep(reports, top_k):
+    """
+    Render sweep reports as a comparison table, best recall first.
+    """
+    key = f"recall@{top_k}"
+    lines = [f"{'variant':<22}{'chunks':>8}{'msg/chunk':>10}{key:>10}{'MRR':>7}{'index MB':>10}"
+             f"{'ingest s*':>10}{'q p50 ms':>10}{'q p90 ms':>10}"]
+    lines.append('-' * len(lines[0]))
+    for r in sorted(reports, key=lambda r: -(r[key] or 0.0)):
+        recall = f"{r[key]:.3f}" if r[key] is not None else "-"
+        mrr = f"{r['mrr']:.3f}" if r["mrr"] is not None else "-"
+        lines.append(f"{r['variant']:<22}{r['chunks']:>8}{r['messages_per_chunk']:>10.1f}{recall:>10}{mrr:>7}"
+                     f"{r['index_mb']:>10.1f}{r['est_ingest_seconds']:>10.2f}"
+                     f"{r['query_ms'].get('p50', 0):>10.1f}{r['query_ms'].get('p90', 0):>10.1f}")
+    lines.append("* estimated: shared embedding time charged per chunk, stores written concurrently")
+    return "\n".join(lines)
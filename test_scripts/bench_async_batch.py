@@ -0,0 +1,39 @@
+# Compare serial generate_answer with the concurrent batch API against the local stub LLM.
+# Usage: python -m imessage_insight.test_scripts.bench_async_batch [num_questions] [concurrency]
+
+import sys
+import tempfile
+import time
+from imessage_insight.rag import RAGPipeline
+from imessage_insight.test_scripts import openai_stub_server
+from imessage_insight.test_scripts.fakes import HashEmbedder, make_chunks
+
+TOPICS = ["coffee", "birthday gift", "hiking trip", "job interview", "movie night", "concert", "beach", "puppy"]
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    questions = [f"What did we say about the {TOPICS[i % len(TOPICS)]} ({i})?" for i in range(n)]
+    server, base_url = openai_stub_server.start(first_token_ms=200, token_ms=5)
+    embedder = HashEmbedder()
+    with tempfile.TemporaryDirectory() as tmp:
+        rag = RAGPipeline(collection_name="bench_async", persist_dir=tmp, embedder=embedder, llm_base_url=base_url)
+        rag.vector_store.add_chunks(embedder.generate_embeddings(make_chunks(2000)))
+
+        start = time.perf_counter()
+        serial = [rag.generate_answer(q, top_k=5) for q in questions]
+        serial_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        batched = rag.generate_answers_batch(questions, top_k=5, concurrency=concurrency)
+        batch_s = time.perf_counter() - start
+
+    server.shutdown()
+    assert [a for a, _ in serial] == [a for a, _ in batched], "batch answers should match serial answers"
+    print(f"{n} questions against a stub LLM with 200 ms latency")
+    print(f"Serial:  {serial_s:.2f}s ({n / serial_s:.1f} questions/sec)")
+    print(f"Batched: {batch_s:.2f}s ({n / batch_s:.1f} questions/sec, concurrency={concurrency})")
+    print(f"Speedup: {serial_s / batch_s:.1f}x")
+
+if __name__ == "__main__":
+    main()
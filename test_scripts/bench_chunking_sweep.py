@@ -0,0 +1,45 @@
+# Run the chunking sweep on a synthetic chat.db with the offline hash embedder, and report
+# how much embedding work sharing texts across variants saved.
+# Usage: python -m imessage_insight.test_scripts.bench_chunking_sweep [--messages 20000] [--workers 4]
+
+import argparse
+import os
+import tempfile
+from imessage_insight import chat_db
+from imessage_insight.sweep import ChunkingSweep, format_sweep, known_item_questions, parse_variant
+from imessage_insight.test_scripts.fakes import HashEmbedder
+from imessage_insight.test_scripts.synthetic_chat_db import generate
+
+VARIANTS = ["fixed:10", "fixed:20", "time:0.5", "time:1", "time:3", "timeandfixed:1:10", "timeandfixed:1:20"]
+
+class CountingEmbedder(HashEmbedder):
+    def __init__(self):
+        super().__init__()
+        self.embedded = 0
+
+    def generate_embeddings(self, chunks):
+        self.embedded += len(chunks)
+        return super().generate_embeddings(chunks)
+
+def main():
+    parser = argparse.ArgumentParser(description="Chunking sweep on synthetic data.")
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--questions", type=int, default=100)
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(), "chat.db")
+    contact = generate(db_path, contacts=1, messages=args.messages, days=365)[0]
+    messages = chat_db.load_contact_messages(contact, db_path=db_path)
+    questions = known_item_questions(messages, n=args.questions)
+
+    embedder = CountingEmbedder()
+    sweep = ChunkingSweep(messages, embedder, contact=contact, max_workers=args.workers)
+    reports = sweep.run([parse_variant(spec) for spec in VARIANTS], questions)
+    print(format_sweep(reports, sweep.top_k))
+    total = sum(r["chunks"] for r in reports)
+    print(f"\nEmbedded {embedder.embedded} texts for {total} chunks across variants "
+          f"({1 - embedder.embedded / total:.0%} saved by sharing)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# Measure cold-start latency (new process loads everything, answers one question) against
+# warm-query latency through the daemon. Both use the stub LLM so only our own stack is timed.
+# Usage: python -m imessage_insight.test_scripts.bench_daemon [--collection imessage_chunks] [--questions 20]
+
+import argparse
+import subprocess
+import sys
+import time
+import numpy as np
+from imessage_insight.client import RAGClient
+
+COLD_START = """
+import time
+started = time.perf_counter()
+from imessage_insight.embedding import MessageEmbedder
+from imessage_insight.llm import StubLLMClient
+from imessage_insight.rag import RAGPipeline
+rag = RAGPipeline(collection_name={collection!r}, persist_dir={persist_dir!r}, embedder=MessageEmbedder(),
+                  llm_client=StubLLMClient(latency=0.3))
+rag.generate_answer("What gift should I get?")
+print(time.perf_counter() - started)
+"""
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold start vs warm daemon latency.")
+    parser.add_argument("--collection", default="imessage_chunks")
+    parser.add_argument("--persist-dir", default="imessage_insight/chromadb_data")
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--port", type=int, default=8751)
+    args = parser.parse_args()
+
+    process_started = time.perf_counter()
+    cold = subprocess.run(
+        [sys.executable, "-c", COLD_START.format(collection=args.collection, persist_dir=args.persist_dir)],
+        capture_output=True, text=True, check=True
+    )
+    cold_process = time.perf_counter() - process_started
+    cold_in_process = float(cold.stdout.strip().splitlines()[-1])
+
+    daemon = subprocess.Popen([
+        sys.executable, "-m", "imessage_insight.server", "--port", str(args.port),
+        "--collection", args.collection, "--persist-dir", args.persist_dir, "--stub-llm"
+    ], stdout=subprocess.DEVNULL)
+    try:
+        client = RAGClient(port=args.port)
+        ready_s = client.wait_until_ready()
+        warm = []
+        for i in range(args.questions):
+            started = time.perf_counter()
+            client.answer(f"What gift should I get? ({i})")
+            warm.append(time.perf_counter() - started)
+    finally:
+        daemon.terminate()
+        daemon.wait()
+
+    print(f"Cold start (new process, first answer): {cold_process:.2f}s total, {cold_in_process:.2f}s after interpreter start")
+    print(f"Daemon ready after:                     {ready_s:.2f}s (paid once)")
+    print(f"Warm query via daemon:                  p50 {np.percentile(warm, 50) * 1000:.0f} ms, "
+          f"p99 {np.percentile(warm, 99) * 1000:.0f} ms (includes 300 ms stub LLM)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# Compare federated search latency with querying the same shards one after another, and show
+# the per-shard sum and slowest shard (the search is sequential, so it tracks the sum).
+# Usage: python -m imessage_insight.test_scripts.bench_federated [num_shards] [chunks_per_shard]
+
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+from imessage_insight.federated import FederatedRetriever
+from imessage_insight.vector_store import ChromaVectorStore
+from imessage_insight.test_scripts.fakes import HashEmbedder, make_chunks
+
+QUESTIONS = ["Where did we get coffee?", "birthday gift ideas", "plans for the beach weekend", "the concert"]
+
+def main():
+    num_shards = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    per_shard = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    embedder = HashEmbedder()
+    with tempfile.TemporaryDirectory() as tmp:
+        shards = []
+        for s in range(num_shards):
+            store = ChromaVectorStore(collection_name=f"contact_{s}", persist_dir=os.path.join(tmp, "db"), lexical=False)
+            chunks = embedder.generate_embeddings(make_chunks(per_shard))
+            for i in range(0, per_shard, 5000):
+                store.add_chunks(chunks[i:i+5000])
+            shards.append((f"contact_{s}", store, embedder))
+        federated, sequential, shard_sums, slowest = [], [], [], []
+        with FederatedRetriever(shards) as retriever:
+            for _ in range(10):
+                for question in QUESTIONS:
+                    timings = {}
+                    retriever.search(question, top_k=5, timings=timings)
+                    federated.append(timings["total"])
+                    shard_times = [v for k, v in timings.items() if k != "total"]
+                    shard_sums.append(sum(shard_times))
+                    slowest.append(max(shard_times))
+                    # Baseline: embed once and query the shards one after another, no merge
+                    start = time.perf_counter()
+                    emb = embedder.embed_query(question)
+                    for _, store, _ in shards:
+                        store.query(emb, top_k=20)
+                    sequential.append(time.perf_counter() - start)
+    print(f"{num_shards} shards x {per_shard} chunks (p50 ms)")
+    print(f"Federated search:       {np.percentile(federated, 50) * 1000:.1f}")
+    print(f"Plain sequential:       {np.percentile(sequential, 50) * 1000:.1f}")
+    print(f"Sum of shard searches:  {np.percentile(shard_sums, 50) * 1000:.1f}")
+    print(f"Slowest single shard:   {np.percentile(slowest, 50) * 1000:.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+# Measure instrumentation overhead: call an instrumented stage with metrics disabled and
+# enabled, and print both export formats for a quick look at their shape.
+# Usage: python -m imessage_insight.test_scripts.bench_instrumentation [--calls 200000]
+
+import argparse
+import time
+from imessage_insight import instrumentation
+
+@instrumentation.timed("noop")
+def instrumented():
+    return None
+
+def plain():
+    return None
+
+def per_call(func, calls):
+    started = time.perf_counter()
+    for _ in range(calls):
+        func()
+    return (time.perf_counter() - started) / calls * 1e9
+
+def main():
+    parser = argparse.ArgumentParser(description="Instrumentation overhead.")
+    parser.add_argument("--calls", type=int, default=200000)
+    args = parser.parse_args()
+
+    baseline = per_call(plain, args.calls)
+    instrumentation.disable()
+    disabled = per_call(instrumented, args.calls)
+    instrumentation.enable()
+    enabled = per_call(instrumented, args.calls)
+    print(f"plain call:            {baseline:8.0f} ns")
+    print(f"instrumented/disabled: {disabled:8.0f} ns (+{disabled - baseline:.0f} ns)")
+    print(f"instrumented/enabled:  {enabled:8.0f} ns (+{enabled - baseline:.0f} ns)")
+
+    instrumentation.registry.reset()
+    instrumentation.counter("chunks_added_total", 10)
+    for _ in range(3):
+        with instrumentation.span("vector_search"):
+            time.sleep(0.002)
+    print("\n--- Prometheus ---")
+    print(instrumentation.registry.to_prometheus())
+    print("--- JSON lines ---")
+    print(instrumentation.registry.to_jsonl())
+
+if __name__ == "__main__":
+    main()
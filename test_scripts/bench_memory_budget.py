@@ -0,0 +1,71 @@
+# Verify --memory-budget ingestion on a large synthetic history: ingest one contact all at once
+# and under a few budgets, each in a fresh process, and compare peak RSS, time and the batch
+# sizes the budget mode settled on. Per-stage memory tables are printed with --report.
+# Usage: python -m imessage_insight.test_scripts.bench_memory_budget [--messages 300000] [--budgets 300MB,200MB] [--report]
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+def child(args):
+    from imessage_insight import instrumentation
+    from imessage_insight.ingest import ingest_contact_paged
+    from imessage_insight.memory import parse_size
+    from imessage_insight.vector_store import ChromaVectorStore
+    from imessage_insight.test_scripts.fakes import HashEmbedder
+
+    tracker = instrumentation.track_memory(trace=args.report)
+    store = ChromaVectorStore(collection_name="memory_budget", persist_dir=args.persist_dir, lexical=False)
+    if args.budget == "none":
+        # Single pass: one page holding every message, one embedding batch
+        result = ingest_contact_paged(args.contact, store, HashEmbedder(), db_path=args.db_path,
+                                      strategy="timeandfixed", chunk_size=20, page_size=10 ** 9, embed_batch=10 ** 9)
+    else:
+        result = ingest_contact_paged(args.contact, store, HashEmbedder(), db_path=args.db_path,
+                                      strategy="timeandfixed", chunk_size=20, memory_budget=parse_size(args.budget))
+    instrumentation.stop_memory()
+    if args.report:
+        print(tracker.report(), file=sys.stderr)
+    result["peak_rss"] = tracker.peak_rss
+    print(json.dumps(result))
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory-budget ingestion on synthetic data.")
+    parser.add_argument("--messages", type=int, default=300000)
+    parser.add_argument("--budgets", default="300MB,200MB")
+    parser.add_argument("--report", action="store_true", help="Print per-stage memory tables (tracemalloc)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--budget", help=argparse.SUPPRESS)
+    parser.add_argument("--db-path", help=argparse.SUPPRESS)
+    parser.add_argument("--contact", help=argparse.SUPPRESS)
+    parser.add_argument("--persist-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args)
+        return
+
+    from imessage_insight.test_scripts.synthetic_chat_db import generate
+    workdir = tempfile.mkdtemp()
+    db_path = os.path.join(workdir, "chat.db")
+    contact = generate(db_path, contacts=1, messages=args.messages, days=3 * 365, max_words=40)[0]
+    print(f"Synthetic history: {args.messages} messages in {db_path}")
+
+    print(f"{'budget':>10}{'peak RSS MB':>14}{'seconds':>10}{'chunks':>9}{'page':>12}{'embed batch':>13}")
+    for budget in ["none"] + args.budgets.split(","):
+        cmd = [sys.executable, "-m", "imessage_insight.test_scripts.bench_memory_budget", "--child",
+               "--budget", budget, "--db-path", db_path, "--contact", contact,
+               "--persist-dir", tempfile.mkdtemp(dir=workdir)]
+        if args.report:
+            cmd.append("--report")
+        output = subprocess.run(cmd, check=True, capture_output=True, text=True)
+        if args.report:
+            print(output.stderr)
+        result = json.loads(output.stdout.strip().splitlines()[-1])
+        print(f"{budget:>10}{result['peak_rss'] / 1024 ** 2:>14.1f}{result['timings']['total']:>10.1f}"
+              f"{result['chunks']:>9}{result['page_size']:>12}{result['embed_batch']:>13}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+# Measure the overhead of MMR diversification on over-fetched candidates.
+# Usage: python -m imessage_insight.test_scripts.bench_mmr [fetch_k] [top_k]
+
+import sys
+import time
+import numpy as np
+from imessage_insight.ranking import mmr_select
+
+def main():
+    fetch_k = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    top_k = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    dimension, repeats = 384, 500
+    rng = np.random.default_rng(0)
+    query = rng.standard_normal(dimension).astype(np.float32)
+    # Results come back from Chroma with embeddings as lists, so benchmark that input shape
+    candidates = [{"id": str(i), "embedding": rng.standard_normal(dimension).astype(np.float32).tolist()} for i in range(fetch_k)]
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        mmr_select(query, candidates, top_k=top_k, lambda_mult=0.5)
+    per_call_ms = (time.perf_counter() - start) * 1000 / repeats
+    print(f"MMR fetch_k={fetch_k} top_k={top_k} dimension={dimension}: {per_call_ms:.3f} ms per query")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# Compare sending a large top_k to the LLM with over-fetching and cross-encoder reranking.
+# Reports end-to-end latency, context tokens (LLM cost) and recall for each configuration.
+# Usage: python -m imessage_insight.test_scripts.bench_rerank questions.jsonl [--collection imessage_chunks]
+
+import argparse
+from imessage_insight.embedding import MessageEmbedder
+from imessage_insight.evaluation import EvaluationHarness, load_questions
+from imessage_insight.llm import StubLLMClient
+from imessage_insight.rag import RAGPipeline
+from imessage_insight.reranker import CrossEncoderReranker
+
+CHROMA_DIR = "imessage_insight/chromadb_data"
+
+def main():
+    parser = argparse.ArgumentParser(description="Reranking vs large top_k benchmark.")
+    parser.add_argument("questions")
+    parser.add_argument("--collection", default="imessage_chunks")
+    parser.add_argument("--persist-dir", default=CHROMA_DIR)
+    parser.add_argument("--small-k", type=int, default=3)
+    parser.add_argument("--large-k", type=int, default=15)
+    parser.add_argument("--fetch-k", type=int, default=30)
+    args = parser.parse_args()
+
+    questions = load_questions(args.questions)
+    embedder = MessageEmbedder()
+    reranker = CrossEncoderReranker()
+    llm = StubLLMClient(latency=0.3)
+    configs = [
+        (f"top_k={args.small_k}", args.small_k, None),
+        (f"top_k={args.large_k}", args.large_k, None),
+        (f"rerank {args.fetch_k}->{args.small_k}", args.small_k, reranker),
+    ]
+    rows = []
+    for name, top_k, config_reranker in configs:
+        rag = RAGPipeline(collection_name=args.collection, persist_dir=args.persist_dir, embedder=embedder,
+                          llm_client=llm, reranker=config_reranker, fetch_k=args.fetch_k)
+        _, report = EvaluationHarness(rag, top_k=top_k).run(questions)
+        rows.append((name, report))
+
+    baseline_tokens = rows[1][1]["mean_context_tokens"] or 0
+    print(f"{'config':<22} {'recall':>8} {'p50 ms':>8} {'retrieve':>9} {'tokens':>8} {'saved':>7}")
+    print('-' * 66)
+    for name, report in rows:
+        recall = report[f"recall@{report['top_k']}"]
+        tokens = report["mean_context_tokens"] or 0
+        saved = 1 - tokens / baseline_tokens if baseline_tokens else 0
+        print(f"{name:<22} {recall if recall is not None else float('nan'):>8.3f} "
+              f"{report['latency_ms']['total']['p50']:>8.1f} {report['latency_ms']['retrieve']['p50']:>9.1f} "
+              f"{tokens:>8.0f} {saved:>7.0%}")
+    print(f"\nReranker cache: {reranker.cache_hits} hits, {reranker.cache_misses} misses")
+    print("Token savings are relative to the large top_k configuration; the stub LLM has fixed latency,")
+    print("so real LLM latency savings from shorter prompts come on top of the numbers shown.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# Replay a dashboard-style query mix (a few questions asked over and over) against a synthetic
+# collection with and without the retrieval cache, then check that an add, an update and a
+# delete each invalidate the cached results.
+# Usage: python -m imessage_insight.test_scripts.bench_retrieval_cache [--messages 20000] [--requests 500]
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from imessage_insight import instrumentation
+from imessage_insight.evaluation import percentiles
+from imessage_insight.ingest import ingest_contact_paged
+from imessage_insight.llm import StubLLMClient
+from imessage_insight.rag import RAGPipeline
+from imessage_insight.retrieval_cache import RetrievalCache
+from imessage_insight.vector_store import ChromaVectorStore
+from imessage_insight.test_scripts.fakes import HashEmbedder
+from imessage_insight.test_scripts.synthetic_chat_db import generate
+
+QUESTIONS = [
+    "what are we doing this weekend",
+    "did you get the tickets",
+    "where should we eat dinner",
+    "how was the trip",
+    "when is the party",
+    "can you send me the address",
+    "did you finish the project",
+    "what time is the game",
+]
+
+def replay(rag, queries, top_k):
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        rag.retrieve_context(query, top_k=top_k)
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+def check_invalidation(rag, store, embedder, query, top_k):
+    """
+    Each write must make the next retrieval a miss. Returns {write: passed}.
+    """
+    cache = rag.retrieval_cache
+    checks = {}
+
+    def missed_after(write):
+        rag.retrieve_context(query, top_k=top_k)
+        misses = cache.misses
+        write()
+        results = rag.retrieve_context(query, top_k=top_k)
+        return cache.misses == misses + 1, results
+
+    new_chunk = embedder.generate_embeddings([{
+        'id': "bench:cache-probe", 'text': query,
+        'metadata': {'contact': "bench", 'start_date': "2024-01-01 00:00:00", 'end_date': "2024-01-01 00:00:00"}
+    }])
+    checks["add"], results = missed_after(lambda: store.add_chunks(new_chunk))
+    checks["add"] = checks["add"] and any(r["id"] == "bench:cache-probe" for r in results)
+    edited = embedder.generate_embeddings([{'id': "bench:cache-probe", 'text': "completely unrelated words"}])
+    checks["update"], results = missed_after(lambda: store.update_chunks(edited))
+    checks["update"] = checks["update"] and all(r["text"] != query for r in results)
+    checks["delete"], results = missed_after(lambda: store.delete_chunks(ids=["bench:cache-probe"]))
+    checks["delete"] = checks["delete"] and all(r["id"] != "bench:cache-probe" for r in results)
+    return checks
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrieval cache hit rate, latency and invalidation.")
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--hybrid", action="store_true")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    db_path = os.path.join(workdir, "chat.db")
+    contact = generate(db_path, contacts=1, messages=args.messages, days=365)[0]
+    embedder = HashEmbedder()
+    store = ChromaVectorStore(collection_name="cache_bench", persist_dir=workdir)
+    ingest_contact_paged(contact, store, embedder, db_path=db_path, strategy="timeandfixed", chunk_size=20)
+    print(f"Ingested {store.collection.count()} chunks")
+
+    instrumentation.enable()
+    rng = random.Random(0)
+    queries = [rng.choice(QUESTIONS) for _ in range(args.requests)]
+    print(f"{'pipeline':<12}{'p50 ms':>10}{'p90 ms':>10}{'total s':>10}{'hit rate':>10}")
+    for name, cache in (("uncached", None), ("cached", RetrievalCache())):
+        rag = RAGPipeline(collection_name="cache_bench", persist_dir=workdir, embedder=embedder, hybrid=args.hybrid,
+                          llm_client=StubLLMClient(latency=0.0), parse_dates=False, retrieval_cache=cache)
+        latencies = replay(rag, queries, args.top_k)
+        ms = percentiles(latencies, points=(50, 90))
+        hit_rate = f"{cache.stats()['hit_rate']:.2f}" if cache else "-"
+        print(f"{name:<12}{ms['p50']:>10.2f}{ms['p90']:>10.2f}{sum(latencies):>10.2f}{hit_rate:>10}")
+
+    print(f"Invalidation: {check_invalidation(rag, rag.vector_store, embedder, QUESTIONS[0], args.top_k)}")
+    counters = [c for c in instrumentation.registry.snapshot()["counters"] if c["name"] == "retrieval_cache_requests_total"]
+    print("Metrics: " + ", ".join(f"{c['labels']['result']}={c['value']}" for c in counters))
+
+if __name__ == "__main__":
+    main()
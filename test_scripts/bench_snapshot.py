@@ -0,0 +1,61 @@
+# Benchmark a snapshot export/import round trip on a synthetic collection.
+# Usage: python -m imessage_insight.test_scripts.bench_snapshot [num_chunks] [dimension]
+
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+from imessage_insight.vector_store import ChromaVectorStore
+from imessage_insight.test_scripts.fakes import HashEmbedder
+
+def make_chunks(n, dimension):
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((n, dimension)).astype(np.float32)
+    return [
+        {
+            "id": i,
+            "text": f"Me: synthetic message {i}\nFriend: reply {i}",
+            "metadata": {"start_date": "2023-01-01 12:00:00", "end_date": "2023-01-01 12:05:00", "message_count": 2},
+            "embedding": vectors[i]
+        }
+        for i in range(n)
+    ]
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    dimension = int(sys.argv[2]) if len(sys.argv) > 2 else 384
+    embedder = HashEmbedder(dimension)
+    with tempfile.TemporaryDirectory() as tmp:
+        source = ChromaVectorStore(collection_name="bench_source", persist_dir=os.path.join(tmp, "source"))
+        chunks = make_chunks(n, dimension)
+        for i in range(0, n, 5000):
+            source.add_chunks(chunks[i:i+5000])
+
+        bundle = os.path.join(tmp, "bundle")
+        start = time.perf_counter()
+        manifest = source.export_snapshot(bundle, embedder=embedder)
+        export_s = time.perf_counter() - start
+        size_mb = sum(os.path.getsize(os.path.join(bundle, f)) for f in os.listdir(bundle)) / 1e6
+
+        target = ChromaVectorStore(collection_name="bench_target", persist_dir=os.path.join(tmp, "target"))
+        start = time.perf_counter()
+        imported = target.import_snapshot(bundle, embedder=embedder)
+        import_s = time.perf_counter() - start
+
+        # Verify the round trip on a sample of ids
+        sample = [str(i) for i in range(0, n, max(1, n // 100))]
+        a = source.collection.get(ids=sample, include=["embeddings", "documents"])
+        b = target.collection.get(ids=sample, include=["embeddings", "documents"])
+        order_a = {doc_id: i for i, doc_id in enumerate(a["ids"])}
+        ok = all(
+            np.allclose(a["embeddings"][order_a[doc_id]], b["embeddings"][j]) and a["documents"][order_a[doc_id]] == b["documents"][j]
+            for j, doc_id in enumerate(b["ids"])
+        )
+        print(f"Chunks: {manifest['count']}  dimension: {manifest['dimension']}  bundle size: {size_mb:.1f} MB")
+        print(f"Export: {export_s:.2f}s ({n / export_s:.0f} chunks/sec)")
+        print(f"Import: {import_s:.2f}s ({imported / import_s:.0f} chunks/sec)")
+        print(f"Round trip verified: {ok}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+# pytest-benchmark suite covering each pipeline stage on a synthetic chat.db:
+# reader, MessagePreprocessor, each chunking strategy, embedding with a tiny model,
+# ChromaVectorStore add/query, and RAGPipeline end to end with the stub LLM.
+# Not collected by a plain `pytest` run; invoke it explicitly:
+#   pip install -r requirements-dev.txt
+#   python -m pytest imessage_insight/test_scripts/bench_stages.py --benchmark-group-by=func
+# Environment: BENCH_MESSAGES (default 20000), BENCH_EMBED_MODEL (default paraphrase-MiniLM-L3-v2)
+
+import os
+import uuid
+import pytest
+from imessage_insight import chat_db
+from imessage_insight.chunking import chunk_messages
+from imessage_insight.message_preprocessor import MessagePreprocessor
+from imessage_insight.test_scripts.fakes import HashEmbedder
+from imessage_insight.test_scripts.synthetic_chat_db import generate
+
+pytest.importorskip("pytest_benchmark")
+
+BENCH_MESSAGES = int(os.getenv("BENCH_MESSAGES", "20000"))
+BENCH_EMBED_MODEL = os.getenv("BENCH_EMBED_MODEL", "paraphrase-MiniLM-L3-v2")
+QUESTION = "What did we say about the concert tickets?"
+
+@pytest.fixture(scope="session")
+def chat_db_path(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("chatdb") / "chat.db")
+    handles = generate(path, contacts=5, messages=BENCH_MESSAGES, days=365)
+    return path, handles[0]
+
+@pytest.fixture(scope="session")
+def raw_rows(chat_db_path):
+    path, contact = chat_db_path
+    conn = chat_db.connect(path)
+    rows = chat_db.fetch_messages_since(conn, chat_db.find_handle_ids(conn, contact))
+    conn.close()
+    return rows
+
+@pytest.fixture(scope="session")
+def messages(raw_rows):
+    return chat_db.process_rows(raw_rows)
+
+@pytest.fixture(scope="session")
+def chunks(messages):
+    chunks = chunk_messages(messages, strategy='timeandfixed', chunk_size=20, hours_gap=1)
+    return HashEmbedder().generate_embeddings(chunks)
+
+@pytest.fixture(scope="session")
+def persist_dir(tmp_path_factory):
+    return str(tmp_path_factory.mktemp("chroma"))
+
+@pytest.fixture(scope="session")
+def populated_store(persist_dir, chunks):
+    pytest.importorskip("chromadb")
+    from imessage_insight.vector_store import ChromaVectorStore
+    store = ChromaVectorStore(collection_name="bench_query", persist_dir=persist_dir)
+    store.add_chunks(chunks)
+    return store
+
+# --- Reader ---
+def test_reader_chat_db(benchmark, chat_db_path):
+    path, contact = chat_db_path
+
+    def read():
+        conn = chat_db.connect(path)
+        try:
+            return chat_db.fetch_messages_since(conn, chat_db.find_handle_ids(conn, contact))
+        finally:
+            conn.close()
+
+    rows = benchmark(read)
+    assert rows
+
+def test_reader_imessage_reader(benchmark, chat_db_path):
+    fetch_data = pytest.importorskip("imessage_reader.fetch_data")
+    path, _ = chat_db_path
+    try:
+        reader = fetch_data.FetchData(path)
+    except TypeError:
+        pytest.skip("installed imessage_reader predates FetchData(db_path)")
+    rows = benchmark(reader.get_messages)
+    assert rows
+
+# --- Preprocessing and chunking ---
+def test_preprocessor(benchmark, raw_rows):
+    preprocessor = MessagePreprocessor()
+    processed = benchmark(preprocessor.process_messages, raw_rows)
+    assert len(processed) == len(raw_rows)
+
+@pytest.mark.parametrize("strategy", ["fixed", "time", "timeandfixed"])
+def test_chunking(benchmark, messages, strategy):
+    result = benchmark(chunk_messages, messages, strategy=strategy, chunk_size=20, hours_gap=1)
+    assert sum(chunk['metadata']['message_count'] for chunk in result) == len(messages)
+
+# --- Embedding ---
+def test_embedding_tiny_model(benchmark, chunks):
+    pytest.importorskip("sentence_transformers")
+    from imessage_insight.embedding import MessageEmbedder
+    embedder = MessageEmbedder(model_name=BENCH_EMBED_MODEL)
+    sample = [{'text': chunk['text']} for chunk in chunks[:256]]
+    benchmark.pedantic(embedder.generate_embeddings, args=(sample,), rounds=3, iterations=1)
+
+def test_embed_query_tiny_model(benchmark):
+    pytest.importorskip("sentence_transformers")
+    from imessage_insight.embedding import MessageEmbedder
+    embedder = MessageEmbedder(model_name=BENCH_EMBED_MODEL)
+    benchmark(embedder.embed_query, QUESTION)
+
+# --- Vector store ---
+def test_store_add(benchmark, persist_dir, chunks):
+    pytest.importorskip("chromadb")
+    from imessage_insight.vector_store import ChromaVectorStore
+
+    def setup():
+        store = ChromaVectorStore(collection_name=f"bench_add_{uuid.uuid4().hex[:8]}", persist_dir=persist_dir)
+        return (store,), {}
+
+    benchmark.pedantic(lambda store: store.add_chunks(chunks), setup=setup, rounds=3, iterations=1)
+
+def test_store_query(benchmark, populated_store):
+    query_embedding = HashEmbedder().embed_query(QUESTION)
+    results = benchmark(populated_store.query, query_embedding, top_k=5)
+    assert len(results) == 5
+
+def test_store_query_time_filtered(benchmark, populated_store):
+    query_embedding = HashEmbedder().embed_query(QUESTION)
+    benchmark(populated_store.query, query_embedding, top_k=5, start="2023-03-01", end="2023-03-31")
+
+# --- End to end ---
+@pytest.mark.parametrize("hybrid", [False, True])
+def test_rag_stub_llm(benchmark, populated_store, persist_dir, hybrid):
+    from imessage_insight.llm import StubLLMClient
+    from imessage_insight.rag import RAGPipeline
+    rag = RAGPipeline(collection_name="bench_query", persist_dir=persist_dir, embedder=HashEmbedder(),
+                      llm_client=StubLLMClient(latency=0.0), hybrid=hybrid)
+    result = benchmark(rag.answer_query, QUESTION, top_k=5)
+    assert result["answer"]
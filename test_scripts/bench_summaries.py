@@ -0,0 +1,81 @@
+# Build day/week/month summaries for a synthetic contact with the stub LLM, update them
+# incrementally after new messages arrive, and compare broad questions answered from raw
+# chunks against answers routed to the summaries (prompt tokens, months covered, latency).
+# Usage: python -m imessage_insight.test_scripts.bench_summaries [--messages 20000]
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import datetime
+from imessage_insight.ingest import ingest_contact_paged
+from imessage_insight.llm import StubLLMClient
+from imessage_insight.rag import RAGPipeline
+from imessage_insight.summaries import SummaryBuilder, SummaryIndex, stub_summary
+from imessage_insight.vector_store import ChromaVectorStore
+from imessage_insight.test_scripts.fakes import HashEmbedder
+from imessage_insight.test_scripts.synthetic_chat_db import append_messages, generate
+
+QUESTIONS = [
+    "How has our relationship changed over the year?",
+    "What were the main topics we talked about overall?",
+    "Give me a recap of our conversations about trips and vacations",
+]
+
+def months_covered(retrieved):
+    months = set()
+    for result in retrieved:
+        ts = (result.get("metadata") or {}).get("start_date_ts")
+        if isinstance(ts, (int, float)):
+            months.add(datetime.fromtimestamp(ts).strftime("%Y-%m"))
+    return len(months)
+
+def main():
+    parser = argparse.ArgumentParser(description="Summary level vs raw chunks for broad questions.")
+    parser.add_argument("--messages", type=int, default=20000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    db_path = os.path.join(workdir, "chat.db")
+    contact = generate(db_path, contacts=1, messages=args.messages, days=365)[0]
+    embedder = HashEmbedder()
+    store = ChromaVectorStore(collection_name="summaries_bench", persist_dir=workdir)
+    ingest_contact_paged(contact, store, embedder, db_path=db_path, strategy="timeandfixed", chunk_size=20)
+    print(f"Ingested {store.collection.count()} chunks")
+
+    index = SummaryIndex(collection_name="summaries_bench", persist_dir=workdir)
+    llm = StubLLMClient(latency=0.0, answer_fn=stub_summary)
+    builder = SummaryBuilder(store, index, embedder, llm)
+    started = time.perf_counter()
+    print(f"Initial build: {builder.update(contact)} in {time.perf_counter() - started:.1f}s ({builder.llm_calls} LLM calls)")
+
+    conn = sqlite3.connect(db_path)
+    append_messages(conn, contact, 30, seed=1)
+    conn.close()
+    ingest_contact_paged(contact, store, embedder, db_path=db_path, strategy="timeandfixed", chunk_size=20)
+    calls = builder.llm_calls
+    started = time.perf_counter()
+    updated = builder.update(contact)
+    print(f"Incremental update after 30 new messages: {updated} in {time.perf_counter() - started:.2f}s "
+          f"({builder.llm_calls - calls} LLM calls)")
+
+    answer_llm = StubLLMClient(latency=0.0)
+    variants = [
+        ("chunks top_k=5", RAGPipeline(collection_name="summaries_bench", persist_dir=workdir, embedder=embedder,
+                                       llm_client=answer_llm, parse_dates=False), 5),
+        ("chunks top_k=100", RAGPipeline(collection_name="summaries_bench", persist_dir=workdir, embedder=embedder,
+                                         llm_client=answer_llm, parse_dates=False, max_context_tokens=20000), 100),
+        ("summaries", RAGPipeline(collection_name="summaries_bench", persist_dir=workdir, embedder=embedder,
+                                  llm_client=answer_llm, parse_dates=False, summaries=index), 5),
+    ]
+    print(f"\n{'pipeline':<18}{'route':>8}{'ctx tokens':>12}{'months':>8}{'retrieve ms':>13}")
+    for question in QUESTIONS:
+        print(question)
+        for name, rag, top_k in variants:
+            result = rag.answer_query(question, top_k=top_k)
+            print(f"  {name:<16}{result['route']:>8}{result['context_tokens']:>12}"
+                  f"{months_covered(result['retrieved']):>8}{result['timings']['retrieve'] * 1000:>13.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# Lightweight stand-ins used by the offline test and benchmark scripts.
+
+import hashlib
+import re
+import numpy as np
+
+class HashEmbedder:
+    """
+    Deterministic bag-of-words embedder with the MessageEmbedder interface.
+    Each word is hashed to a fixed random unit vector; a text embeds to the normalized sum.
+    Texts sharing words get similar embeddings, which is enough for offline pipeline tests
+    without loading a model.
+    """
+    def __init__(self, dimension=384):
+        self.model_name = f"hash-{dimension}"
+        self.backend = "hash"
+        self.dimension = dimension
+        self._word_vectors = {}
+
+    def _word_vector(self, word):
+        vec = self._word_vectors.get(word)
+        if vec is None:
+            seed = int.from_bytes(hashlib.md5(word.encode()).digest()[:4], "little")
+            vec = np.random.default_rng(seed).standard_normal(self.dimension).astype(np.float32)
+            self._word_vectors[word] = vec
+        return vec
+
+    def _embed(self, text):
+        vec = np.zeros(self.dimension, dtype=np.float32)
+        for word in re.findall(r"[a-z0-9]+", text.lower()):
+            vec += self._word_vector(word)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def generate_embeddings(self, chunks):
+        for chunk in chunks:
+            chunk['embedding'] = self._embed(chunk['text']).tolist()
+        return chunks
+
+    def embed_query(self, text):
+        return self._embed(text).tolist()
+
+    def embed_queries(self, texts):
+        return [self._embed(text).tolist() for text in texts]
+
+    def get_dimension(self):
+        return self.dimension
+
+def make_chunks(n, start="2023-01-01 12:00:00", minutes_apart=90):
+    """
+    Build n synthetic chunks with varied vocabulary and increasing timestamps.
+    """
+    from datetime import datetime, timedelta
+    topics = ["dinner at the thai restaurant", "birthday gift ideas", "hiking trip in the mountains",
+              "new job interview", "movie night plans", "concert tickets", "weekend at the beach",
+              "coffee on 5th street", "running a marathon", "adopting a puppy"]
+    base = datetime.fromisoformat(start)
+    chunks = []
+    for i in range(n):
+        topic = topics[i % len(topics)]
+        first = base + timedelta(minutes=i * minutes_apart)
+        last = first + timedelta(minutes=5)
+        chunks.append({
+            'id': i,
+            'text': f"Me: what do you think about {topic}?\nFriend: {topic} sounds great, number {i}",
+            'metadata': {
+                'start_date': first.isoformat(sep=' '),
+                'end_date': last.isoformat(sep=' '),
+                'message_count': 2
+            }
+        })
+    return chunks
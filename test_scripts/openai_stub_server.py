@@ -0,0 +1,94 @@
+# Minimal local OpenAI-compatible chat completions server for offline testing and benchmarks.
+# Supports POST /v1/chat/completions with and without "stream": true (server-sent events).
+# Usage:
+#   python -m imessage_insight.test_scripts.openai_stub_server [--port 8765] [--first-token-ms 300] [--token-ms 20]
+# then pass llm_base_url="http://127.0.0.1:8765/v1" to RAGPipeline.
+
+import argparse
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+def make_handler(first_token_ms, token_ms, answer_words):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass  # Keep benchmark output clean
+
+        def do_POST(self):
+            if not self.path.endswith("/chat/completions"):
+                self.send_error(404)
+                return
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            model = body.get("model", "stub")
+            # Deterministic answer: echo the question back after a fixed number of filler words
+            question = body.get("messages", [{}])[-1].get("content", "").rsplit("Question:", 1)[-1].split("Answer:")[0].strip()
+            words = [f"stub{i}" for i in range(answer_words)] + question.split()
+            time.sleep(first_token_ms / 1000)
+            if body.get("stream"):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for i, word in enumerate(words):
+                    if i:
+                        time.sleep(token_ms / 1000)
+                    self._send_event({
+                        "id": "stub", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                        "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}]
+                    })
+                self._send_event({
+                    "id": "stub", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]
+                })
+                self._send_chunk(b"data: [DONE]\n\n")
+                self._send_chunk(b"")
+                return
+            time.sleep(token_ms * max(len(words) - 1, 0) / 1000)
+            payload = json.dumps({
+                "id": "stub", "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": " ".join(words)}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(words), "total_tokens": len(words)}
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _send_event(self, event):
+            self._send_chunk(f"data: {json.dumps(event)}\n\n".encode())
+
+        def _send_chunk(self, data):
+            self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+    return StubHandler
+
+def serve(port=8765, first_token_ms=300, token_ms=20, answer_words=20):
+    """
+    Run the stub server in the foreground until interrupted.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(first_token_ms, token_ms, answer_words))
+    server.serve_forever()
+
+def start(port=0, first_token_ms=300, token_ms=20, answer_words=20):
+    """
+    Start the stub server on a background thread and return (server, base_url).
+    port=0 picks a free port.
+    """
+    import threading
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(first_token_ms, token_ms, answer_words))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stub server.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--first-token-ms", type=float, default=300)
+    parser.add_argument("--token-ms", type=float, default=20)
+    parser.add_argument("--answer-words", type=int, default=20)
+    args = parser.parse_args()
+    print(f"Stub LLM listening on http://127.0.0.1:{args.port}/v1")
+    serve(args.port, args.first_token_ms, args.token_ms, args.answer_words)
@@ -0,0 +1,191 @@
+# Generate a schema-compatible synthetic chat.db (handle, chat, message, chat_handle_join,
+# chat_message_join) for benchmarks and tests, so performance work doesn't need a real Mac.
+# Both imessage_reader's query (message JOIN handle) and chat_db's chat-join query work on it.
+# Usage:
+#   python -m imessage_insight.test_scripts.synthetic_chat_db /tmp/chat.db --contacts 20 --messages 200000 \
+#       [--days 730] [--distribution bursty|uniform] [--volume zipf|even] [--min-words 1] [--max-words 25]
+
+import argparse
+import os
+import random
+import sqlite3
+import time
+from datetime import datetime, timedelta
+from imessage_insight.chat_db import MAC_EPOCH_START
+
+SCHEMA = """
+CREATE TABLE handle (
+    ROWID INTEGER PRIMARY KEY AUTOINCREMENT, id TEXT NOT NULL, country TEXT, service TEXT NOT NULL,
+    uncanonicalized_id TEXT, person_centric_id TEXT
+);
+CREATE TABLE chat (
+    ROWID INTEGER PRIMARY KEY AUTOINCREMENT, guid TEXT UNIQUE NOT NULL, style INTEGER, state INTEGER,
+    account_id TEXT, chat_identifier TEXT, service_name TEXT, display_name TEXT
+);
+CREATE TABLE message (
+    ROWID INTEGER PRIMARY KEY AUTOINCREMENT, guid TEXT UNIQUE NOT NULL, text TEXT, handle_id INTEGER DEFAULT 0,
+    service TEXT, account TEXT, date INTEGER, date_read INTEGER, date_delivered INTEGER,
+    is_from_me INTEGER DEFAULT 0, is_read INTEGER DEFAULT 0, destination_caller_id TEXT,
+    cache_has_attachments INTEGER DEFAULT 0, attributedBody BLOB
+);
+CREATE TABLE chat_handle_join (chat_id INTEGER REFERENCES chat (ROWID), handle_id INTEGER REFERENCES handle (ROWID),
+    UNIQUE(chat_id, handle_id));
+CREATE TABLE chat_message_join (chat_id INTEGER REFERENCES chat (ROWID), message_id INTEGER REFERENCES message (ROWID),
+    message_date INTEGER DEFAULT 0, PRIMARY KEY (chat_id, message_id));
+CREATE INDEX chat_message_join_idx_message_id ON chat_message_join(message_id);
+CREATE INDEX message_idx_handle ON message(handle_id, date);
+"""
+
+OWNER = "+15550000000"
+WORDS = ("dinner tonight thai restaurant birthday gift ideas hiking trip mountains new job interview movie "
+         "night plans concert tickets weekend beach coffee street marathon training puppy vacation flight "
+         "hotel booked running late traffic lunch tomorrow game score party saturday sounds great love "
+         "that haha okay sure miss you call later work meeting project deadline grocery list rent").split()
+
+def contact_handle(i):
+    return f"+1555{1000000 + i:07d}"
+
+def to_apple_ns(dt):
+    return int((dt.timestamp() - MAC_EPOCH_START) * 1e9)
+
+def random_text(rng, min_words, max_words):
+    # Skew towards short texts, like real chats
+    n = min(max_words, min_words + int(rng.expovariate(1 / max(1, (max_words - min_words) / 4))))
+    return " ".join(rng.choice(WORDS) for _ in range(n)).capitalize()
+
+def message_times(rng, n, start, days, distribution):
+    """
+    n sorted datetimes over `days` days from `start`. 'uniform' spreads them evenly at random;
+    'bursty' groups them into conversations of a few minutes-apart messages separated by long gaps.
+    """
+    span = days * 86400
+    if distribution == "uniform":
+        offsets = sorted(rng.uniform(0, span) for _ in range(n))
+    elif distribution == "bursty":
+        offsets = []
+        while len(offsets) < n:
+            t = rng.uniform(0, span)
+            for _ in range(min(n - len(offsets), max(1, int(rng.expovariate(1 / 12))))):
+                offsets.append(t)
+                t += rng.expovariate(1 / 90)  # ~1.5 minutes between messages in a conversation
+        offsets.sort()
+    else:
+        raise ValueError(f"Unknown time distribution: {distribution}")
+    return [start + timedelta(seconds=offset) for offset in offsets]
+
+def contact_volumes(total, contacts, volume):
+    """
+    Split `total` messages across contacts: evenly, or Zipf-like (a few contacts dominate).
+    """
+    if volume == "even":
+        weights = [1.0] * contacts
+    elif volume == "zipf":
+        weights = [1.0 / (i + 1) for i in range(contacts)]
+    else:
+        raise ValueError(f"Unknown volume distribution: {volume}")
+    scale = total / sum(weights)
+    counts = [int(w * scale) for w in weights]
+    counts[0] += total - sum(counts)
+    return counts
+
+def create_schema(conn):
+    conn.executescript(SCHEMA)
+
+def add_contact(conn, handle):
+    """
+    Insert a handle and its one-to-one chat. Returns (handle_rowid, chat_rowid).
+    """
+    handle_id = conn.execute("INSERT INTO handle (id, country, service) VALUES (?, 'us', 'iMessage')",
+                             (handle,)).lastrowid
+    chat_id = conn.execute(
+        "INSERT INTO chat (guid, style, state, account_id, chat_identifier, service_name) "
+        "VALUES (?, 45, 3, ?, ?, 'iMessage')", (f"iMessage;-;{handle}", OWNER, handle)
+    ).lastrowid
+    conn.execute("INSERT INTO chat_handle_join VALUES (?, ?)", (chat_id, handle_id))
+    return handle_id, chat_id
+
+def insert_messages(conn, messages):
+    """
+    Insert (datetime, handle_rowid, chat_rowid, text, is_from_me) tuples with consecutive ROWIDs, in order.
+    """
+    first_rowid = conn.execute("SELECT COALESCE(MAX(ROWID), 0) FROM message").fetchone()[0] + 1
+    rows, joins = [], []
+    for i, (dt, handle_id, chat_id, text, is_from_me) in enumerate(messages):
+        rowid, date = first_rowid + i, to_apple_ns(dt)
+        rows.append((rowid, f"msg-{rowid}", text, handle_id, date, date + 5_000_000_000, int(is_from_me), OWNER))
+        joins.append((chat_id, rowid, date))
+    conn.executemany(
+        "INSERT INTO message (ROWID, guid, text, handle_id, service, date, date_delivered, is_from_me, "
+        "destination_caller_id) VALUES (?, ?, ?, ?, 'iMessage', ?, ?, ?, ?)", rows
+    )
+    conn.executemany("INSERT INTO chat_message_join VALUES (?, ?, ?)", joins)
+    return [row[0] for row in rows]
+
+def generate(path, contacts=5, messages=10000, days=365, distribution="bursty", volume="zipf",
+             min_words=1, max_words=25, start="2023-01-01", seed=0):
+    """
+    Write a synthetic chat.db at `path` (replacing any existing file).
+    Messages are inserted in time order, so ROWID order matches date order as in the real database.
+    Returns the list of contact handles, busiest first.
+    """
+    rng = random.Random(seed)
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    create_schema(conn)
+    base = datetime.fromisoformat(start)
+    handles = [contact_handle(i) for i in range(contacts)]
+    pending = []
+    for handle, count in zip(handles, contact_volumes(messages, contacts, volume)):
+        handle_id, chat_id = add_contact(conn, handle)
+        for dt in message_times(rng, count, base, days, distribution):
+            pending.append((dt, handle_id, chat_id, random_text(rng, min_words, max_words), rng.random() < 0.5))
+    pending.sort(key=lambda m: m[0])
+    for i in range(0, len(pending), 10000):
+        insert_messages(conn, pending[i:i + 10000])
+    conn.commit()
+    conn.close()
+    return handles
+
+def append_messages(conn, handle, n, seed=None, min_words=1, max_words=25):
+    """
+    Append n messages dated now to an existing contact, one transaction per message
+    like Messages itself. Returns the new ROWIDs.
+    """
+    rng = random.Random(seed)
+    handle_id, chat_id = conn.execute(
+        "SELECT handle.ROWID, chat_handle_join.chat_id FROM handle "
+        "JOIN chat_handle_join ON chat_handle_join.handle_id = handle.ROWID WHERE handle.id = ?", (handle,)
+    ).fetchone()
+    rowids = []
+    for _ in range(n):
+        rowids += insert_messages(conn, [(datetime.now(), handle_id, chat_id, random_text(rng, min_words, max_words),
+                                          rng.random() < 0.5)])
+        conn.commit()
+    return rowids
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic chat.db.")
+    parser.add_argument("path")
+    parser.add_argument("--contacts", type=int, default=5)
+    parser.add_argument("--messages", type=int, default=10000, help="Total messages across all contacts")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--start", default="2023-01-01")
+    parser.add_argument("--distribution", choices=["bursty", "uniform"], default="bursty")
+    parser.add_argument("--volume", choices=["zipf", "even"], default="zipf")
+    parser.add_argument("--min-words", type=int, default=1)
+    parser.add_argument("--max-words", type=int, default=25)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    handles = generate(args.path, contacts=args.contacts, messages=args.messages, days=args.days,
+                       distribution=args.distribution, volume=args.volume, min_words=args.min_words,
+                       max_words=args.max_words, start=args.start, seed=args.seed)
+    size_mb = os.path.getsize(args.path) / 1e6
+    print(f"Wrote {args.messages} messages for {len(handles)} contacts to {args.path} "
+          f"({size_mb:.1f} MB) in {time.perf_counter() - started:.1f}s")
+    print(f"Busiest contact: {handles[0]}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# Table-driven checks for extract_date_range: two-sided ranges, open ranges, ordinal days,
+# relative windows and phrases that must not become date filters. "Today" is fixed.
+# Usage: python -m imessage_insight.test_scripts.test_date_parsing [--verbose]
+
+import argparse
+from datetime import datetime
+from imessage_insight.date_parsing import extract_date_range
+
+NOW = datetime(2026, 10, 19, 15, 30)
+
+def day_end(year, month, day):
+    return datetime(year, month, day, 23, 59, 59, 999999)
+
+# question -> expected (start, end)
+CASES = [
+    # Two-sided ranges, end inclusive; a yearless first point takes the second's year
+    ("what happened between march and may 2023", (datetime(2023, 3, 1), day_end(2023, 5, 31))),
+    ("from jan 2023 to march 2023", (datetime(2023, 1, 1), day_end(2023, 3, 31))),
+    ("from march 5 until march 10, 2024", (datetime(2024, 3, 5), day_end(2024, 3, 10))),
+    ("between 2019 and 2021", (datetime(2019, 1, 1), day_end(2021, 12, 31))),
+    ("from november to february", (datetime(2025, 11, 1), day_end(2026, 2, 28))),
+    ("between 2023-01-10 and 2023-01-20", (datetime(2023, 1, 10), day_end(2023, 1, 20))),
+    # Open ranges; "after"/"before" exclude the named point
+    ("after the 4th of july", (datetime(2026, 7, 5), None)),
+    ("since march 2021", (datetime(2021, 3, 1), None)),
+    ("before 2020", (None, datetime(2019, 12, 31, 23, 59, 59, 999999))),
+    ("until june 3rd", (None, day_end(2026, 6, 3))),
+    # Single points
+    ("what did we do on the 4th of july", (datetime(2026, 7, 4), day_end(2026, 7, 4))),
+    ("dinner on 12th of december 2024", (datetime(2024, 12, 12), day_end(2024, 12, 12))),
+    ("march 5th", (datetime(2026, 3, 5), day_end(2026, 3, 5))),
+    ("in 2022", (datetime(2022, 1, 1), day_end(2022, 12, 31))),
+    ("yesterday", (datetime(2026, 10, 18), day_end(2026, 10, 18))),
+    ("last month", (datetime(2026, 9, 1), day_end(2026, 9, 30))),
+    # Not dates
+    ("it cost 2000 dollars", (None, None)),
+    ("the last day of school", (None, None)),
+    ("may i ask something", (None, None)),
+]
+
+def main():
+    parser = argparse.ArgumentParser(description="Table-driven date range parsing checks.")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+    failures = 0
+    for question, expected in CASES:
+        got = extract_date_range(question, now=NOW)
+        if got != expected:
+            failures += 1
+            print(f"FAIL {question!r}: expected {expected}, got {got}")
+        elif args.verbose:
+            print(f"ok   {question!r}: {got}")
+    if failures:
+        raise SystemExit(f"{failures} of {len(CASES)} cases failed")
+    print(f"OK: {len(CASES)} cases")
+
+if __name__ == "__main__":
+    main()
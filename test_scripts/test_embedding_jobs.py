@@ -0,0 +1,97 @@
+# Simulate an embedding job that dies partway through (an API error after a few batches) and
+# check that a re-run resumes from the checkpointed batches: nothing is embedded twice, the
+# stored vectors match an uninterrupted run, and the manifest reports progress throughout.
+# Covers both ingest_contact_paged and a plain EmbeddingJob over in-memory chunks.
+# Usage: python -m imessage_insight.test_scripts.test_embedding_jobs [--messages 5000] [--fail-after 3]
+
+import argparse
+import os
+import tempfile
+import numpy as np
+from imessage_insight.embedding_jobs import EmbeddingJob, format_progress, read_manifest
+from imessage_insight.ingest import ingest_contact_paged, job_dir_for
+from imessage_insight.vector_store import ChromaVectorStore
+from imessage_insight.test_scripts.fakes import HashEmbedder, make_chunks
+from imessage_insight.test_scripts.synthetic_chat_db import generate
+
+class FlakyEmbedder(HashEmbedder):
+    """
+    HashEmbedder that raises after `fail_after` batches and counts every text it embeds.
+    """
+    def __init__(self, fail_after=None):
+        super().__init__()
+        self.fail_after = fail_after
+        self.batches = 0
+        self.embedded = 0
+
+    def generate_embeddings(self, chunks):
+        if self.fail_after is not None and self.batches >= self.fail_after:
+            raise RuntimeError("simulated embedding API failure")
+        self.batches += 1
+        self.embedded += len(chunks)
+        return super().generate_embeddings(chunks)
+
+def check_job(n, batch_size, fail_after):
+    job_dir = tempfile.mkdtemp()
+    chunks = make_chunks(n)
+    for chunk in chunks:
+        chunk['id'] = str(chunk['id'])
+    flaky = FlakyEmbedder(fail_after=fail_after)
+    try:
+        EmbeddingJob(job_dir, flaky, batch_size=batch_size, verbose=False).embed([dict(c) for c in chunks], total=n)
+        raise AssertionError("expected the simulated failure")
+    except RuntimeError:
+        pass
+    manifest = read_manifest(job_dir)
+    assert manifest["status"] == "interrupted" and len(manifest["batches"]) == fail_after, manifest
+    print(f"After failure: {format_progress(manifest)}")
+
+    resumed = FlakyEmbedder()
+    result = EmbeddingJob(job_dir, resumed, batch_size=batch_size, verbose=False).embed([dict(c) for c in chunks],
+                                                                                        total=n)
+    assert resumed.embedded == n - fail_after * batch_size, resumed.embedded
+    expected = HashEmbedder().generate_embeddings([dict(c) for c in chunks])
+    assert np.allclose([c['embedding'] for c in result], [c['embedding'] for c in expected], atol=1e-6)
+    print(f"After resume:  {format_progress(read_manifest(job_dir))}; re-embedded {resumed.embedded} of {n}")
+
+    # A changed text must not reuse its stale vector
+    chunks[0]['text'] += " edited"
+    edited = FlakyEmbedder()
+    EmbeddingJob(job_dir, edited, batch_size=batch_size, verbose=False).embed([dict(c) for c in chunks])
+    assert edited.embedded == 1, edited.embedded
+
+def check_ingest(messages, fail_after):
+    workdir = tempfile.mkdtemp()
+    db_path = os.path.join(workdir, "chat.db")
+    contact = generate(db_path, contacts=1, messages=messages, days=365)[0]
+    store = ChromaVectorStore(collection_name="jobs_test", persist_dir=workdir, lexical=False)
+    job_dir = job_dir_for(store, contact)
+    kwargs = dict(db_path=db_path, strategy="timeandfixed", chunk_size=20, page_size=1000, embed_batch=32,
+                  job_dir=job_dir)
+    try:
+        ingest_contact_paged(contact, store, FlakyEmbedder(fail_after=fail_after), **kwargs)
+        raise AssertionError("expected the simulated failure")
+    except RuntimeError:
+        pass
+    print(f"Ingest after failure: {format_progress(read_manifest(job_dir))}")
+
+    resumed = FlakyEmbedder()
+    result = ingest_contact_paged(contact, store, resumed, **kwargs)
+    manifest = read_manifest(job_dir)
+    assert manifest["status"] == "complete" and not manifest["batches"], manifest
+    assert not [name for name in os.listdir(job_dir) if name.endswith(".npy")]
+    assert resumed.embedded == result["chunks"] - fail_after * 32, (resumed.embedded, result["chunks"])
+    assert store.collection.count() == result["chunks"]
+    print(f"Ingest resumed: {result['chunks']} chunks stored, {resumed.embedded} embedded on the second run")
+
+def main():
+    parser = argparse.ArgumentParser(description="Crash and resume checkpointed embedding jobs.")
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--fail-after", type=int, default=3, help="Batches embedded before the simulated failure")
+    args = parser.parse_args()
+    check_job(1000, batch_size=64, fail_after=args.fail_after)
+    check_ingest(args.messages, args.fail_after)
+    print("OK")
+
+if __name__ == "__main__":
+    main()
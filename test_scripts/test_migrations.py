@@ -0,0 +1,48 @@
+# Check that migration checkpoints belong to their store: migrating one persist dir must not
+# mark a same-named collection in another persist dir as already migrated, and a re-run on
+# the first store is skipped as completed.
+# Usage: python -m imessage_insight.test_scripts.test_migrations [--chunks 300]
+
+import argparse
+import os
+import tempfile
+from imessage_insight.migrations import MigrationRunner
+from imessage_insight.vector_store import ChromaVectorStore
+from imessage_insight.test_scripts.fakes import HashEmbedder, make_chunks
+
+def legacy_store(persist_dir, n, embedder):
+    """
+    A store whose chunks lack end_date_ts, as written before time-range retrieval existed.
+    """
+    store = ChromaVectorStore(collection_name="imessage_chunks", persist_dir=persist_dir, lexical=False)
+    chunks = embedder.generate_embeddings(make_chunks(n))
+    store.add_chunks(chunks)
+    page = store.collection.get(include=["metadatas"])
+    metadatas = [{k: v for k, v in meta.items() if k != "end_date_ts"} for meta in page["metadatas"]]
+    store.collection.delete(ids=page["ids"])
+    store.collection.add(ids=page["ids"], metadatas=metadatas, embeddings=[c['embedding'] for c in chunks],
+                         documents=[c['text'] for c in chunks])
+    return store
+
+def main():
+    parser = argparse.ArgumentParser(description="Migration checkpoints are scoped to the store's persist dir.")
+    parser.add_argument("--chunks", type=int, default=300)
+    args = parser.parse_args()
+    embedder = HashEmbedder()
+    first = legacy_store(tempfile.mkdtemp(), args.chunks, embedder)
+    second = legacy_store(tempfile.mkdtemp(), args.chunks, embedder)
+
+    result = MigrationRunner(first, "end_date_ts", batch_size=100).run()
+    assert result["completed"] and result["updated"] == args.chunks, result
+    assert os.path.exists(os.path.join(first.persist_dir, "migration_checkpoints", "imessage_chunks__end_date_ts.json"))
+    result = MigrationRunner(second, "end_date_ts", batch_size=100).run()
+    assert result["updated"] == args.chunks, f"second store skipped: {result}"
+    metas = second.collection.get(include=["metadatas"])["metadatas"]
+    assert all("end_date_ts" in meta for meta in metas)
+    version = first.version
+    MigrationRunner(first, "end_date_ts").run()
+    assert first.version == version, "a completed migration must not write again"
+    print(f"OK: both stores migrated ({args.chunks} chunks each), checkpoints kept per persist dir")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+# Stream answers from RAGPipeline against the local OpenAI-compatible stub and report
+# time-to-first-token vs total latency. Runs fully offline.
+# Usage: python -m imessage_insight.test_scripts.test_streaming
+
+import tempfile
+from imessage_insight.rag import RAGPipeline
+from imessage_insight.test_scripts import openai_stub_server
+from imessage_insight.test_scripts.fakes import HashEmbedder, make_chunks
+
+QUESTIONS = ["Where did we get coffee?", "What birthday gift ideas came up?", "When is the concert?"]
+
+def main():
+    server, base_url = openai_stub_server.start(first_token_ms=300, token_ms=20)
+    embedder = HashEmbedder()
+    with tempfile.TemporaryDirectory() as tmp:
+        rag = RAGPipeline(collection_name="stream_test", persist_dir=tmp, embedder=embedder, llm_base_url=base_url)
+        rag.vector_store.add_chunks(embedder.generate_embeddings(make_chunks(200)))
+        for question in QUESTIONS:
+            result = rag.stream_answer(question, top_k=3)
+            print(f"\nQ: {question}\nA: ", end="")
+            for token in result:
+                print(token, end="", flush=True)
+            timings = result.timings
+            print(f"\n   retrieval {timings['retrieval'] * 1000:.0f} ms, first token {timings['ttft'] * 1000:.0f} ms, "
+                  f"total {timings['total'] * 1000:.0f} ms")
+            assert timings['ttft'] < timings['total'], "first token should arrive before the stream ends"
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+# Regression check for the in-memory timestamp index: adding chunks whose ids are already
+# stored (a plain re-ingest without upsert) must not index them twice, or date-filtered
+# queries fetch duplicate ids from Chroma and fail.
+# Usage: python -m imessage_insight.test_scripts.test_timestamp_index [--chunks 50]
+
+import argparse
+import tempfile
+from imessage_insight.vector_store import ChromaVectorStore
+from imessage_insight.test_scripts.fakes import HashEmbedder, make_chunks
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-adding existing chunk ids keeps the timestamp index consistent.")
+    parser.add_argument("--chunks", type=int, default=50)
+    args = parser.parse_args()
+
+    embedder = HashEmbedder()
+    store = ChromaVectorStore(collection_name="timestamp_index_test", persist_dir=tempfile.mkdtemp(), lexical=False)
+    chunks = embedder.generate_embeddings(make_chunks(args.chunks))
+    query_embedding = embedder.embed_query("birthday gift ideas")
+    start, end = "2023-01-01", "2023-01-02"
+
+    store.add_chunks(chunks)
+    before = store.query(query_embedding, top_k=5, start=start, end=end)  # builds the index
+    store.add_chunks(chunks)
+    assert store.collection.count() == args.chunks, store.collection.count()
+    assert len(store.timestamp_index) == args.chunks, len(store.timestamp_index)
+    after = store.query(query_embedding, top_k=5, start=start, end=end)
+    assert [r["id"] for r in after] == [r["id"] for r in before], (before, after)
+    print(f"OK: {len(store.timestamp_index)} indexed chunks after adding {args.chunks} ids twice")
+
+if __name__ == "__main__":
+    main()
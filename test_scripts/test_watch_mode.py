@@ -0,0 +1,59 @@
+# Exercise watch mode against a synthetic chat.db: start the watcher in a thread, append
+# bursts of rows the way Messages does, and check that only new rows get indexed and how
+# long it takes for them to become searchable.
+# Usage: python -m imessage_insight.test_scripts.test_watch_mode [--bursts 5] [--burst-size 20]
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from imessage_insight.vector_store import ChromaVectorStore
+from imessage_insight.watcher import ChatDBWatcher
+from imessage_insight.test_scripts.fakes import HashEmbedder
+from imessage_insight.test_scripts.synthetic_chat_db import append_messages, generate
+
+def main():
+    parser = argparse.ArgumentParser(description="Watch mode against a synthetic chat.db.")
+    parser.add_argument("--bursts", type=int, default=5)
+    parser.add_argument("--burst-size", type=int, default=20)
+    parser.add_argument("--debounce", type=float, default=0.5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    db_path = os.path.join(workdir, "chat.db")
+    contact = generate(db_path, contacts=1, messages=args.burst_size, days=1)[0]
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+
+    store = ChromaVectorStore(collection_name="watch_test", persist_dir=workdir, lexical=False)
+    watcher = ChatDBWatcher(contact, store, HashEmbedder(), db_path=db_path, strategy='fixed',
+                            chunk_size=8, debounce=args.debounce, poll_interval=0.05)
+    thread = threading.Thread(target=watcher.run, daemon=True)
+    thread.start()
+    time.sleep(0.5)
+    print(f"Initial backfill: {watcher.metrics['rows_indexed']} rows, {store.collection.count()} chunks")
+
+    lags = []
+    for burst in range(1, args.bursts + 1):
+        batches = watcher.metrics["batches"]
+        append_messages(conn, contact, args.burst_size, seed=burst)
+        deadline = time.time() + 10 * args.debounce + 5
+        while watcher.metrics["batches"] == batches and time.time() < deadline:
+            time.sleep(0.02)
+        lags.append(watcher.metrics["last_detect_to_index_seconds"])
+        print(f"Burst {burst}: {watcher.metrics['rows_indexed']} rows indexed, {store.collection.count()} chunks, "
+              f"detect->index {lags[-1]:.2f}s, lag {watcher.metrics['last_lag_seconds']:.2f}s")
+    watcher.stop()
+    thread.join()
+
+    total = (args.bursts + 1) * args.burst_size
+    expected_chunks = -(-total // 8)
+    assert watcher.metrics["rows_indexed"] == total, watcher.metrics
+    assert store.collection.count() == expected_chunks, (store.collection.count(), expected_chunks)
+    print(f"OK: {total} rows in {expected_chunks} chunks, no duplicates. "
+          f"Mean detect->index {sum(lags) / len(lags):.2f}s (debounce {args.debounce}s)")
+
+if __name__ == "__main__":
+    main()
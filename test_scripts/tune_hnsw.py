@@ -0,0 +1,110 @@
+# Compare HNSW index settings against exact brute-force search.
+# Copies the embeddings of an existing collection into temporary collections, one per setting,
+# and reports recall@k and p50/p99 query latency for each.
+# Usage: python -m imessage_insight.test_scripts.tune_hnsw [--collection imessage_chunks] [--questions questions.txt]
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+from imessage_insight.vector_store import ChromaVectorStore
+
+CHROMA_DIR = "imessage_insight/chromadb_data"
+
+# (M, construction_ef, search_ef) settings to compare; Chroma's defaults are (16, 100, 10)
+SETTINGS = [
+    (16, 100, 10),
+    (16, 100, 50),
+    (16, 200, 100),
+    (32, 200, 100),
+    (32, 400, 200),
+]
+
+def load_vectors(store, page_size=1000):
+    """
+    Page all ids and embeddings out of a collection.
+    """
+    ids, vectors = [], []
+    offset = 0
+    while True:
+        page = store.collection.get(include=["embeddings"], limit=page_size, offset=offset)
+        if not page["ids"]:
+            break
+        ids.extend(page["ids"])
+        vectors.extend(page["embeddings"])
+        offset += len(page["ids"])
+    return ids, np.asarray(vectors, dtype=np.float32)
+
+def load_queries(args, vectors):
+    """
+    Embed questions from a file (one per line) or, if none is given, sample stored vectors as queries.
+    """
+    if args.questions:
+        from imessage_insight.embedding import MessageEmbedder
+        with open(args.questions) as f:
+            questions = [line.strip() for line in f if line.strip()]
+        embedder = MessageEmbedder(backend=args.backend)
+        return np.asarray([embedder.embed_query(q) for q in questions], dtype=np.float32)
+    rng = np.random.default_rng(0)
+    picks = rng.choice(len(vectors), size=min(args.num_queries, len(vectors)), replace=False)
+    return vectors[picks]
+
+def main():
+    parser = argparse.ArgumentParser(description="HNSW recall/latency tuning harness.")
+    parser.add_argument("--collection", default="imessage_chunks")
+    parser.add_argument("--persist-dir", default=CHROMA_DIR)
+    parser.add_argument("--space", choices=["l2", "cosine", "ip"], default="l2")
+    parser.add_argument("--questions", help="Text file with one question per line")
+    parser.add_argument("--backend", default="sentence_transformers", help="Embedding backend for --questions")
+    parser.add_argument("--num-queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    # Never create the source: a wrong --persist-dir or --collection must fail, not tune against nothing
+    if not os.path.isdir(args.persist_dir):
+        sys.exit(f"Persist dir '{args.persist_dir}' does not exist")
+    try:
+        source = ChromaVectorStore(collection_name=args.collection, persist_dir=args.persist_dir, create=False)
+    except ValueError as e:
+        sys.exit(str(e))
+    if source.collection.count() == 0:
+        sys.exit(f"Collection '{args.collection}' in '{args.persist_dir}' is empty")
+    ids, vectors = load_vectors(source)
+    queries = load_queries(args, vectors)
+    k = min(args.top_k, len(ids))
+    print(f"{len(ids)} vectors, {len(queries)} queries, recall@{k}, space={args.space}\n")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        rows = []
+        for m, construction_ef, search_ef in SETTINGS:
+            store = ChromaVectorStore(
+                collection_name=f"tune_{m}_{construction_ef}_{search_ef}",
+                persist_dir=os.path.join(tmp, "db"),
+                space=args.space, hnsw_m=m, construction_ef=construction_ef, search_ef=search_ef
+            )
+            build_start = time.perf_counter()
+            for i in range(0, len(ids), 5000):
+                store.collection.add(ids=ids[i:i+5000], embeddings=vectors[i:i+5000].tolist())
+            build_s = time.perf_counter() - build_start
+
+            latencies, hits = [], 0
+            for q in queries:
+                # Exact top-k with the same distance function
+                exact = np.argsort(store._distances(q, vectors))[:k]
+                exact_ids = {ids[i] for i in exact}
+                start = time.perf_counter()
+                result = store.collection.query(query_embeddings=[q.tolist()], n_results=k, include=[])
+                latencies.append((time.perf_counter() - start) * 1000)
+                hits += len(exact_ids.intersection(result["ids"][0]))
+            recall = hits / (k * len(queries))
+            rows.append((m, construction_ef, search_ef, recall, np.percentile(latencies, 50), np.percentile(latencies, 99), build_s))
+
+    print(f"{'M':>4} {'constr_ef':>10} {'search_ef':>10} {'recall@' + str(k):>10} {'p50 ms':>8} {'p99 ms':>8} {'build s':>8}")
+    print('-' * 64)
+    for m, construction_ef, search_ef, recall, p50, p99, build_s in rows:
+        print(f"{m:>4} {construction_ef:>10} {search_ef:>10} {recall:>10.3f} {p50:>8.2f} {p99:>8.2f} {build_s:>8.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 import re
 from imessage_reader import fetch_data
 from imessage_insight.message_preprocessor import MessagePreprocessor
+from imessage_insight import instrumentation
 import os
 
 # --- Phone Number Normalization ---
@@ -19,7 +20,9 @@ def get_processed_messages_for_contact(contact):
     """
     DB_PATH = os.path.expanduser('~/Library/Messages/chat.db')
     fd = fetch_data.FetchData(DB_PATH)
-    all_messages = fd.get_messages()
+    with instrumentation.span("fetch_messages"):
+        all_messages = fd.get_messages()
+    instrumentation.counter("messages_fetched_total", len(all_messages))
     norm_contact = normalize(contact)
 
     # Filter messages for this contact
@@ -1,16 +1,157 @@
+import bisect
+import os
 import chromadb
 import numpy as np  # For type checking
-from datetime import datetime
+from datetime import datetime, date
+from imessage_insight import instrumentation, snapshot
+from imessage_insight.file_locks import exclusive_lock
+from imessage_insight.lexical_index import BM25Index
+
+# Above this many in-range candidates, filtered queries go through Chroma's `where` search
+# instead of brute-force scoring the candidates fetched via the timestamp index.
+PREFILTER_MAX_CANDIDATES = 2000
+
+DISTANCE_SPACES = ("l2", "cosine", "ip")
+
+def to_timestamp(value):
+    """
+    Convert a datetime, date, ISO date string, or number to a POSIX timestamp (float).
+    Returns None for empty or unparseable values.
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day).timestamp()
+    try:
+        return datetime.fromisoformat(str(value)).timestamp()
+    except ValueError:
+        return None
+
+def to_end_timestamp(value):
+    """
+    Like to_timestamp, for the end of a range: a bare date (a date object or a 'YYYY-MM-DD'
+    string) covers that whole day instead of stopping at its midnight.
+    """
+    if isinstance(value, date) and not isinstance(value, datetime):
+        return datetime(value.year, value.month, value.day, 23, 59, 59, 999999).timestamp()
+    if isinstance(value, str) and len(value.strip()) == 10:
+        ts = to_timestamp(value.strip())
+        return None if ts is None else ts + 86400 - 1e-6
+    return to_timestamp(value)
+
+class TimestampIndex:
+    """
+    Sorted in-memory index of chunk start/end timestamps.
+    Lets time-range queries find in-range chunk ids with a binary search
+    instead of scanning the whole collection.
+    """
+    def __init__(self):
+        self.starts = []
+        self.entries = []  # (id, end_ts, contact), parallel to self.starts
+        self.max_span = 0.0
+        self._ids = set()
+
+    @classmethod
+    def from_collection(cls, collection, page_size=1000):
+        """
+        Build the index by paging through a collection's metadata.
+        """
+        index = cls()
+        offset = 0
+        while True:
+            page = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+            if not page["ids"]:
+                break
+            index.add(page["ids"], page["metadatas"])
+            offset += len(page["ids"])
+        return index
+
+    def add(self, ids, metadatas):
+        """
+        Insert chunk ids with their metadata, keeping the index sorted by start_date_ts.
+        Chunks without a start_date_ts are not indexed (they can never match a range).
+        Ids already indexed are skipped, like Chroma's add() skips ids it already stores.
+        """
+        for doc_id, meta in zip(ids, metadatas):
+            if doc_id in self._ids:
+                continue
+            start_ts = (meta or {}).get("start_date_ts")
+            if not isinstance(start_ts, (int, float)):
+                continue
+            end_ts = meta.get("end_date_ts")
+            if not isinstance(end_ts, (int, float)):
+                end_ts = start_ts
+            pos = bisect.bisect_right(self.starts, start_ts)
+            self.starts.insert(pos, start_ts)
+            self.entries.insert(pos, (doc_id, end_ts, meta.get("contact")))
+            self._ids.add(doc_id)
+            self.max_span = max(self.max_span, end_ts - start_ts)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def ids_in_range(self, start_ts=None, end_ts=None, sender=None):
+        """
+        Return ids of chunks overlapping [start_ts, end_ts] (either bound may be None).
+        Optionally restrict to chunks whose 'contact' metadata equals `sender`.
+        """
+        lo = 0 if start_ts is None else bisect.bisect_left(self.starts, start_ts - self.max_span)
+        hi = len(self.starts) if end_ts is None else bisect.bisect_right(self.starts, end_ts)
+        ids = []
+        for doc_id, chunk_end, contact in self.entries[lo:hi]:
+            if start_ts is not None and chunk_end < start_ts:
+                continue
+            if sender is not None and contact != sender:
+                continue
+            ids.append(doc_id)
+        return ids
 
 class ChromaVectorStore:
     """
     Handles storage and retrieval of message chunk embeddings using ChromaDB.
     Uses PersistentClient for on-disk persistence (see ChromaDB docs).
     """
-    def __init__(self, collection_name="imessage_chunks", persist_dir="imessage_insight/chromadb_data"):
+    def __init__(self, collection_name="imessage_chunks", persist_dir="imessage_insight/chromadb_data",
+                 space=None, hnsw_m=None, construction_ef=None, search_ef=None, lexical=True, create=True):
+        """
+        Open (or create) a collection. The optional HNSW settings map to Chroma's collection
+        metadata ('hnsw:space', 'hnsw:M', 'hnsw:construction_ef', 'hnsw:search_ef').
+        space is 'l2' (Chroma's default), 'cosine' or 'ip'. Index settings only take effect
+        when the collection is first created; an existing collection keeps its own.
+        lexical keeps a persisted BM25 inverted index (<persist_dir>/<collection>.bm25.json)
+        in sync with add_chunks for hybrid retrieval.
+        With create=False a missing collection raises ValueError instead of being created empty.
+        """
         # Use PersistentClient for on-disk persistence
+        os.makedirs(persist_dir, exist_ok=True)  # Sidecar files (version, BM25) may be written before Chroma creates it
+        self.persist_dir = persist_dir
         self.client = chromadb.PersistentClient(path=persist_dir)
-        self.collection = self.client.get_or_create_collection(collection_name)
+        index_settings = {
+            key: value for key, value in (
+                ("hnsw:space", space),
+                ("hnsw:M", hnsw_m),
+                ("hnsw:construction_ef", construction_ef),
+                ("hnsw:search_ef", search_ef),
+            ) if value is not None
+        }
+        if space is not None and space not in DISTANCE_SPACES:
+            raise ValueError(f"Unknown distance space: {space}")
+        if create:
+            self.collection = self.client.get_or_create_collection(collection_name, metadata=index_settings or None)
+        else:
+            try:
+                self.collection = self.client.get_collection(collection_name)
+            except ValueError:
+                raise ValueError(f"Collection '{collection_name}' does not exist in {persist_dir}")
+        self._timestamp_index = None  # Built lazily on the first time-filtered query
+        self.lexical = lexical
+        self._lexical_index = None  # Loaded (or built) lazily on first use
+        self._lexical_path = os.path.join(persist_dir, f"{collection_name}.bm25.json")
+        self._version_path = os.path.join(persist_dir, f"{collection_name}.version")
 
     def _ensure_list(self, embedding):
         """
@@ -20,76 +161,396 @@ class ChromaVectorStore:
             return embedding.tolist()
         return embedding
 
-    def _ensure_start_date_ts(self, meta):
+    def _ensure_date_ts(self, meta, field):
         """
-        Ensure 'start_date_ts' is present and correct in metadata.
-        If 'start_date' is present, compute its timestamp and add as 'start_date_ts'.
+        Ensure '<field>_ts' is present and correct in metadata.
+        If `field` (e.g. 'start_date') is present, compute its timestamp and add it as a float.
         """
-        start_date = meta.get("start_date")
-        if start_date:
-            try:
-                ts = datetime.fromisoformat(start_date).timestamp()
-                old_ts = meta.get("start_date_ts")
-                # Fix type if string
-                if isinstance(old_ts, str):
-                    try:
-                        old_ts_float = float(old_ts)
-                        if old_ts_float == ts:
-                            meta = dict(meta)
-                            meta["start_date_ts"] = ts
-                            return meta
-                    except Exception:
-                        pass
-                if old_ts != ts:
-                    meta = dict(meta)
-                    meta["start_date_ts"] = ts
-            except Exception:
-                pass
+        ts = to_timestamp(meta.get(field))
+        if ts is not None and meta.get(f"{field}_ts") != ts:
+            meta = dict(meta)
+            meta[f"{field}_ts"] = ts
         return meta
 
-    def add_chunks(self, chunks):
+    def _ensure_start_date_ts(self, meta):
+        """
+        Ensure 'start_date_ts' and 'end_date_ts' are present and correct in metadata.
+        """
+        meta = self._ensure_date_ts(meta, "start_date")
+        return self._ensure_date_ts(meta, "end_date")
+
+    @property
+    def version(self):
+        """
+        Write version of the collection, bumped on every write and persisted next to
+        the Chroma data so caches in other processes can detect changes too.
+        """
+        try:
+            with open(self._version_path) as f:
+                return int(f.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def _bump_version(self):
+        """
+        Increment the persisted write version. The read-modify-write holds a lock file so
+        concurrent writers (e.g. the daemon and a watcher) never both write the same version.
+        """
+        with exclusive_lock(self._version_path + ".lock"):
+            version = self.version + 1
+            tmp_path = self._version_path + ".tmp"
+            with open(tmp_path, "w") as f:
+                f.write(str(version))
+            os.replace(tmp_path, self._version_path)
+        return version
+
+    @property
+    def timestamp_index(self):
+        """
+        Sorted start/end timestamp index over the collection, built on first use.
+        """
+        if self._timestamp_index is None:
+            self._timestamp_index = TimestampIndex.from_collection(self.collection)
+        return self._timestamp_index
+
+    @property
+    def lexical_index(self):
+        """
+        BM25 index over the collection's documents. Loaded from disk on first use,
+        or built from the collection (and saved) if no index file exists yet.
+        """
+        if self._lexical_index is None:
+            exists = os.path.exists(self._lexical_path) or os.path.exists(self._lexical_path + ".log")
+            self._lexical_index = BM25Index(self._lexical_path)
+            if not exists and self.collection.count() > 0:
+                offset = 0
+                while True:
+                    page = self.collection.get(include=["documents"], limit=1000, offset=offset)
+                    if not page["ids"]:
+                        break
+                    self._lexical_index.add(page["ids"], page["documents"])
+                    offset += len(page["ids"])
+                self._lexical_index.compact()
+        return self._lexical_index
+
+    @instrumentation.timed("add_chunks")
+    def add_chunks(self, chunks, upsert=False):
         """
         Add message chunks (with embeddings) to the collection.
         Each chunk must have a unique 'id', 'embedding', and 'metadata'.
+        With upsert=True, chunks whose id already exists are replaced instead of skipped.
         Ensures all embeddings are lists for ChromaDB compatibility.
-        Ensures 'start_date_ts' is present and correct in metadata.
+        Ensures 'start_date_ts' and 'end_date_ts' are present and correct in metadata.
         Automatically persists the client so data is written to disk.
         """
         ids = [str(chunk['id']) for chunk in chunks]
         # Ensure all embeddings are lists
         embeddings = [self._ensure_list(chunk['embedding']) for chunk in chunks]
-        # Ensure all metadatas have start_date_ts
+        # Ensure all metadatas have start_date_ts / end_date_ts
         metadatas = [self._ensure_start_date_ts(chunk['metadata']) for chunk in chunks]
         documents = [chunk['text'] for chunk in chunks]
-        self.collection.add(
+        write = self.collection.upsert if upsert else self.collection.add
+        write(
             ids=ids,
             embeddings=embeddings,
             metadatas=metadatas,
             documents=documents
         )
+        instrumentation.counter("chunks_added_total", len(ids))
+        # Keep the timestamp index in sync if it has already been built
+        if upsert:
+            self._timestamp_index = None  # Replaced entries would leave stale positions; rebuild lazily
+        elif self._timestamp_index is not None:
+            self._timestamp_index.add(ids, metadatas)
+        if self.lexical:
+            self.lexical_index.add(ids, documents)
+            self.lexical_index.save()
+        self._bump_version()
         # Persistence is automatic with PersistentClient
 
-    def query(self, query_embedding, top_k=5):
+    @instrumentation.timed("update_chunks")
+    def update_chunks(self, chunks):
+        """
+        Update existing chunks in place. Each chunk needs an 'id' plus any of 'text',
+        'metadata' and 'embedding'; fields left out keep their stored values (every chunk
+        in one call must carry the same fields). Unknown ids are ignored by Chroma.
+        """
+        if not chunks:
+            return
+        ids = [str(chunk['id']) for chunk in chunks]
+        fields = {}
+        if 'embedding' in chunks[0]:
+            fields['embeddings'] = [self._ensure_list(chunk['embedding']) for chunk in chunks]
+        if 'metadata' in chunks[0]:
+            fields['metadatas'] = [self._ensure_start_date_ts(chunk['metadata']) for chunk in chunks]
+        if 'text' in chunks[0]:
+            fields['documents'] = [chunk['text'] for chunk in chunks]
+        self.collection.update(ids=ids, **fields)
+        if 'metadatas' in fields:
+            self._timestamp_index = None
+        if self.lexical and 'documents' in fields:
+            self.lexical_index.add(ids, fields['documents'])
+            self.lexical_index.save()
+        self._bump_version()
+
+    @instrumentation.timed("delete_chunks")
+    def delete_chunks(self, ids=None, sender=None):
+        """
+        Delete chunks by id, or every chunk of one contact (sender). Returns the number deleted.
+        """
+        if ids is None and sender is None:
+            raise ValueError("delete_chunks needs ids or a sender; refusing to delete the whole collection")
+        if ids is None:
+            ids = self.collection.get(where={"contact": sender}, include=[])["ids"]
+        ids = [str(doc_id) for doc_id in ids]
+        if not ids:
+            return 0
+        self.collection.delete(ids=ids)
+        self._timestamp_index = None
+        if self.lexical:
+            for doc_id in ids:
+                self.lexical_index.remove(doc_id)
+            self.lexical_index.save()
+        self._bump_version()
+        return len(ids)
+
+    def _build_where(self, start_ts=None, end_ts=None, sender=None):
+        """
+        Build a Chroma `where` filter selecting chunks that overlap [start_ts, end_ts]
+        and, if given, belong to `sender`. Returns None when nothing is filtered.
+        """
+        clauses = []
+        if start_ts is not None:
+            # Chunks without an end_date_ts end where they start, as in TimestampIndex
+            clauses.append({"$or": [{"end_date_ts": {"$gte": start_ts}}, {"start_date_ts": {"$gte": start_ts}}]})
+        if end_ts is not None:
+            clauses.append({"start_date_ts": {"$lte": end_ts}})
+        if sender is not None:
+            clauses.append({"contact": sender})
+        if not clauses:
+            return None
+        if len(clauses) == 1:
+            return clauses[0]
+        return {"$and": clauses}
+
+    @property
+    def space(self):
+        """
+        The collection's distance function ('l2', 'cosine' or 'ip').
+        """
+        return (self.collection.metadata or {}).get("hnsw:space", "l2")
+
+    def _distance_to_score(self, distance):
+        """
+        Convert a Chroma distance to a similarity score (higher is better).
+        For cosine and ip this is 1 - distance (cosine similarity / dot product).
+        For squared L2 on unit-length embeddings (MiniLM and ada are normalized),
+        1 - d/2 recovers cosine similarity, so scores are comparable across spaces.
+        """
+        if self.space == "l2":
+            return 1 - distance / 2
+        return 1 - distance
+
+    def _distances(self, query_embedding, embeddings):
+        """
+        Exact distances from the query to each embedding, using the collection's
+        distance function so scores match Chroma's own results.
+        """
+        space = self.space
+        q = np.asarray(query_embedding, dtype=np.float32)
+        m = np.asarray(embeddings, dtype=np.float32)
+        if space == "cosine":
+            norms = np.linalg.norm(m, axis=1) * np.linalg.norm(q)
+            return 1.0 - (m @ q) / np.maximum(norms, 1e-12)
+        if space == "ip":
+            return 1.0 - m @ q
+        diff = m - q
+        return np.einsum("ij,ij->i", diff, diff)  # Chroma's l2 is squared L2
+
+    def _query_candidates(self, query_embedding, candidate_ids, top_k):
+        """
+        Brute-force search restricted to `candidate_ids`.
+        Used for narrow time windows, where scoring the in-range chunks directly
+        is cheaper than a filtered HNSW search over the whole collection.
+        """
+        if not candidate_ids:
+            return []
+        got = self.collection.get(ids=candidate_ids, include=["documents", "metadatas", "embeddings"])
+        return self._score_candidates(query_embedding, got, top_k)
+
+    def _score_candidates(self, query_embedding, got, top_k):
+        """
+        Rank already-fetched candidates (a collection.get result) by exact distance to the query.
+        """
+        if not got["ids"]:
+            return []
+        distances = self._distances(query_embedding, got["embeddings"])
+        k = min(top_k, len(distances))
+        best = np.argpartition(distances, k - 1)[:k]
+        best = best[np.argsort(distances[best])]
+        return [
+            {
+                "id": got["ids"][i],
+                "text": got["documents"][i],
+                "metadata": got["metadatas"][i],
+                "score": self._distance_to_score(float(distances[i])),
+                "embedding": got["embeddings"][i]
+            }
+            for i in best
+        ]
+
+    @instrumentation.timed("vector_search")
+    def query(self, query_embedding, top_k=5, start=None, end=None, sender=None,
+              prefilter_max=PREFILTER_MAX_CANDIDATES):
         """
         Query the collection for the top_k most similar chunks to the query_embedding.
+        Optionally restrict results to chunks overlapping the [start, end] time range
+        (datetimes, ISO strings, or timestamps) and/or to a given sender ('contact' metadata).
+        Narrow time windows with at most `prefilter_max` candidates are searched exactly
+        via the sorted timestamp index; wider ones use a Chroma `where` filter.
         Ensures the query embedding is a list for ChromaDB compatibility.
-        Returns a list of dicts with text, metadata, score, and embedding.
+        Returns a list of dicts with id, text, metadata, score, and embedding.
         """
         query_embedding = self._ensure_list(query_embedding)
+        start_ts, end_ts = to_timestamp(start), to_end_timestamp(end)
+        if start_ts is not None or end_ts is not None:
+            candidates = self.timestamp_index.ids_in_range(start_ts, end_ts, sender=sender)
+            if len(candidates) <= prefilter_max:
+                return self._query_candidates(query_embedding, candidates, top_k)
+        where = self._build_where(start_ts, end_ts, sender)
+        query_kwargs = {"where": where} if where else {}
         results = self.collection.query(
             query_embeddings=[query_embedding],
             n_results=top_k,
-            include=["documents", "metadatas", "distances", "embeddings"]  # Include embeddings
+            include=["documents", "metadatas", "distances", "embeddings"],  # Include embeddings
+            **query_kwargs
         )
         # Format results for easy use, including embedding
         return [
             {
+                "id": doc_id,
                 "text": doc,
                 "metadata": meta,
-                "score": 1 - dist,  # Chroma returns distance; convert to similarity
+                "score": self._distance_to_score(dist),  # Chroma returns distance; convert to similarity
                 "embedding": emb
             }
-            for doc, meta, dist, emb in zip(
-                results["documents"][0], results["metadatas"][0], results["distances"][0], results["embeddings"][0]
+            for doc_id, doc, meta, dist, emb in zip(
+                results["ids"][0], results["documents"][0], results["metadatas"][0],
+                results["distances"][0], results["embeddings"][0]
             )
-        ] 
\ No newline at end of file
+        ]
+
+    @instrumentation.timed("vector_search_batch")
+    def query_batch(self, query_embeddings, top_k=5, start=None, end=None, sender=None,
+                    prefilter_max=PREFILTER_MAX_CANDIDATES):
+        """
+        Run several queries with the same filters. Unfiltered and wide-window searches go to
+        Chroma as a single multi-embedding query; narrow windows reuse one candidate fetch.
+        Returns one result list (as from query()) per query embedding.
+        """
+        query_embeddings = [self._ensure_list(emb) for emb in query_embeddings]
+        if not query_embeddings:
+            return []
+        start_ts, end_ts = to_timestamp(start), to_end_timestamp(end)
+        if start_ts is not None or end_ts is not None:
+            candidates = self.timestamp_index.ids_in_range(start_ts, end_ts, sender=sender)
+            if len(candidates) <= prefilter_max:
+                if not candidates:
+                    return [[] for _ in query_embeddings]
+                got = self.collection.get(ids=candidates, include=["documents", "metadatas", "embeddings"])
+                return [self._score_candidates(emb, got, top_k) for emb in query_embeddings]
+        where = self._build_where(start_ts, end_ts, sender)
+        query_kwargs = {"where": where} if where else {}
+        results = self.collection.query(
+            query_embeddings=query_embeddings,
+            n_results=top_k,
+            include=["documents", "metadatas", "distances", "embeddings"],
+            **query_kwargs
+        )
+        return [
+            [
+                {
+                    "id": doc_id,
+                    "text": doc,
+                    "metadata": meta,
+                    "score": self._distance_to_score(dist),
+                    "embedding": emb
+                }
+                for doc_id, doc, meta, dist, emb in zip(ids, docs, metas, dists, embs)
+            ]
+            for ids, docs, metas, dists, embs in zip(
+                results["ids"], results["documents"], results["metadatas"], results["distances"], results["embeddings"]
+            )
+        ]
+
+    def export_snapshot(self, bundle_dir, embedder=None, compress=False):
+        """
+        Export ids, documents, metadata and embeddings to a columnar snapshot bundle
+        (data.npz + manifest.json). Pass the embedder that built the collection so the
+        manifest records its model name and dimension. Returns the manifest dict.
+        """
+        return snapshot.export_collection(
+            self.collection,
+            bundle_dir,
+            model_name=getattr(embedder, "model_name", None),
+            backend=getattr(embedder, "backend", None),
+            compress=compress
+        )
+
+    def import_snapshot(self, bundle_dir, embedder=None, batch_size=5000):
+        """
+        Bulk-load a snapshot bundle into this collection without re-embedding anything.
+        If an embedder is given, the bundle is validated against its model and get_dimension()
+        first, so queries embedded later are compatible with the stored vectors.
+        An empty collection is recreated with the exported collection's metadata (distance
+        space and HNSW settings); a non-empty one with different settings raises ValueError.
+        Returns the number of chunks imported.
+        """
+        manifest = snapshot.load_manifest(bundle_dir)
+        if embedder is not None:
+            snapshot.validate_manifest(manifest, embedder)
+        saved = manifest.get("collection_metadata") or {}
+        current = self.collection.metadata or {}
+        if {k: v for k, v in saved.items() if k.startswith("hnsw:")} != \
+                {k: v for k, v in current.items() if k.startswith("hnsw:")}:
+            if self.collection.count():
+                raise ValueError(f"Collection '{self.collection.name}' has index settings {current}, but the "
+                                 f"snapshot was exported with {saved}; import into a new collection")
+            name = self.collection.name
+            self.client.delete_collection(name)
+            self.collection = self.client.create_collection(name, metadata=saved or None)
+            self._timestamp_index = None
+        imported = 0
+        for chunks in snapshot.iter_bundle_chunks(bundle_dir, batch_size=batch_size):
+            self.add_chunks(chunks)
+            imported += len(chunks)
+        return imported
+
+    @instrumentation.timed("lexical_search")
+    def lexical_query(self, query, top_k=5, start=None, end=None, sender=None):
+        """
+        Keyword (BM25) search over the collection, with the same optional time-range
+        and sender filters as query(). Returns result dicts in the same format as query(),
+        with the BM25 score as 'score'.
+        """
+        start_ts, end_ts = to_timestamp(start), to_end_timestamp(end)
+        allowed_ids = None
+        if start_ts is not None or end_ts is not None or sender is not None:
+            allowed_ids = set(self.timestamp_index.ids_in_range(start_ts, end_ts, sender=sender))
+        index = self.lexical_index
+        index.refresh()  # Writes by other processes (e.g. a watcher next to the daemon)
+        hits = index.search(query, top_k=top_k, allowed_ids=allowed_ids)
+        if not hits:
+            return []
+        got = self.collection.get(ids=[doc_id for doc_id, _ in hits], include=["documents", "metadatas", "embeddings"])
+        position = {doc_id: i for i, doc_id in enumerate(got["ids"])}
+        return [
+            {
+                "id": doc_id,
+                "text": got["documents"][position[doc_id]],
+                "metadata": got["metadatas"][position[doc_id]],
+                "score": score,
+                "embedding": got["embeddings"][position[doc_id]]
+            }
+            for doc_id, score in hits if doc_id in position
+        ]
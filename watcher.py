@@ -0,0 +1,144 @@
+import json
+import os
+import time
+from imessage_insight import chat_db, instrumentation
+from imessage_insight.chunking import chunk_messages
+from imessage_insight.ingest import assign_rowid_ids
+from imessage_insight.message_preprocessor import MessagePreprocessor
+from imessage_insight.utils import normalize
+
+class ChatDBWatcher:
+    """
+    Near-real-time incremental indexing of one contact's messages.
+    Polls chat.db and chat.db-wal for changes, waits for a burst of writes to settle
+    (debounce), then fetches only rows past the last indexed ROWID, chunks, embeds and
+    upserts them. The most recent chunk is re-chunked together with new rows, so a
+    conversation that continues it extends that chunk (same id) instead of starting a new one.
+    Progress (last ROWID, start of the open tail chunk) is persisted to a small state file.
+    With a SummaryBuilder, the contact's summaries are brought up to date after each batch
+    (only the day, week and month the new messages fall in are re-summarized).
+    """
+    def __init__(self, contact, store, embedder, db_path=chat_db.DEFAULT_DB_PATH, strategy='time',
+                 chunk_size=10, hours_gap=1.0, debounce=2.0, poll_interval=0.5, state_path=None,
+                 summary_builder=None):
+        self.contact = normalize(contact)
+        self.raw_contact = contact
+        self.store = store
+        self.embedder = embedder
+        self.db_path = db_path
+        self.strategy = strategy
+        self.chunk_size = chunk_size
+        self.hours_gap = hours_gap
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.summary_builder = summary_builder
+        self.state_path = state_path or os.path.join(
+            os.path.dirname(store._version_path), f"{store.collection.name}.watch.{self.contact}.json"
+        )
+        self.state = self._load_state()
+        self.preprocessor = MessagePreprocessor()
+        self.metrics = {
+            "batches": 0,
+            "rows_indexed": 0,
+            "last_lag_seconds": None,       # newest indexed message's send time -> searchable
+            "last_detect_to_index_seconds": None,  # file change noticed -> searchable
+            "last_batch_seconds": None
+        }
+        self._stop = False
+
+    def _load_state(self):
+        if os.path.exists(self.state_path):
+            with open(self.state_path) as f:
+                return json.load(f)
+        return {"last_rowid": 0, "tail_rowid": None}
+
+    def _save_state(self):
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, self.state_path)
+
+    def _signature(self):
+        """
+        (mtime, size) of chat.db and its WAL; Messages usually only touches the WAL.
+        """
+        signature = []
+        for path in (self.db_path, self.db_path + "-wal"):
+            try:
+                st = os.stat(path)
+                signature.append((st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+
+    def index_new(self, detected_at=None):
+        """
+        Index rows added since the last run. Returns the number of new rows indexed.
+        """
+        started = time.perf_counter()
+        conn = chat_db.connect(self.db_path)
+        try:
+            handle_ids = chat_db.find_handle_ids(conn, self.raw_contact)
+            # Re-read the open tail chunk's rows along with the new ones
+            tail = self.state["tail_rowid"]
+            after = tail - 1 if tail is not None else self.state["last_rowid"]
+            rows = chat_db.fetch_messages_since(conn, handle_ids, after_rowid=after)
+        finally:
+            conn.close()
+        new_rows = [row for row in rows if row[0] > self.state["last_rowid"]]
+        if not new_rows:
+            return 0
+        messages = chat_db.process_rows(rows, self.preprocessor)
+        chunks = chunk_messages(messages, strategy=self.strategy, chunk_size=self.chunk_size, hours_gap=self.hours_gap)
+        assign_rowid_ids(chunks, messages, self.raw_contact)
+        if chunks:
+            chunks = self.embedder.generate_embeddings(chunks)
+            self.store.add_chunks(chunks, upsert=True)
+            self.state["tail_rowid"] = chunks[-1]['metadata']['first_rowid']
+        self.state["last_rowid"] = max(row[0] for row in new_rows)
+        self._save_state()
+
+        finished = time.perf_counter()
+        newest = chat_db.apple_date_to_datetime(max(row[1] for row in new_rows))
+        self.metrics["batches"] += 1
+        self.metrics["rows_indexed"] += len(new_rows)
+        self.metrics["last_batch_seconds"] = finished - started
+        self.metrics["last_lag_seconds"] = time.time() - newest.timestamp() if newest else None
+        if detected_at is not None:
+            self.metrics["last_detect_to_index_seconds"] = finished - detected_at
+        instrumentation.counter("watch_rows_indexed_total", len(new_rows))
+        if self.metrics["last_lag_seconds"] is not None:
+            instrumentation.observe("index_lag_seconds", self.metrics["last_lag_seconds"])
+        if self.summary_builder is not None and chunks:
+            self.summary_builder.update(self.raw_contact)
+        return len(new_rows)
+
+    def run(self, max_batches=None):
+        """
+        Watch until stop() is called (or max_batches batches have been indexed).
+        Indexes anything already pending on start.
+        """
+        self.index_new()
+        last_signature = self._signature()
+        pending_since = None
+        last_change = None
+        while not self._stop:
+            time.sleep(self.poll_interval)
+            signature = self._signature()
+            now = time.perf_counter()
+            if signature != last_signature:
+                last_signature = signature
+                last_change = now
+                pending_since = pending_since or now
+            if pending_since is not None and now - last_change >= self.debounce:
+                indexed = self.index_new(detected_at=pending_since)
+                pending_since = None
+                if indexed:
+                    lag = self.metrics["last_lag_seconds"]
+                    print(f"Indexed {indexed} new messages in {self.metrics['last_batch_seconds']:.2f}s "
+                          f"(lag {lag:.1f}s)" if lag is not None else f"Indexed {indexed} new messages")
+                if max_batches is not None and self.metrics["batches"] >= max_batches:
+                    break
+
+    def stop(self):
+        self._stop = True